@@ -0,0 +1,8 @@
+from npre import curves
+
+# Curves every benchmark runs over
+CURVES = [
+    ('secp256k1', curves.secp256k1),
+    ('prime256v1', curves.prime256v1),
+    ('secp384r1', curves.secp384r1),
+]
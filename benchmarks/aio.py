@@ -0,0 +1,74 @@
+"""
+Throughput and latency of umbral reencryption through the asyncio loopback
+server, with and without micro-batching.
+
+    python -m benchmarks.aio [-c CLIENTS] [-r REQUESTS] [-k KFRAGS] [--processes N]
+
+Each client keeps one request in flight on its own connection, so there are
+CLIENTS concurrent requests spread over KFRAGS kFrags.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from npre import aio, umbral
+from benchmarks.ephemeral import percentile
+
+
+async def client(port, requests, latencies):
+    conn = await aio.Client.connect('127.0.0.1', port)
+    try:
+        for kfrag, capsule in requests:
+            start = time.perf_counter()
+            await conn.reencrypt(kfrag, capsule)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+async def load(apre, workload):
+    server = await aio.serve(apre)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, requests, latencies) for requests in workload])
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-c', '--clients', type=int, default=64)
+    parser.add_argument('-r', '--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('-k', '--kfrags', type=int, default=1)
+    parser.add_argument('--processes', type=int, default=0,
+                        help='use a pool of this many processes instead of threads')
+    args = parser.parse_args()
+
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    kfrags, _ = pre.split_rekey(priv, pre.gen_priv(), 1, args.kfrags)
+    kfrags = [pre.save_kfrag(k) for k in kfrags]
+    capsules = [pre.save_ekey(pre.encapsulate(pre.priv2pub(priv))[1]) for _ in range(100)]
+    workload = [[(kfrags[(c + i) % len(kfrags)], capsules[(c + i) % len(capsules)])
+                 for i in range(args.requests)]
+                for c in range(args.clients)]
+
+    loop = asyncio.get_event_loop()
+    for name, max_batch in (('unbatched', 1), ('batched', 256)):
+        executor = ProcessPoolExecutor(args.processes) if args.processes else None
+        apre = aio.AsyncPRE(pre, executor, max_batch=max_batch)
+        elapsed, latencies = loop.run_until_complete(load(apre, workload))
+        apre.close()
+        if executor:
+            executor.shutdown()
+        print('{:<10} {:8.0f} req/s  p50 {:7.2f} ms  p99 {:7.2f} ms  {:5.1f} requests/batch'.format(
+            name, len(latencies) / elapsed, percentile(latencies, 50) * 1e3,
+            percentile(latencies, 99) * 1e3, apre.requests / apre.batches))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory and throughput of PointArray/ScalarArray against lists of elements.
+
+    python -m benchmarks.arrays [-s SIZE] [-n ROUNDS]
+
+Memory is measured in a fresh interpreter as the growth of the resident set
+size (Linux only), which includes what OpenSSL allocates for each element.
+"""
+import argparse
+import gc
+import resource
+import subprocess
+import sys
+import timeit
+
+import npre.elliptic_curve as ec
+from npre import groups
+from benchmarks import CURVES
+
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def memory_of(kind, curve, size):
+    """
+    Prints the growth of the resident set size while deserializing size
+    points into a list or a PointArray. Run in a fresh interpreter, so that
+    freed memory is not reused and OpenSSL allocations are counted.
+    """
+    ecgroup = groups.group(curve)
+    g = groups.generator(curve)
+    buf = ec.PointArray(ecgroup, [g ** k for k in range(1, 11)]).serialize(True) * (size // 10)
+    width = len(buf) // (size // 10 * 10)
+    gc.collect()
+    before = rss()
+    if kind == 'list':
+        obj = [ec.deserialize(ecgroup, buf[i:i + width]) for i in range(0, len(buf), width)]
+    else:
+        obj = ec.PointArray.deserialize(ecgroup, buf, True)
+    print(rss() - before)
+    del obj
+
+
+def memory_per_point(kind, curve, size):
+    out = subprocess.check_output([sys.executable, '-m', 'benchmarks.arrays', '--memory-of', kind,
+                                   '--curve', str(curve), '-s', str(size)])
+    return int(out) / size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-s', '--size', type=int, default=2000)
+    parser.add_argument('-n', '--rounds', type=int, default=3)
+    parser.add_argument('-m', '--memory-size', type=int, default=100000,
+                        help='number of points for the memory figures')
+    parser.add_argument('--memory-of', choices=['list', 'array'], help=argparse.SUPPRESS)
+    parser.add_argument('--curve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_of:
+        memory_of(args.memory_of, args.curve, args.size)
+        return
+
+    for curve_name, curve in CURVES:
+        ecgroup = groups.group(curve)
+        k = ec.random(ecgroup, ec.ZR)
+        scalars = [ec.random(ecgroup, ec.ZR) for _ in range(args.size)]
+        points = ec.powMany(ecgroup, [ec.random(ecgroup, ec.G) for _ in range(args.size)], k)
+        parray = ec.PointArray(ecgroup, points)
+        sarray = ec.ScalarArray(ecgroup, scalars)
+        buf = parray.serialize(True)
+
+        width = len(buf) // args.size
+        print('{} ({} elements)'.format(curve_name, args.size))
+        print('  memory per point  list {:7.0f} B   PointArray {:7.0f} B'.format(
+            memory_per_point('list', curve, args.memory_size),
+            memory_per_point('array', curve, args.memory_size)))
+
+        ops = [
+            ('pow (same k)', lambda: ec.powMany(ecgroup, points, k), lambda: parray ** k),
+            ('pow (elementwise)', lambda: [p ** x for p, x in zip(points, scalars)], lambda: parray ** sarray),
+            ('mul', lambda: [p * q for p, q in zip(points, points)], lambda: parray * parray),
+            ('deserialize', lambda: [ec.deserialize(ecgroup, buf[i:i + width]) for i in range(0, len(buf), width)],
+             lambda: ec.PointArray.deserialize(ecgroup, buf, True)),
+            ('serialize', lambda: b''.join(map(ec.serialize, points)), lambda: parray.serialize(True)),
+            ('scalar mul', lambda: [x * y for x, y in zip(scalars, scalars)], lambda: sarray * sarray),
+            ('scalar invert', lambda: [~x for x in scalars], lambda: ~sarray),
+        ]
+        for name, as_list, as_array in ops:
+            t_list = timeit.timeit(as_list, number=args.rounds) / args.rounds
+            t_array = timeit.timeit(as_array, number=args.rounds) / args.rounds
+            print('  {:<18} list {:9.2f} ms   array {:9.2f} ms   x{:.2f}'.format(
+                name, t_list * 1e3, t_array * 1e3, t_list / t_array))
+
+
+if __name__ == '__main__':
+    main()
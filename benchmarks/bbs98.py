@@ -0,0 +1,36 @@
+"""
+Throughput of BBS98 encryption and decryption of messages of several sizes.
+
+    python -m benchmarks.bbs98 [-n ROUNDS] [-s SIZE ...]
+"""
+import argparse
+import os
+import timeit
+
+from npre import bbs98
+from benchmarks import CURVES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--rounds', type=int, default=5)
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1024, 16 * 1024, 256 * 1024])
+    parser.add_argument('--wire', action='store_true', help='use the compact wire format')
+    args = parser.parse_args()
+
+    for curve_name, curve in CURVES:
+        pre = bbs98.PRE(curve=curve)
+        priv = pre.gen_priv()
+        pub = pre.priv2pub(priv)
+        for size in args.sizes:
+            msg = os.urandom(size)
+            emsg = pre.encrypt(pub, msg, wire_format=args.wire)
+            enc = timeit.timeit(lambda: pre.encrypt(pub, msg, wire_format=args.wire),
+                                number=args.rounds) / args.rounds
+            dec = timeit.timeit(lambda: pre.decrypt(priv, emsg), number=args.rounds) / args.rounds
+            print('{:<10} {:>8} B  encrypt {:6.2f} MB/s  decrypt {:6.2f} MB/s'.format(
+                curve_name, size, size / enc / 1e6, size / dec / 1e6))
+
+
+if __name__ == '__main__':
+    main()
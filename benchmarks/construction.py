@@ -0,0 +1,68 @@
+"""
+Cost of constructing PRE objects and of importing npre.
+
+    python -m benchmarks.construction [-n ROUNDS]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+import npre.elliptic_curve as ec
+from npre import groups, umbral
+from benchmarks import CURVES
+
+
+def import_time(statement, rounds):
+    """
+    Median wall time of a fresh interpreter running statement
+    """
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement])
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    def cold_pre(curve):
+        # What every PRE() paid before the registry: a fresh group
+        groups.clear()
+        pre = umbral.PRE(curve=curve)
+        pre.priv2pub(pre.gen_priv())
+
+    def warm_pre(curve):
+        pre = umbral.PRE(curve=curve)
+        pre.priv2pub(pre.gen_priv())
+
+    for curve_name, curve in CURVES:
+        ops = [
+            ('checked group', lambda: ec.elliptic_curve(nid=curve)),
+            ('unchecked group', lambda: ec.elliptic_curve(nid=curve, check=False)),
+            ('PRE()', lambda: umbral.PRE(curve=curve)),
+            ('new group + keygen', lambda: cold_pre(curve)),
+            ('PRE() + keygen', lambda: warm_pre(curve)),
+        ]
+        for name, fn in ops:
+            fn()
+            t = timeit.timeit(fn, number=args.rounds) / args.rounds
+            print('{:<10} {:<20} {:10.1f} us'.format(curve_name, name, t * 1e6))
+
+    rounds = max(3, args.rounds // 10)
+    python = import_time('pass', rounds)
+    for statement in ('import npre.elliptic_curve',
+                      'import npre.umbral, npre.bbs98',
+                      'import npre.umbral; npre.umbral.PRE()'):
+        t = import_time(statement, rounds) - python
+        print('{:<42} {:8.1f} ms'.format(statement, t * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Latency of encapsulate and BBS98 encrypt in bursts, with and without a pool
+of precomputed ephemeral key pairs.
+
+    python -m benchmarks.ephemeral [-b BURST] [-r BURSTS] [-i IDLE]
+"""
+import argparse
+import time
+
+from npre import bbs98, umbral
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def bursts(fn, burst, count, idle):
+    latencies = []
+    for _ in range(count):
+        # The pool is refilled while requests are idle
+        time.sleep(idle)
+        for _ in range(burst):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-b', '--burst', type=int, default=100)
+    parser.add_argument('-r', '--bursts', type=int, default=10)
+    parser.add_argument('-i', '--idle', type=float, default=0.2, help='seconds between bursts')
+    args = parser.parse_args()
+
+    pre = umbral.PRE()
+    pub = pre.priv2pub(pre.gen_priv())
+    bbs = bbs98.PRE()
+    bbs_pub = bbs.priv2pub(bbs.gen_priv())
+    ops = [
+        ('encapsulate', pre, lambda: pre.encapsulate(pub)),
+        ('bbs98 encrypt', bbs, lambda: bbs.encrypt(bbs_pub, b'Hello world')),
+    ]
+    for name, obj, fn in ops:
+        for pooled in (False, True):
+            if pooled:
+                # Big enough to cover a burst, refilled between bursts
+                obj.start_ephemeral_pool(low=args.burst // 4, high=2 * args.burst)
+            latencies = bursts(fn, args.burst, args.bursts, args.idle)
+            hits = obj.ephemeral_pool.hits if pooled else 0
+            obj.stop_ephemeral_pool()
+            print('{:<14} {:<8} p50 {:7.1f} us  p99 {:7.1f} us  pool hits {:.0%}'.format(
+                name, 'pool' if pooled else 'inline',
+                percentile(latencies, 50) * 1e6, percentile(latencies, 99) * 1e6,
+                hits / len(latencies)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Latency of bbs98 and umbral operations over several curves and (N, t) sizes.
+
+    python -m benchmarks.suite [-c CURVE ...] [-s N:T ...] [-n ROUNDS]
+                               [-o RESULTS.json] [--compare BASELINE.json]
+
+When the extension is built with NPRE_BENCHMARK=1, the number of group
+operations (exponentiations, multiplications...) of one call of each
+operation is reported as well. Results saved with -o can be compared with a
+later run with --compare, which exits with status 1 if any median latency
+grew by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import npre.elliptic_curve as ec
+from npre import bbs98, umbral
+from benchmarks import CURVES
+
+SIZES = [(5, 3), (20, 11), (50, 26)]
+MESSAGE_SIZE = 1024
+
+
+def count_ops(ecgroup, fn):
+    """
+    Group operations done by one call of fn, None without NPRE_BENCHMARK
+    """
+    if not hasattr(ec, 'StartBenchmark'):
+        return None
+    ec.StartBenchmark(ecgroup)
+    try:
+        fn()
+    finally:
+        ec.EndBenchmark(ecgroup)
+    counts = ec.GetGranularBenchmarks(ecgroup)
+    return {'{}_{}'.format(op, t): n
+            for op, (zr, g) in sorted(counts.items())
+            for t, n in (('ZR', zr), ('G', g)) if n}
+
+
+def measure(fn, rounds):
+    fn()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        'rounds': rounds,
+        'min_us': min(times) * 1e6,
+        'median_us': statistics.median(times) * 1e6,
+        'mean_us': statistics.mean(times) * 1e6,
+        'stdev_us': statistics.stdev(times) * 1e6 if rounds > 1 else 0.0,
+    }
+
+
+def bbs98_cases(curve):
+    pre = bbs98.PRE(curve=curve)
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    priv2 = pre.gen_priv()
+    rk = pre.rekey(priv, priv2)
+    msg = os.urandom(MESSAGE_SIZE)
+    emsg = pre.encrypt(pub, msg)
+
+    return pre.ecgroup, [
+        ('keygen', {}, lambda: pre.priv2pub(pre.gen_priv())),
+        ('encrypt', {'bytes': MESSAGE_SIZE}, lambda: pre.encrypt(pub, msg)),
+        ('decrypt', {'bytes': MESSAGE_SIZE}, lambda: pre.decrypt(priv, emsg)),
+        ('rekey', {}, lambda: pre.rekey(priv, priv2)),
+        ('reencrypt', {'bytes': MESSAGE_SIZE}, lambda: pre.reencrypt(rk, emsg)),
+    ]
+
+
+def umbral_cases(curve, sizes):
+    pre = umbral.PRE(curve=curve)
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    priv2 = pre.gen_priv()
+    rk = pre.rekey(priv, priv2)
+    _, ekey = pre.encapsulate(pub)
+
+    cases = [
+        ('keygen', {}, lambda: pre.priv2pub(pre.gen_priv())),
+        ('encapsulate', {}, lambda: pre.encapsulate(pub)),
+        ('decapsulate', {}, lambda: pre.decapsulate(priv, ekey)),
+        ('rekey', {}, lambda: pre.rekey(priv, priv2)),
+        ('reencrypt', {}, lambda: pre.reencrypt(rk, ekey)),
+    ]
+    for N, t in sizes:
+        cases.extend(threshold_cases(pre, priv, priv2, ekey, N, t))
+    return pre.ecgroup, cases
+
+
+def threshold_cases(pre, priv, priv2, ekey, N, t):
+    params = {'N': N, 't': t}
+    kfrags, vkeys = pre.split_rekey(priv, priv2, t, N)
+    ekeys = [pre.reencrypt(kfrag, ekey) for kfrag in kfrags[:t]]
+
+    def combine_cold():
+        # Lambda coefficients are cached after the first combine of a set of ids
+        pre._lambda_cache.clear()
+        pre.combine(ekeys)
+
+    return [
+        ('split_rekey', params, lambda: pre.split_rekey(priv, priv2, t, N)),
+        ('check_kFrag_consistency', params, lambda: pre.check_kFrag_consistency(kfrags[0], vkeys)),
+        ('check_kFrags_consistency', params, lambda: pre.check_kFrags_consistency(kfrags, vkeys)),
+        ('combine', params, lambda: pre.combine(ekeys)),
+        ('combine_cold', params, combine_cold),
+    ]
+
+
+def key(result):
+    return (result['scheme'], result['curve'], result['op'],
+            result.get('N'), result.get('t'), result.get('bytes'))
+
+
+def describe(result):
+    params = ' '.join('{}={}'.format(p, result[p]) for p in ('N', 't', 'bytes') if p in result)
+    return '{:<7} {:<10} {:<26} {:<12}'.format(
+        result['scheme'], result['curve'], result['op'], params)
+
+
+def run(curves, sizes, rounds):
+    results = []
+    for curve_name, curve in curves:
+        schemes = [('bbs98', bbs98_cases(curve)), ('umbral', umbral_cases(curve, sizes))]
+        for scheme, (ecgroup, cases) in schemes:
+            for op, params, fn in cases:
+                result = dict(scheme=scheme, curve=curve_name, op=op, **params)
+                result.update(measure(fn, rounds))
+                ops = count_ops(ecgroup, fn)
+                if ops is not None:
+                    result['ops'] = ops
+                results.append(result)
+
+                line = '{} {:>11.1f} us'.format(describe(result), result['median_us'])
+                if ops:
+                    line += '  ' + ' '.join('{}={}'.format(*kv) for kv in sorted(ops.items()))
+                print(line)
+                sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the change of median latency against baseline, returns the
+    number of operations slower by more than threshold
+    """
+    previous = {key(r): r for r in baseline['results']}
+    regressions = 0
+    print('\nChange of median latency against the baseline:')
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        ratio = result['median_us'] / old['median_us']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print('{} {:>11.1f} -> {:>11.1f} us  x{:.2f}{}'.format(
+            describe(result), old['median_us'], result['median_us'], ratio, flag))
+        if old.get('ops') and result.get('ops') and old['ops'] != result['ops']:
+            print('    group operations changed: {} -> {}'.format(old['ops'], result['ops']))
+    return regressions
+
+
+def parse_size(text):
+    N, t = text.split(':')
+    return int(N), int(t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-c', '--curves', nargs='+', choices=[name for name, _ in CURVES],
+                        default=[name for name, _ in CURVES])
+    parser.add_argument('-s', '--sizes', type=parse_size, nargs='+', default=SIZES,
+                        help='(N, t) sizes for split_rekey, consistency checks and combine')
+    parser.add_argument('-n', '--rounds', type=int, default=20)
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    if not hasattr(ec, 'StartBenchmark'):
+        print('Group operation counts need the extension built with NPRE_BENCHMARK=1\n')
+
+    curves = [(name, nid) for name, nid in CURVES if name in args.curves]
+    results = run(curves, args.sizes, args.rounds)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'rounds': args.rounds,
+                    'counters': hasattr(ec, 'StartBenchmark'),
+                },
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Throughput of umbral.PRE.reencrypt served from a thread pool sharing one PRE.
+
+    python -m benchmarks.threads [-n OPS] [-t THREADS ...]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from npre import umbral
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--ops', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+    rk = pre.rekey(priv_alice, priv_bob)
+    _, ekey = pre.encapsulate(pre.priv2pub(priv_alice))
+
+    def work(count):
+        for _ in range(count):
+            pre.reencrypt(rk, ekey)
+
+    base = None
+    for threads in args.threads:
+        per_thread = args.ops // threads
+        with ThreadPoolExecutor(threads) as pool:
+            start = time.perf_counter()
+            for f in [pool.submit(work, per_thread) for _ in range(threads)]:
+                f.result()
+            elapsed = time.perf_counter() - start
+        rate = per_thread * threads / elapsed
+        base = base or rate
+        print('{:>3} threads: {:8.0f} reencrypt/s  x{:.2f}'.format(threads, rate, rate / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+from npre import pickling
+
+pickling.register()
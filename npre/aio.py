@@ -0,0 +1,347 @@
+'''
+asyncio front-end for reencryption services
+
+AsyncPRE wraps an umbral or bbs98 PRE object and runs its operations in an
+executor, so that the event loop keeps serving requests while the group
+operations run:
+
+    apre = AsyncPRE(umbral.PRE())
+    ekey_bob = await apre.areencrypt(kfrag, ekey)
+
+Concurrent areencrypt calls with the same kFrag (or bbs98 rekey) are
+micro-batched into one reencrypt_many call: the requests made within the
+same iteration of the event loop, or within batch_delay seconds of the
+first one, are run together, max_batch at most.
+
+The executor is a thread pool by default. The extension releases the GIL
+for exponentiations, so worker threads use several cores. With a
+ProcessPoolExecutor, keys and capsules are sent to the workers in the
+npre.wire format, which is also accepted as input, and the workers use a
+PRE object of the same curve with the default generator (none of the
+operations below depend on it). Private keys passed to adecapsulate are then
+copied to the worker processes.
+
+Capsules and kFrags can be given either as objects or in the npre.wire
+format, and results come in the same form. serve() runs a loopback server in
+front of an AsyncPRE which passes wire data through as is; Client talks to
+it.
+'''
+
+import asyncio
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import npre.elliptic_curve as ec
+from npre import bbs98, umbral
+
+# PRE objects of the worker processes, by (scheme, curve)
+_pres = {}
+
+
+def _get_pre(pre):
+    if isinstance(pre, tuple):
+        scheme, curve = pre
+        if pre not in _pres:
+            _pres[pre] = (umbral if scheme == 'umbral' else bbs98).PRE(curve=curve)
+        return _pres[pre]
+    return pre
+
+
+def _to_wire(pre, obj):
+    if isinstance(obj, umbral.EncryptedKey):
+        return pre.save_ekey(obj)
+    if isinstance(obj, umbral.RekeyFrag):
+        return pre.save_kfrag(obj)
+    if isinstance(obj, ec.ec_element):
+        return ec.serialize(obj)
+    if isinstance(obj, list):
+        return [_to_wire(pre, x) for x in obj]
+    return obj
+
+
+def _load_capsule(pre, capsule):
+    if isinstance(capsule, umbral.EncryptedKey):
+        return capsule
+    return pre.load_ekey(bytes(capsule))
+
+
+def _reencrypt_umbral(pre, kfrag, capsules):
+    """
+    Job of a batch of umbral reencryptions. Returns one result per capsule,
+    of the same form, or the exception raised by that capsule.
+    """
+    pre = _get_pre(pre)
+    if not isinstance(kfrag, umbral.RekeyFrag):
+        kfrag = pre.load_kfrag(bytes(kfrag))
+
+    results = [None] * len(capsules)
+    ekeys = []
+    index = []
+    for i, capsule in enumerate(capsules):
+        try:
+            ekeys.append(_load_capsule(pre, capsule))
+            index.append(i)
+        except Exception as e:
+            results[i] = e
+
+    if not ekeys:
+        return results
+    for i, ekey in zip(index, pre.reencrypt_many(kfrag, ekeys)):
+        results[i] = ekey if isinstance(capsules[i], umbral.EncryptedKey) else pre.save_ekey(ekey)
+    return results
+
+
+def _reencrypt_bbs98(pre, rk, emsgs):
+    """
+    Job of a batch of bbs98 reencryptions, see _reencrypt_umbral
+    """
+    pre = _get_pre(pre)
+    try:
+        return pre.reencrypt_many(rk, emsgs)
+    except Exception:
+        # Tell the faulty ciphertexts apart from the others
+        results = []
+        for emsg in emsgs:
+            try:
+                results.append(pre.reencrypt(rk, emsg))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _combine(pre, capsules):
+    pre = _get_pre(pre)
+    result = pre.combine([_load_capsule(pre, x) for x in capsules])
+    return result if isinstance(capsules[0], umbral.EncryptedKey) else pre.save_ekey(result)
+
+
+def _decapsulate(pre, priv, capsule, key_length):
+    pre = _get_pre(pre)
+    return pre.decapsulate(pre.load_key(priv), _load_capsule(pre, capsule), key_length)
+
+
+class _Batch(object):
+    __slots__ = ('rk', 'items', 'futures', 'handle')
+
+    def __init__(self, rk):
+        self.rk = rk
+        self.items = []
+        self.futures = []
+        self.handle = None
+
+
+def _fan_out(futures, restore, job):
+    if job.cancelled():
+        results = [asyncio.CancelledError()] * len(futures)
+    elif job.exception() is not None:
+        results = [job.exception()] * len(futures)
+    else:
+        results = job.result()
+
+    for i, (future, result) in enumerate(zip(futures, results)):
+        if future.done():
+            # Cancelled by its caller
+            continue
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(restore[i](result) if restore and restore[i] else result)
+
+
+class AsyncPRE(object):
+    def __init__(self, pre, executor=None, max_batch=256, batch_delay=0):
+        if isinstance(pre, umbral.PRE):
+            self.scheme = 'umbral'
+        elif isinstance(pre, bbs98.PRE):
+            self.scheme = 'bbs98'
+        else:
+            raise TypeError('Expected an umbral or bbs98 PRE object')
+        if max_batch < 1:
+            raise ValueError('max_batch must be at least 1')
+
+        self.pre = pre
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        self._portable = isinstance(self.executor, ProcessPoolExecutor)
+        self._batches = {}
+        # Number of areencrypt calls and of reencrypt_many calls they made
+        self.requests = 0
+        self.batches = 0
+
+    def _run(self, job, *args):
+        if self._portable:
+            pre = (self.scheme, self.pre.curve)
+            args = [_to_wire(self.pre, x) for x in args]
+        else:
+            pre = self.pre
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, partial(job, pre, *args))
+
+    def _restore(self, obj):
+        # Converts a capsule back to an object after a worker process
+        return self.pre.load_ekey(obj)
+
+    def _batch_key(self, rk):
+        if self.scheme == 'umbral':
+            return self.pre.save_kfrag(rk) if isinstance(rk, umbral.RekeyFrag) else bytes(rk)
+        return self.pre.save_key(rk) if isinstance(rk, ec.ec_element) else bytes(rk)
+
+    async def areencrypt(self, rk, ekey):
+        """
+        Reencrypts an umbral capsule with kFrag rk, or a bbs98 ciphertext with
+        rekey rk, batched with the concurrent calls using the same rk
+        """
+        loop = asyncio.get_event_loop()
+        key = self._batch_key(rk)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(rk)
+            if self.batch_delay:
+                batch.handle = loop.call_later(self.batch_delay, self._flush, key)
+            else:
+                batch.handle = loop.call_soon(self._flush, key)
+
+        future = loop.create_future()
+        batch.items.append(ekey)
+        batch.futures.append(future)
+        self.requests += 1
+        if len(batch.items) >= self.max_batch:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        batch = self._batches.pop(key)
+        batch.handle.cancel()
+        self.batches += 1
+
+        restore = None
+        if self.scheme == 'umbral':
+            job = self._run(_reencrypt_umbral, batch.rk, batch.items)
+            if self._portable:
+                restore = [self._restore if isinstance(x, umbral.EncryptedKey) else None
+                           for x in batch.items]
+        else:
+            job = self._run(_reencrypt_bbs98, batch.rk, batch.items)
+        job.add_done_callback(partial(_fan_out, batch.futures, restore))
+
+    def _require_umbral(self, name):
+        if self.scheme != 'umbral':
+            raise TypeError('{} is only available for umbral'.format(name))
+
+    async def acombine(self, ekeys):
+        """
+        Combines reencrypted umbral capsules, see umbral.PRE.combine
+        """
+        self._require_umbral('acombine')
+        ekeys = list(ekeys)
+        if not ekeys:
+            return None
+        result = await self._run(_combine, ekeys)
+        if self._portable and isinstance(ekeys[0], umbral.EncryptedKey):
+            result = self._restore(result)
+        return result
+
+    async def adecapsulate(self, priv, ekey, key_length=32):
+        """
+        Derives the symmetric key of an umbral capsule
+        """
+        self._require_umbral('adecapsulate')
+        return await self._run(_decapsulate, priv, ekey, key_length)
+
+    def close(self):
+        """
+        Shuts the executor down if it was created by this object
+        """
+        if self._own_executor:
+            self.executor.shutdown()
+
+
+# Frames are prefixed with their length. Requests are an operation byte, the
+# length of the key, the key and the data; responses a status byte and the
+# result or an error message.
+_LENGTH = struct.Struct('>I')
+_KEY_LENGTH = struct.Struct('>H')
+MAX_FRAME = 1 << 20
+OP_REENCRYPT = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class ServerError(Exception):
+    pass
+
+
+async def _read_frame(reader):
+    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if size > MAX_FRAME:
+        raise ValueError('Frame too long')
+    return await reader.readexactly(size)
+
+
+def _frame(data):
+    return _LENGTH.pack(len(data)) + data
+
+
+async def _dispatch(apre, request):
+    if len(request) < 1 + _KEY_LENGTH.size or request[0] != OP_REENCRYPT:
+        raise ValueError('Invalid request')
+    (key_length,) = _KEY_LENGTH.unpack_from(request, 1)
+    start = 1 + _KEY_LENGTH.size
+    rk = request[start:start + key_length]
+    data = request[start + key_length:]
+    return await apre.areencrypt(rk, data)
+
+
+async def _handle(apre, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_frame(reader)
+            except (asyncio.IncompleteReadError, ValueError, ConnectionError):
+                break
+            try:
+                response = bytes([STATUS_OK]) + await _dispatch(apre, request)
+            except Exception as e:
+                response = bytes([STATUS_ERROR]) + str(e).encode()
+            writer.write(_frame(response))
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(apre, host='127.0.0.1', port=0):
+    """
+    Starts a reencryption server in front of apre and returns the
+    asyncio server. Requests on one connection are answered in order, so
+    concurrent requests use several connections.
+    """
+    return await asyncio.start_server(partial(_handle, apre), host, port)
+
+
+class Client(object):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def reencrypt(self, rk, data):
+        """
+        Reencrypts data (a wire capsule or a bbs98 ciphertext) with rk (a
+        wire kFrag or a serialized bbs98 rekey)
+        """
+        self.writer.write(_frame(b''.join([
+            bytes([OP_REENCRYPT]), _KEY_LENGTH.pack(len(rk)), rk, data])))
+        response = await _read_frame(self.reader)
+        if response[0] != STATUS_OK:
+            raise ServerError(response[1:].decode(errors='replace'))
+        return response[1:]
+
+    def close(self):
+        self.writer.close()
@@ -18,26 +18,44 @@ M. Egorov (michael@nucypher.com); 06/2017
 '''
 
 import npre.elliptic_curve as ec
-from npre import curves
-from npre.util import pad, unpad
+from npre import cache, curves, ephemeral, groups, metrics, wire
+from npre.util import pad, unpad, pow_many
 import msgpack
 from typing import Union
+from collections import OrderedDict
+from functools import reduce
+from operator import mul
+from threading import Lock
 
 
 class PRE(object):
+    # Set by start_ephemeral_pool
+    ephemeral_pool = None
+    # Number of composed routes kept by route
+    route_cache_size = 128
+    # Set by enable_result_cache
+    result_cache = None
+
     def __init__(self, curve=curves.secp256k1, g=None):
         self.curve = curve
-        self.ecgroup = ec.elliptic_curve(nid=self.curve)
-
-        if g is None:
-            self.g = ec.getGenerator(self.ecgroup)
-        else:
-            if isinstance(g, ec.ec_element):
-                self.g = g
-            else:
-                self.g = ec.deserialize(self.ecgroup, g)
+        # Shared by all PRE objects of the curve, see npre.groups
+        self.ecgroup = groups.group(self.curve)
+        self.g = groups.generator(self.curve, g)
 
         self.bitsize = ec.bitsize(self.ecgroup)
+        # Routes by their tuple of serialized rekeys, and the routes
+        # going through each rekey
+        self._routes = OrderedDict()
+        self._routes_by_hop = {}
+        self._route_lock = Lock()
+        # Called with the hops of each route dropped by invalidate_rekey
+        self.route_invalidation_hooks = []
+
+    def __reduce__(self):
+        # Pickled as its curve and generator: the copy uses the shared group
+        # of the receiving process, without the pools and caches
+        g = None if self.g == groups.generator(self.curve) else ec.serialize(self.g)
+        return type(self), (self.curve, g)
 
     def gen_priv(self, dtype='ec'):
         priv = ec.random(self.ecgroup, ec.ZR)
@@ -72,35 +90,81 @@ class PRE(object):
     def save_key(self, key):
         return ec.serialize(key)
 
-    def encrypt(self, pub, msg, padding=True):
+    @metrics.timed('bbs98', 'encrypt')
+    def encrypt(self, pub, msg, padding=True, wire_format=False):
+        """
+        Encrypts msg to pub. The ciphertext is a msgpack list of serialized
+        points, or a message in the compact npre.wire format if wire_format
+        is set. decrypt and reencrypt accept both.
+        """
         if type(msg) is str:
             msg = msg.encode()
         if padding:
             msg = pad(self.bitsize, msg)
-            chunks = [
-                    msg[i * self.bitsize: i * self.bitsize + self.bitsize]
-                    for i in range(len(msg) // self.bitsize)]
-        else:
-            chunks = [msg]
-        r = ec.random(self.ecgroup, ec.ZR)
+        r, blind = self._ephemeral()
         c1 = self.load_key(pub) ** r
-        c2 = [(self.g ** r) * ec.encode(self.ecgroup, m, False) for m in chunks]
-        c2 = map(ec.serialize, c2)
-        return msgpack.dumps([ec.serialize(c1)] + list(c2))
+        # All chunks are encoded, blinded by g ** r and serialized in one call
+        c2 = ec.encryptChunks(self.ecgroup, msg, blind, not wire_format)
+        r.zeroize()
+        blind.zeroize()
+        if wire_format:
+            return wire.dump_bbs98(self.ecgroup, wire.dump_point(self.ecgroup, c1), c2)
+        width = wire.sizes(self.ecgroup)[0] + 1
+        c2 = [c2[i:i + width] for i in range(0, len(c2), width)]
+        return msgpack.dumps([ec.serialize(c1)] + c2)
 
+    @metrics.timed('bbs98', 'decrypt')
     def decrypt(self, priv, emsg, padding=True):
         if type(emsg) is str:
             emsg = emsg.encode()
-        emsg = [self.load_key(m) for m in msgpack.loads(emsg)]
-        c1 = emsg[0]
-        c2 = emsg[1:]
+        if wire.is_wire(emsg):
+            c1, c2 = wire.parse_bbs98(self.ecgroup, emsg)
+            c1 = wire.load_point(self.ecgroup, c1)
+            typed = False
+        else:
+            emsg = msgpack.loads(emsg)
+            c1, c2 = self.load_key(emsg[0]), b''.join(emsg[1:])
+            typed = True
         p = c1 ** (~self.load_key(priv))
-        m = [c / p for c in c2]
-        msg = [ec.decode(self.ecgroup, m_i, False) for m_i in m]
+        msg = ec.decryptChunks(self.ecgroup, c2, p, typed)
         if padding:
-            return b''.join(msg[:-1] + [unpad(msg[-1])])
+            return unpad(msg)
         else:
-            return msg[0]
+            return msg
+
+    def start_ephemeral_pool(self, low=64, high=256):
+        """
+        Precomputes the ephemeral key pairs of encrypt in a background thread,
+        keeping between low and high of them ready (see npre.ephemeral)
+        """
+        self.stop_ephemeral_pool()
+        self.ephemeral_pool = ephemeral.EphemeralPool(self.ecgroup, self.g, low, high)
+        return self.ephemeral_pool
+
+    def stop_ephemeral_pool(self):
+        if self.ephemeral_pool is not None:
+            self.ephemeral_pool.close()
+            self.ephemeral_pool = None
+
+    def enable_result_cache(self, max_bytes=1 << 20, ttl=None):
+        """
+        Memoizes reencrypt of bytes ciphertexts in a ResultCache of
+        max_bytes (see npre.cache), whose entries expire after ttl seconds
+        if set. invalidate_rekey drops the results of a revoked rekey.
+        """
+        self.disable_result_cache()
+        self.result_cache = cache.ResultCache(max_bytes, ttl)
+        return self.result_cache
+
+    def disable_result_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.clear()
+            self.result_cache = None
+
+    def _ephemeral(self):
+        if self.ephemeral_pool is not None:
+            return self.ephemeral_pool.take()
+        return ephemeral.generate(self.ecgroup, self.g)
 
     def rekey(self, priv1, priv2, dtype=None):
         if dtype is None:
@@ -113,11 +177,127 @@ class PRE(object):
         else:
             return rk
 
+    @metrics.timed('bbs98', 'reencrypt')
     def reencrypt(self, rk, emsg):
+        return self._reencrypt(rk, emsg)
+
+    def _reencrypt(self, rk, emsg, hops=None):
+        # Cached results are tagged with the rekeys of the route if given
         if type(emsg) is str:
             emsg = emsg.encode()
+        results = self.result_cache
+        if results is not None and type(emsg) is bytes:
+            tags = hops or (rk if type(rk) is bytes else self.save_key(rk),)
+            key = cache.digest(b'reencrypt', *(tags + (emsg,)))
+            cached = results.get(key)
+            if cached is None:
+                cached = self._reencrypt_uncached(rk, emsg)
+                results.put(key, cached, *tags)
+            return cached
+        return self._reencrypt_uncached(rk, emsg)
+
+    def _reencrypt_uncached(self, rk, emsg):
         rk = self.load_key(rk)
+        if wire.is_wire(emsg):
+            # Only c1 changes, the chunks are copied (or kept in place) as is
+            c1 = wire.load_point(self.ecgroup, wire.parse_bbs98(self.ecgroup, emsg)[0])
+            return wire.replace_c1(self.ecgroup, emsg, wire.dump_point(self.ecgroup, c1 ** rk))
         emsg = msgpack.loads(emsg)
         c1 = self.load_key(emsg[0])
         c1 = c1 ** rk
         return msgpack.dumps([ec.serialize(c1)] + emsg[1:])
+
+    def route(self, rks, dtype=None):
+        """
+        Composes the rekeys of a delegation chain A -> B -> ... -> Z into the
+        single rekey A -> Z (their product), which reencrypt and
+        reencrypt_many take like any other rekey. Routes are cached until
+        one of their rekeys is passed to invalidate_rekey.
+        """
+        if not rks:
+            raise ValueError('A route needs at least one rekey')
+        if dtype is None:
+            dtype = type(rks[0])
+        hops = tuple(self.save_key(rk) if type(rk) is not bytes else rk for rk in rks)
+
+        with self._route_lock:
+            rk = self._routes.get(hops)
+            if rk is not None:
+                self._routes.move_to_end(hops)
+        if rk is None:
+            rk = reduce(mul, [self.load_key(hop) for hop in hops])
+            with self._route_lock:
+                self._add_route(hops, rk)
+
+        if dtype in (bytes, 'bytes'):
+            return self.save_key(rk)
+        return rk
+
+    def _add_route(self, hops, rk):
+        self._routes[hops] = rk
+        for hop in hops:
+            self._routes_by_hop.setdefault(hop, set()).add(hops)
+        if len(self._routes) > self.route_cache_size:
+            self._drop_route(next(iter(self._routes)))
+
+    def _drop_route(self, hops):
+        # Not zeroized, callers may still hold the rekey
+        del self._routes[hops]
+        for hop in hops:
+            routes = self._routes_by_hop.get(hop)
+            if routes is not None:
+                routes.discard(hops)
+                if not routes:
+                    del self._routes_by_hop[hop]
+
+    def invalidate_rekey(self, rk):
+        """
+        Drops the cached routes going through rekey rk, and the cached
+        results computed with it, when it is revoked.
+        The hooks in route_invalidation_hooks are called with the hops of
+        each route dropped. Returns the number of routes dropped.
+        """
+        hop = self.save_key(rk) if type(rk) is not bytes else rk
+        if self.result_cache is not None:
+            self.result_cache.invalidate(hop)
+        with self._route_lock:
+            dropped = list(self._routes_by_hop.get(hop, ()))
+            for hops in dropped:
+                self._drop_route(hops)
+        for hops in dropped:
+            for hook in self.route_invalidation_hooks:
+                hook(hops)
+        return len(dropped)
+
+    @metrics.timed('bbs98', 'reencrypt_path')
+    def reencrypt_path(self, rks, emsg):
+        """
+        Reencrypts emsg along a delegation chain with one exponentiation,
+        same as reencrypting it with each rekey of rks in turn
+        """
+        hops = tuple(self.save_key(rk) if type(rk) is not bytes else rk for rk in rks)
+        return self._reencrypt(self.route(hops, dtype=ec.ec_element), emsg, hops)
+
+    @metrics.timed('bbs98', 'reencrypt_many')
+    def reencrypt_many(self, rk, emsgs, executor=None):
+        """
+        Reencrypts many ciphertexts with the same rekey in one call.
+        A thread pool executor spreads the work over several cores.
+        """
+        rk = self.load_key(rk)
+        emsgs = [e.encode() if type(e) is str else e for e in emsgs]
+        c1 = []
+        for i, e in enumerate(emsgs):
+            if wire.is_wire(e):
+                c1.append(b'\x01' + bytes(wire.parse_bbs98(self.ecgroup, e)[0]))
+            else:
+                emsgs[i] = msgpack.loads(e)
+                c1.append(emsgs[i][0])
+
+        c1 = pow_many(self.ecgroup, b''.join(c1), rk, executor)
+        width = len(c1) // len(emsgs) if emsgs else 0
+        c1 = [c1[i * width:(i + 1) * width] for i in range(len(emsgs))]
+        return [
+                msgpack.dumps([c] + e[1:]) if type(e) is list
+                else wire.replace_c1(self.ecgroup, e, c[1:])
+                for c, e in zip(c1, emsgs)]
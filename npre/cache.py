@@ -0,0 +1,157 @@
+'''
+Bounded cache of reencryption and decapsulation results
+
+Proxies see the same capsule reencrypted with the same kFrag again and
+again (retries, several readers), and Bob decapsulates the same capsule
+more than once. PRE objects can memoize these results in a ResultCache
+(see umbral.PRE.enable_result_cache and bbs98.PRE.enable_result_cache).
+
+Entries are keyed by a SHA-256 digest of their inputs and kept in least
+recently used order, within max_bytes (the size of the cached values and
+of their keys) and for at most ttl seconds if set. Every entry is tagged
+with the digests of the keys used (kFrag, rekeys or private key), so that
+invalidate drops all the results of a revoked key.
+
+Values are kept in bytearrays and overwritten with zeros when they are
+evicted, expire or are invalidated; get returns copies. Expired entries are
+dropped by get, put and stats, so they do not outlive their ttl in memory
+for long even if they are never looked up again.
+'''
+
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+DIGEST_SIZE = 32
+
+
+def digest(*parts):
+    """
+    SHA-256 of parts, each prefixed with its length
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(len(part).to_bytes(4, 'big'))
+        h.update(part)
+    return h.digest()
+
+
+def _wipe(value):
+    value[:] = bytes(len(value))
+
+
+class ResultCache(object):
+    def __init__(self, max_bytes=1 << 20, ttl=None):
+        if max_bytes <= 0:
+            raise ValueError('max_bytes must be positive')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, tags, expiry)
+        self._entries = OrderedDict()
+        # key -> expiry, in order of expiry (ttl is the same for all entries)
+        self._expiry = OrderedDict()
+        self._tags = {}
+        self._lock = Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        value, tags, expiry = self._entries.pop(key)
+        if expiry is not None:
+            del self._expiry[key]
+        self.size -= len(value) + DIGEST_SIZE
+        for tag in tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+        _wipe(value)
+
+    def _purge(self):
+        # Drops the expired entries, oldest first
+        now = time.monotonic()
+        while self._expiry:
+            key, expiry = next(iter(self._expiry.items()))
+            if expiry > now:
+                break
+            self._drop(key)
+            self.expirations += 1
+
+    def get(self, key):
+        """
+        Returns a copy of the value cached under key, or None
+        """
+        with self._lock:
+            self._purge()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return bytes(entry[0])
+
+    def put(self, key, value, *tags):
+        """
+        Caches value under key, tagged with tags (the serialized keys the
+        value was computed with, which are only kept as digests)
+        """
+        value = bytearray(value)
+        size = len(value) + DIGEST_SIZE
+        if size > self.max_bytes:
+            _wipe(value)
+            return
+        tags = [digest(tag) for tag in tags]
+        expiry = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._purge()
+            if key in self._entries:
+                self._drop(key)
+            while self.size + size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = (value, tags, expiry)
+            if expiry is not None:
+                self._expiry[key] = expiry
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self.size += size
+
+    def invalidate(self, tag):
+        """
+        Drops the values computed with tag (a serialized kFrag, rekey or
+        private key) and returns how many there were
+        """
+        with self._lock:
+            keys = list(self._tags.get(digest(tag), ()))
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            self._purge()
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,978 @@
+/*
+ *   @file    ecarray.c
+ *
+ *   @brief   PointArray and ScalarArray: contiguous arrays of group elements
+ *
+ * Elements are stored in fixed-width form, one after the other, in a single
+ * buffer (exported read-only through the buffer protocol):
+ *
+ *   ScalarArray  big-endian scalar reduced modulo the group order, padded
+ *                to the byte size of the order
+ *   PointArray   affine coordinates x | y of the point, big-endian, each
+ *                padded to the byte size of the field; all zero bytes for
+ *                the point at infinity
+ *
+ * Bulk operations convert blocks of elements to OpenSSL objects, compute
+ * without the GIL and convert the results back, making all points of a
+ * block affine with a single field inversion. No Python object is created
+ * per element. Mutating an array while an operation on it runs in another
+ * thread is not supported.
+ *
+ * This file is included by ecmodule.c.
+ *
+ ************************************************************************/
+
+#define ARRAY_BLOCK 256
+
+typedef struct {
+    PyObject_HEAD
+    ECGroup *group;
+    GroupType type;
+    Py_ssize_t len;
+    size_t width;
+    uint8_t *data;
+} ECArray;
+
+#define PyECArray_Check(obj) (PyPointArray_Check(obj) || PyScalarArray_Check(obj))
+
+enum ArrayOp {ARRAY_ADD, ARRAY_SUB, ARRAY_MUL, ARRAY_DIV, ARRAY_POW};
+
+static size_t fieldLen(ECGroup *gobj) {
+    return (EC_GROUP_get_degree(gobj->ec_group) + 7) / 8;
+}
+
+static size_t elementWidth(ECGroup *gobj, GroupType type) {
+    return type == G ? 2 * fieldLen(gobj) : (size_t) BN_num_bytes(gobj->order);
+}
+
+static ECArray *newArray(GroupType type, ECGroup *gobj, Py_ssize_t len) {
+    PyTypeObject *tp = type == G ? &PointArrayType : &ScalarArrayType;
+    ECArray *arr = (ECArray *) tp->tp_alloc(tp, 0);
+    if(arr == NULL) return NULL;
+    arr->type = type;
+    arr->group = gobj;
+    Py_INCREF(gobj);
+    arr->len = len;
+    arr->width = elementWidth(gobj, type);
+    // zero bytes are 0 in ZR and the point at infinity in G
+    arr->data = (uint8_t *) PyMem_Calloc(len > 0 ? len * arr->width : 1, 1);
+    if(arr->data == NULL) {
+        Py_DECREF(arr);
+        PyErr_NoMemory();
+        return NULL;
+    }
+    return arr;
+}
+
+static void ECArray_dealloc(ECArray *self) {
+    if(self->data != NULL) {
+        // scalars are often secrets
+        OPENSSL_cleanse(self->data, self->len * self->width);
+        PyMem_Free(self->data);
+    }
+    Py_XDECREF(self->group);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+/*
+ * Conversions between the fixed-width form and OpenSSL objects, safe to
+ * call without the GIL. x and y are scratch.
+ *
+ * Points in an array have been checked when they were stored, so they are
+ * loaded as (x, y, 1) without the curve equation check of
+ * EC_POINT_set_affine_coordinates.
+ */
+static int loadPoint(ECGroup *gobj, EC_POINT *P, const uint8_t *in, BIGNUM *x, BIGNUM *y, BN_CTX *ctx) {
+    size_t i, f = fieldLen(gobj);
+    for(i = 0; i < 2 * f && in[i] == 0; i++);
+    if(i == 2 * f)
+        return EC_POINT_set_to_infinity(gobj->ec_group, P);
+    return BN_bin2bn(in, f, x) != NULL && BN_bin2bn(in + f, f, y) != NULL &&
+           EC_POINT_set_Jprojective_coordinates_GFp(gobj->ec_group, P, x, y, BN_value_one(), ctx);
+}
+
+static int storePoints(ECGroup *gobj, EC_POINT **P, size_t n, uint8_t *out, BIGNUM *x, BIGNUM *y, BN_CTX *ctx) {
+    size_t i, f = fieldLen(gobj);
+    int ok;
+    if(!EC_POINTs_make_affine(gobj->ec_group, n, P, ctx))
+        return FALSE;
+    BN_CTX_start(ctx);
+    BIGNUM *z = BN_CTX_get(ctx);
+    ok = z != NULL;
+    for(i = 0; i < n && ok; i++, out += 2 * f) {
+        if(EC_POINT_is_at_infinity(gobj->ec_group, P[i])) {
+            memset(out, 0, 2 * f);
+        }
+        else {
+            ok = getAffine(gobj, P[i], x, y, z, ctx) &&
+                 BN_bn2binpad(x, out, f) >= 0 && BN_bn2binpad(y, out + f, f) >= 0;
+        }
+    }
+    BN_CTX_end(ctx);
+    return ok;
+}
+
+static int storeScalar(ECGroup *gobj, const BIGNUM *k, uint8_t *out, size_t width, BIGNUM *tmp, BN_CTX *ctx) {
+    return BN_nnmod(tmp, k, gobj->order, ctx) && BN_bn2binpad(tmp, out, width) >= 0;
+}
+
+/*
+ * Element i of an array as a new ECElement
+ */
+static PyObject *arrayItem(ECArray *self, Py_ssize_t i) {
+    ECElement *elem;
+    uint8_t *in;
+    int ok;
+
+    if(i < 0) i += self->len;
+    if(i < 0 || i >= self->len) {
+        PyErr_SetString(PyExc_IndexError, "array index out of range");
+        return NULL;
+    }
+    in = self->data + i * self->width;
+    elem = createNewPoint(self->type, self->group);
+    if(elem == NULL) return NULL;
+    if(self->type == ZR) {
+        ok = BN_bin2bn(in, self->width, elem->elemZ) != NULL;
+    }
+    else {
+        BN_CTX *ctx = self->group->ctx;
+        BN_CTX_start(ctx);
+        BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx);
+        ok = y != NULL && loadPoint(self->group, elem->P, in, x, y, ctx);
+        BN_CTX_end(ctx);
+    }
+    if(!ok) {
+        Py_DECREF(elem);
+        EXIT_IF(TRUE, "could not load array element.");
+    }
+    return (PyObject *) elem;
+}
+
+/*
+ * Stores n elements (or, in a ScalarArray, non-negative ints) at out.
+ * Points are copied and made affine in blocks without the GIL, so the
+ * elements themselves are left untouched.
+ */
+static int storeItems(ECArray *self, PyObject **items, Py_ssize_t n, uint8_t *out) {
+    ECGroup *gobj = self->group;
+    EC_POINT **P = NULL;
+    BN_CTX *ctx;
+    Py_ssize_t i, j, blk = n < ARRAY_BLOCK ? n : ARRAY_BLOCK;
+    int ok = TRUE;
+
+    for(i = 0; i < n; i++) {
+        ECElement *elem = (ECElement *) items[i];
+        if(self->type == ZR && PyLong_Check(items[i]) && Py_SIZE(items[i]) >= 0) continue;
+        if(!PyEC_Check(elem) || !elem->point_init || elem->type != self->type || elem->group->nid != gobj->nid) {
+            PyErr_Format(PyECErrorObject, self->type == G ?
+                         "item %zd is not a point of the group of the array." :
+                         "item %zd is not an element of ZR of the group of the array or a non-negative integer.", i);
+            return FALSE;
+        }
+    }
+
+    if(self->type == ZR) {
+        BIGNUM *tmp = BN_new(), *owned = BN_new();
+        ok = tmp != NULL && owned != NULL;
+        for(i = 0; i < n && ok; i++, out += self->width) {
+            const BIGNUM *k = owned;
+            if(PyLong_Check(items[i])) setBigNum((PyLongObject *) items[i], &owned);
+            else k = ((ECElement *) items[i])->elemZ;
+            ok = storeScalar(gobj, k, out, self->width, tmp, gobj->ctx);
+        }
+        BN_clear_free(tmp);
+        BN_clear_free(owned);
+    }
+    else {
+        P = newPoints(gobj, blk);
+        ctx = acquireCtx(gobj);
+        if(P == NULL || ctx == NULL) {
+            freePoints(P, blk);
+            if(ctx != NULL) releaseCtx(gobj, ctx);
+            PyErr_NoMemory();
+            return FALSE;
+        }
+        Py_BEGIN_ALLOW_THREADS;
+        BN_CTX_start(ctx);
+        BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx);
+        ok = y != NULL;
+        for(i = 0; i < n && ok; i += blk) {
+            Py_ssize_t m = n - i < blk ? n - i : blk;
+            for(j = 0; j < m && ok; j++)
+                ok = EC_POINT_copy(P[j], ((ECElement *) items[i + j])->P);
+            ok = ok && storePoints(gobj, P, m, out + i * self->width, x, y, ctx);
+        }
+        BN_CTX_end(ctx);
+        Py_END_ALLOW_THREADS;
+        releaseCtx(gobj, ctx);
+        freePoints(P, blk);
+    }
+    if(!ok) PyErr_SetString(PyECErrorObject, "could not store array elements.");
+    return ok;
+}
+
+/*
+ * PointArray(group, items=0) and ScalarArray(group, items=0): items is a
+ * number of elements (points at infinity or zeros), a sequence of elements
+ * (or non-negative ints for scalars) or an array of the same kind to copy.
+ */
+static PyObject *ECArray_new(PyTypeObject *type, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"group", "items", NULL};
+    GroupType gtype = type == &PointArrayType ? G : ZR;
+    ECGroup *gobj = NULL;
+    PyObject *items = NULL, *seq;
+    ECArray *arr;
+    Py_ssize_t n;
+
+    if(!PyArg_ParseTupleAndKeywords(args, kwds, "O|O", kwlist, &gobj, &items)) {
+        return NULL;
+    }
+    VERIFY_GROUP(gobj);
+
+    if(items == NULL || PyLong_Check(items)) {
+        n = items == NULL ? 0 : PyLong_AsSsize_t(items);
+        if(n < 0) {
+            if(!PyErr_Occurred()) PyErr_SetString(PyExc_ValueError, "negative array length");
+            return NULL;
+        }
+        return (PyObject *) newArray(gtype, gobj, n);
+    }
+    if(Py_TYPE(items) == type) {
+        ECArray *src = (ECArray *) items;
+        EXIT_IF(src->group->nid != gobj->nid, "mixing group elements from different curves.");
+        if((arr = newArray(gtype, gobj, src->len)) != NULL)
+            memcpy(arr->data, src->data, src->len * src->width);
+        return (PyObject *) arr;
+    }
+
+    if((seq = PySequence_Fast(items, "items must be a length, a sequence or an array.")) == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    if((arr = newArray(gtype, gobj, n)) == NULL) {
+        Py_DECREF(seq);
+        return NULL;
+    }
+    if(!storeItems(arr, PySequence_Fast_ITEMS(seq), n, arr->data)) {
+        Py_CLEAR(arr);
+    }
+    Py_DECREF(seq);
+    return (PyObject *) arr;
+}
+
+/*
+ * Checks a buffer of whole fixed-width elements and copies it to a new array.
+ * Points are checked to be on the curve.
+ */
+static ECArray *arrayFromBytes(GroupType type, ECGroup *gobj, PyObject *buffer) {
+    Py_buffer view;
+    ECArray *arr = NULL;
+    size_t width = elementWidth(gobj, type);
+    Py_ssize_t i, n, bad = -1;
+    int ok = TRUE;
+
+    if(PyObject_GetBuffer(buffer, &view, PyBUF_SIMPLE) < 0) return NULL;
+    if(view.len % width != 0) {
+        PyBuffer_Release(&view);
+        EXIT_IF(TRUE, "buffer length is not a multiple of the element size.");
+    }
+    n = view.len / width;
+    if((arr = newArray(type, gobj, n)) == NULL) {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    memcpy(arr->data, view.buf, view.len);
+    PyBuffer_Release(&view);
+
+    BN_CTX *ctx = acquireCtx(gobj);
+    EC_POINT *P = EC_POINT_new(gobj->ec_group);
+    if(ctx == NULL || P == NULL) {
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        EC_POINT_free(P);
+        Py_DECREF(arr);
+        return (ECArray *) PyErr_NoMemory();
+    }
+    Py_BEGIN_ALLOW_THREADS;
+    BN_CTX_start(ctx);
+    BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx), *p = BN_CTX_get(ctx);
+    ok = p != NULL && EC_GROUP_get_curve_GFp(gobj->ec_group, p, NULL, NULL, ctx);
+    for(i = 0; i < n && ok && bad < 0; i++) {
+        uint8_t *elem = arr->data + i * width;
+        if(type == G) {
+            // coordinates must be canonical, as arrays are compared bytewise
+            if(!loadPoint(gobj, P, elem, x, y, ctx) || !EC_POINT_is_on_curve(gobj->ec_group, P, ctx) ||
+               (!EC_POINT_is_at_infinity(gobj->ec_group, P) && (BN_cmp(x, p) >= 0 || BN_cmp(y, p) >= 0))) bad = i;
+        }
+        else {
+            // reduce scalars which are not below the order
+            ok = BN_bin2bn(elem, width, x) != NULL;
+            if(ok && BN_cmp(x, gobj->order) >= 0)
+                ok = storeScalar(gobj, x, elem, width, y, ctx);
+        }
+    }
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    EC_POINT_free(P);
+
+    if(!ok || bad >= 0) {
+        Py_DECREF(arr);
+        if(bad >= 0) PyErr_Format(PyECErrorObject, "invalid point at index %zd.", bad);
+        else PyErr_SetString(PyECErrorObject, "could not load the elements.");
+        return NULL;
+    }
+    return arr;
+}
+
+static PyObject *ECArray_frombytes(PyTypeObject *type, PyObject *args) {
+    ECGroup *gobj = NULL;
+    PyObject *buffer = NULL;
+
+    if(!PyArg_ParseTuple(args, "OO", &gobj, &buffer)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    return (PyObject *) arrayFromBytes(type == &PointArrayType ? G : ZR, gobj, buffer);
+}
+
+/*
+ * PointArray.deserialize(group, buffer, typed=False): points from a buffer of
+ * compressed points, each with the type byte of ec.serialize if typed is set.
+ */
+static PyObject *PointArray_deserialize(PyTypeObject *type, PyObject *args) {
+    ECGroup *gobj = NULL;
+    PyObject *buffer = NULL;
+    Py_buffer view;
+    ECArray *arr;
+    EC_POINT **P = NULL;
+    BN_CTX *ctx;
+    int typed = FALSE, ok = TRUE;
+    Py_ssize_t i, j, n, bad = -1;
+    size_t width;
+
+    if(!PyArg_ParseTuple(args, "OO|p", &gobj, &buffer, &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    width = pointLen(gobj) + (typed ? 1 : 0);
+    if(PyObject_GetBuffer(buffer, &view, PyBUF_SIMPLE) < 0) return NULL;
+    if(view.len % width != 0) {
+        PyBuffer_Release(&view);
+        EXIT_IF(TRUE, "buffer length is not a multiple of the serialized point size.");
+    }
+    n = view.len / width;
+    arr = newArray(G, gobj, n);
+    P = newPoints(gobj, n < ARRAY_BLOCK ? n : ARRAY_BLOCK);
+    ctx = acquireCtx(gobj);
+    if(arr == NULL || P == NULL || ctx == NULL) {
+        PyBuffer_Release(&view);
+        Py_XDECREF(arr);
+        freePoints(P, n < ARRAY_BLOCK ? n : ARRAY_BLOCK);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    const uint8_t *in = (const uint8_t *) view.buf;
+    BN_CTX_start(ctx);
+    BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx);
+    ok = y != NULL;
+    for(i = 0; i < n && ok && bad < 0; i += ARRAY_BLOCK) {
+        Py_ssize_t m = n - i < ARRAY_BLOCK ? n - i : ARRAY_BLOCK;
+        for(j = 0; j < m && bad < 0; j++, in += width) {
+            if((typed && in[0] != G) ||
+               !EC_POINT_oct2point(gobj->ec_group, P[j], in + (typed ? 1 : 0), width - (typed ? 1 : 0), ctx) ||
+               !EC_POINT_is_on_curve(gobj->ec_group, P[j], ctx)) {
+                bad = i + j;
+            }
+        }
+        if(bad < 0)
+            ok = storePoints(gobj, P, m, arr->data + i * arr->width, x, y, ctx);
+    }
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(P, n < ARRAY_BLOCK ? n : ARRAY_BLOCK);
+    PyBuffer_Release(&view);
+    if(!ok || bad >= 0) {
+        Py_DECREF(arr);
+        if(bad >= 0) PyErr_Format(PyECErrorObject, "invalid point at index %zd.", bad);
+        else PyErr_SetString(PyECErrorObject, "could not deserialize points.");
+        return NULL;
+    }
+    return (PyObject *) arr;
+}
+
+/*
+ * PointArray.serialize(typed=False): all points compressed in one bytes
+ * object, each with the type byte of ec.serialize if typed is set
+ */
+static PyObject *PointArray_serialize(ECArray *self, PyObject *args) {
+    PyObject *result;
+    EC_POINT *P;
+    BN_CTX *ctx;
+    int typed = FALSE;
+    Py_ssize_t i, bad = -1;
+    size_t len = pointLen(self->group), width;
+
+    if(!PyArg_ParseTuple(args, "|p", &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    width = len + (typed ? 1 : 0);
+    result = PyBytes_FromStringAndSize(NULL, self->len * width);
+    P = EC_POINT_new(self->group->ec_group);
+    ctx = acquireCtx(self->group);
+    if(result == NULL || P == NULL || ctx == NULL) {
+        Py_XDECREF(result);
+        EC_POINT_free(P);
+        if(ctx != NULL) releaseCtx(self->group, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    uint8_t *out = (uint8_t *) PyBytes_AS_STRING(result);
+    BN_CTX_start(ctx);
+    BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx);
+    for(i = 0; i < self->len && bad < 0; i++, out += width) {
+        if(typed) out[0] = G;
+        // the point at infinity has no fixed-width encoding
+        if(y == NULL || !loadPoint(self->group, P, self->data + i * self->width, x, y, ctx) ||
+           EC_POINT_is_at_infinity(self->group->ec_group, P) ||
+           !compressPoint(self->group, x, y, out + (typed ? 1 : 0))) {
+            bad = i;
+        }
+    }
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(self->group, ctx);
+    EC_POINT_free(P);
+    if(bad >= 0) {
+        Py_DECREF(result);
+        PyErr_Format(PyECErrorObject, "could not serialize point at index %zd.", bad);
+        return NULL;
+    }
+    return result;
+}
+
+static PyObject *ECArray_tolist(ECArray *self, PyObject *args) {
+    PyObject *list = PyList_New(self->len), *item;
+    Py_ssize_t i;
+
+    if(list == NULL) return NULL;
+    for(i = 0; i < self->len; i++) {
+        if((item = arrayItem(self, i)) == NULL) {
+            Py_DECREF(list);
+            return NULL;
+        }
+        PyList_SET_ITEM(list, i, item);
+    }
+    return list;
+}
+
+/*
+ * equal(other): list of the elementwise equality with an array of the same
+ * length (the fixed-width forms are canonical, so this compares bytes)
+ */
+static PyObject *ECArray_equal(ECArray *self, PyObject *other) {
+    ECArray *o = (ECArray *) other;
+    PyObject *list;
+    Py_ssize_t i;
+
+    EXIT_IF(Py_TYPE(other) != Py_TYPE(self) || o->group->nid != self->group->nid,
+            "expected an array of the same kind and group.");
+    EXIT_IF(o->len != self->len, "arrays have different lengths.");
+    if((list = PyList_New(self->len)) == NULL) return NULL;
+    for(i = 0; i < self->len; i++) {
+        PyObject *b = memcmp(self->data + i * self->width, o->data + i * o->width, self->width) == 0 ? Py_True : Py_False;
+        Py_INCREF(b);
+        PyList_SET_ITEM(list, i, b);
+    }
+    return list;
+}
+
+static PyObject *ECArray_zeroize(ECArray *self, PyObject *args) {
+    OPENSSL_cleanse(self->data, self->len * self->width);
+    Py_RETURN_NONE;
+}
+
+static PyObject *ECArray_richcompare(PyObject *o1, PyObject *o2, int op) {
+    ECArray *a = (ECArray *) o1, *b = (ECArray *) o2;
+    int equal;
+
+    if((op != Py_EQ && op != Py_NE) || Py_TYPE(o1) != Py_TYPE(o2)) {
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+    equal = a->group->nid == b->group->nid && a->len == b->len &&
+            memcmp(a->data, b->data, a->len * a->width) == 0;
+    if(equal == (op == Py_EQ)) Py_RETURN_TRUE;
+    Py_RETURN_FALSE;
+}
+
+static Py_ssize_t ECArray_length(ECArray *self) {
+    return self->len;
+}
+
+static PyObject *ECArray_subscript(ECArray *self, PyObject *key) {
+    Py_ssize_t start, stop, step, n, i;
+    ECArray *arr;
+
+    if(!PySlice_Check(key)) {
+        Py_ssize_t i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+        if(i == -1 && PyErr_Occurred()) return NULL;
+        return arrayItem(self, i);
+    }
+    if(PySlice_GetIndicesEx(key, self->len, &start, &stop, &step, &n) < 0) return NULL;
+    if((arr = newArray(self->type, self->group, n)) == NULL) return NULL;
+    if(step == 1) {
+        memcpy(arr->data, self->data + start * self->width, n * self->width);
+    }
+    else {
+        for(i = 0; i < n; i++)
+            memcpy(arr->data + i * self->width, self->data + (start + i * step) * self->width, self->width);
+    }
+    return (PyObject *) arr;
+}
+
+/*
+ * a[i] = element, or a[i:j] = array of the same kind and of the slice length
+ */
+static int ECArray_ass_subscript(ECArray *self, PyObject *key, PyObject *value) {
+    Py_ssize_t start, stop, step, n, i;
+    ECArray *src = (ECArray *) value;
+
+    if(value == NULL) {
+        PyErr_SetString(PyExc_TypeError, "array elements cannot be deleted");
+        return -1;
+    }
+    if(!PySlice_Check(key)) {
+        i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+        if(i == -1 && PyErr_Occurred()) return -1;
+        if(i < 0) i += self->len;
+        if(i < 0 || i >= self->len) {
+            PyErr_SetString(PyExc_IndexError, "array assignment index out of range");
+            return -1;
+        }
+        return storeItems(self, &value, 1, self->data + i * self->width) ? 0 : -1;
+    }
+
+    if(PySlice_GetIndicesEx(key, self->len, &start, &stop, &step, &n) < 0) return -1;
+    if(Py_TYPE(value) != Py_TYPE(self) || src->group->nid != self->group->nid || src->len != n) {
+        PyErr_SetString(PyECErrorObject, "slices can only be assigned an array of the same kind, group and length.");
+        return -1;
+    }
+    if(step == 1) {
+        memmove(self->data + start * self->width, src->data, n * self->width);
+    }
+    else {
+        for(i = 0; i < n; i++)
+            memmove(self->data + (start + i * step) * self->width, src->data + i * self->width, self->width);
+    }
+    return 0;
+}
+
+static int ECArray_getbuffer(ECArray *self, Py_buffer *view, int flags) {
+    return PyBuffer_FillInfo(view, (PyObject *) self, self->data, self->len * self->width, TRUE, flags);
+}
+
+/*
+ * Operand of an elementwise operation: an array of the same length, a single
+ * element (or a non-negative int for scalars) applied to every element.
+ */
+typedef struct {
+    ECArray *arr;
+    EC_POINT *P;
+    BIGNUM *k;
+    BIGNUM *owned;
+} Operand;
+
+static int getOperand(PyObject *obj, GroupType type, ECArray *like, Operand *op) {
+    memset(op, 0, sizeof(Operand));
+    if((type == G && PyPointArray_Check(obj)) || (type == ZR && PyScalarArray_Check(obj))) {
+        op->arr = (ECArray *) obj;
+        if(op->arr->group->nid != like->group->nid) {
+            PyErr_SetString(PyECErrorObject, "mixing group elements from different curves.");
+            return FALSE;
+        }
+        if(op->arr->len != like->len) {
+            PyErr_SetString(PyECErrorObject, "arrays have different lengths.");
+            return FALSE;
+        }
+        return TRUE;
+    }
+    if(PyEC_Check(obj) && ((ECElement *) obj)->type == type) {
+        if(((ECElement *) obj)->group->nid != like->group->nid) {
+            PyErr_SetString(PyECErrorObject, "mixing group elements from different curves.");
+            return FALSE;
+        }
+        if(type == G) op->P = ((ECElement *) obj)->P;
+        else op->k = ((ECElement *) obj)->elemZ;
+        return TRUE;
+    }
+    if(type == ZR && PyLong_Check(obj) && Py_SIZE(obj) >= 0) {
+        op->owned = BN_new();
+        setBigNum((PyLongObject *) obj, &op->owned);
+        op->k = op->owned;
+        return TRUE;
+    }
+    return FALSE;
+}
+
+/*
+ * Elementwise operations on points: a * b, a / b (group law) and a ** k.
+ * b is a PointArray or a point, k a ScalarArray or a scalar.
+ */
+static PyObject *pointArrayOp(ECArray *a, Operand *b, int op) {
+    ECGroup *gobj = a->group;
+    ECArray *ans;
+    EC_POINT **P = NULL, *Q = NULL;
+    BN_CTX *ctx;
+    Py_ssize_t i, j, n = a->len, blk = n < ARRAY_BLOCK ? n : ARRAY_BLOCK;
+    int ok = TRUE;
+
+    ans = newArray(G, gobj, n);
+    P = newPoints(gobj, blk);
+    Q = EC_POINT_new(gobj->ec_group);
+    ctx = acquireCtx(gobj);
+    if(ans == NULL || P == NULL || Q == NULL || ctx == NULL) {
+        Py_XDECREF(ans);
+        freePoints(P, blk);
+        EC_POINT_free(Q);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        BN_free(b->owned);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    BN_CTX_start(ctx);
+    BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx), *k = BN_CTX_get(ctx);
+    ok = k != NULL;
+    if(ok && b->P != NULL) {
+        ok = EC_POINT_copy(Q, b->P) && (op != ARRAY_DIV || EC_POINT_invert(gobj->ec_group, Q, ctx));
+    }
+    for(i = 0; i < n && ok; i += blk) {
+        Py_ssize_t m = n - i < blk ? n - i : blk;
+        for(j = 0; j < m && ok; j++) {
+            ok = loadPoint(gobj, P[j], a->data + (i + j) * a->width, x, y, ctx);
+            if(ok && op == ARRAY_POW) {
+                const BIGNUM *e = b->k;
+                if(b->arr != NULL) {
+                    ok = BN_bin2bn(b->arr->data + (i + j) * b->arr->width, b->arr->width, k) != NULL;
+                    e = k;
+                }
+                ok = ok && mulPoint(gobj, P[j], P[j], e, ctx);
+            }
+            else if(ok) {
+                if(b->arr != NULL) {
+                    ok = loadPoint(gobj, Q, b->arr->data + (i + j) * b->arr->width, x, y, ctx) &&
+                         (op != ARRAY_DIV || EC_POINT_invert(gobj->ec_group, Q, ctx));
+                }
+                ok = ok && EC_POINT_add(gobj->ec_group, P[j], P[j], Q, ctx);
+            }
+        }
+        ok = ok && storePoints(gobj, P, m, ans->data + i * ans->width, x, y, ctx);
+    }
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(P, blk);
+    EC_POINT_free(Q);
+    BN_free(b->owned);
+    if(!ok) {
+        Py_DECREF(ans);
+        EXIT_IF(TRUE, "elementwise operation on points failed.");
+    }
+    UPDATE_BENCH_N(op == ARRAY_POW ? EXPONENTIATION : op == ARRAY_MUL ? MULTIPLICATION : DIVISION, G, gobj, n);
+    return (PyObject *) ans;
+}
+
+/*
+ * Elementwise operations on scalars modulo the order: a + b, a - b, a * b.
+ * If swapped, b is the left operand.
+ */
+static PyObject *scalarArrayOp(ECArray *a, Operand *b, int op, int swapped) {
+    ECGroup *gobj = a->group;
+    ECArray *ans;
+    BN_CTX *ctx;
+    Py_ssize_t i, n = a->len;
+    int ok;
+
+    ans = newArray(ZR, gobj, n);
+    ctx = acquireCtx(gobj);
+    if(ans == NULL || ctx == NULL) {
+        Py_XDECREF(ans);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        BN_free(b->owned);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    BN_CTX_start(ctx);
+    BIGNUM *u = BN_CTX_get(ctx), *v = BN_CTX_get(ctx), *r = BN_CTX_get(ctx);
+    ok = r != NULL && (b->k == NULL || BN_nnmod(v, b->k, gobj->order, ctx));
+    for(i = 0; i < n && ok; i++) {
+        ok = BN_bin2bn(a->data + i * a->width, a->width, u) != NULL;
+        if(ok && b->arr != NULL)
+            ok = BN_bin2bn(b->arr->data + i * b->arr->width, b->arr->width, v) != NULL;
+        if(ok) {
+            const BIGNUM *lhs = swapped ? v : u, *rhs = swapped ? u : v;
+            if(op == ARRAY_ADD) ok = BN_mod_add_quick(r, lhs, rhs, gobj->order);
+            else if(op == ARRAY_SUB) ok = BN_mod_sub_quick(r, lhs, rhs, gobj->order);
+            else ok = BN_mod_mul(r, lhs, rhs, gobj->order, ctx);
+        }
+        ok = ok && BN_bn2binpad(r, ans->data + i * ans->width, ans->width) >= 0;
+    }
+    BN_clear(u);
+    BN_clear(v);
+    BN_clear(r);
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    BN_free(b->owned);
+    if(!ok) {
+        Py_DECREF(ans);
+        EXIT_IF(TRUE, "elementwise operation on scalars failed.");
+    }
+    UPDATE_BENCH_N(op == ARRAY_ADD ? ADDITION : op == ARRAY_SUB ? SUBTRACTION : MULTIPLICATION, ZR, gobj, n);
+    return (PyObject *) ans;
+}
+
+static PyObject *arrayBinaryOp(PyObject *o1, PyObject *o2, int op) {
+    Operand b;
+    int swapped = !PyECArray_Check(o1);
+    ECArray *a = (ECArray *) (swapped ? o2 : o1);
+    PyObject *other = swapped ? o1 : o2;
+
+    if(a->type == G) {
+        // points: a * b, b * a, a / b and a ** k
+        if(swapped && op != ARRAY_MUL) Py_RETURN_NOTIMPLEMENTED;
+        if(op == ARRAY_MUL || op == ARRAY_DIV) {
+            if(!getOperand(other, G, a, &b)) goto fail;
+            return pointArrayOp(a, &b, op);
+        }
+        if(op == ARRAY_POW) {
+            if(!getOperand(other, ZR, a, &b)) goto fail;
+            return pointArrayOp(a, &b, op);
+        }
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+    if(op == ARRAY_ADD || op == ARRAY_SUB || op == ARRAY_MUL) {
+        if(!getOperand(other, ZR, a, &b)) goto fail;
+        return scalarArrayOp(a, &b, op, swapped);
+    }
+    Py_RETURN_NOTIMPLEMENTED;
+
+fail:
+    if(PyErr_Occurred()) return NULL;
+    Py_RETURN_NOTIMPLEMENTED;
+}
+
+static PyObject *ECArray_add(PyObject *o1, PyObject *o2) { return arrayBinaryOp(o1, o2, ARRAY_ADD); }
+static PyObject *ECArray_sub(PyObject *o1, PyObject *o2) { return arrayBinaryOp(o1, o2, ARRAY_SUB); }
+static PyObject *ECArray_mul(PyObject *o1, PyObject *o2) { return arrayBinaryOp(o1, o2, ARRAY_MUL); }
+static PyObject *ECArray_div(PyObject *o1, PyObject *o2) { return arrayBinaryOp(o1, o2, ARRAY_DIV); }
+
+static PyObject *ECArray_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
+    if(o3 != Py_None || !PyPointArray_Check(o1)) Py_RETURN_NOTIMPLEMENTED;
+    return arrayBinaryOp(o1, o2, ARRAY_POW);
+}
+
+/*
+ * ~a: inverses of all scalars with a single modular inversion (Montgomery's trick)
+ */
+static PyObject *ECArray_invert(PyObject *o1) {
+    ECArray *a = (ECArray *) o1, *ans;
+    ECGroup *gobj = a->group;
+    BIGNUM **prefix = NULL;
+    BN_CTX *ctx;
+    Py_ssize_t i, n = a->len;
+    int ok = TRUE;
+
+    EXIT_IF(a->type != ZR, "only scalars can be inverted.");
+    ans = newArray(ZR, gobj, n);
+    prefix = (BIGNUM **) PyMem_Calloc(n > 0 ? n : 1, sizeof(BIGNUM *));
+    ctx = acquireCtx(gobj);
+    if(ans == NULL || prefix == NULL || ctx == NULL) {
+        Py_XDECREF(ans);
+        PyMem_Free(prefix);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    BN_CTX_start(ctx);
+    BIGNUM *u = BN_CTX_get(ctx), *inv = BN_CTX_get(ctx), *r = BN_CTX_get(ctx);
+    ok = r != NULL;
+    // prefix[i] = a[0] * ... * a[i]
+    for(i = 0; i < n && ok; i++) {
+        ok = (prefix[i] = BN_new()) != NULL && BN_bin2bn(a->data + i * a->width, a->width, u) != NULL &&
+             !BN_is_zero(u) && (i == 0 ? BN_copy(prefix[i], u) != NULL : BN_mod_mul(prefix[i], prefix[i - 1], u, gobj->order, ctx));
+    }
+    if(ok && n > 0) ok = BN_mod_inverse(inv, prefix[n - 1], gobj->order, ctx) != NULL;
+    // inv = 1 / (a[0] * ... * a[i]) going down
+    for(i = n - 1; i >= 0 && ok; i--) {
+        ok = (i == 0 ? BN_copy(r, inv) != NULL : BN_mod_mul(r, inv, prefix[i - 1], gobj->order, ctx)) &&
+             BN_bn2binpad(r, ans->data + i * ans->width, ans->width) >= 0 &&
+             BN_bin2bn(a->data + i * a->width, a->width, u) != NULL &&
+             BN_mod_mul(inv, inv, u, gobj->order, ctx);
+    }
+    for(i = 0; i < n; i++) BN_clear_free(prefix[i]);
+    BN_clear(u);
+    BN_clear(inv);
+    BN_clear(r);
+    BN_CTX_end(ctx);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    PyMem_Free(prefix);
+    if(!ok) {
+        Py_DECREF(ans);
+        EXIT_IF(TRUE, "could not invert scalars (is one of them zero?).");
+    }
+    UPDATE_BENCH_N(INVERSION, ZR, gobj, n);
+    return (PyObject *) ans;
+}
+
+static PyObject *ECArray_repr(ECArray *self) {
+    return PyUnicode_FromFormat("<%s of %zd elements of curve %d>", Py_TYPE(self)->tp_name, self->len, self->group->nid);
+}
+
+/*
+ * multiexp(points, scalars) for a PointArray and a ScalarArray
+ */
+PyObject *arrayMultiexp(PyObject *points, PyObject *scalars) {
+    ECArray *a = (ECArray *) points, *b = (ECArray *) scalars;
+    ECGroup *gobj = a->group;
+    ECElement *ans;
+    EC_POINT **P;
+    BIGNUM **k;
+    BN_CTX *ctx;
+    Py_ssize_t i, n = a->len;
+    int ok;
+
+    EXIT_IF(!PyScalarArray_Check(scalars), "expected a ScalarArray of scalars for a PointArray.");
+    EXIT_IF(b->group->nid != gobj->nid, "mixing group elements from different curves.");
+    EXIT_IF(n == 0 || b->len != n, "expected the same non-zero number of points and scalars.");
+
+    ans = createNewPoint(G, gobj);
+    P = newPoints(gobj, n);
+    k = (BIGNUM **) PyMem_Calloc(n, sizeof(BIGNUM *));
+    ctx = acquireCtx(gobj);
+    if(ans == NULL || P == NULL || k == NULL || ctx == NULL) {
+        Py_XDECREF(ans);
+        freePoints(P, n);
+        PyMem_Free(k);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    BN_CTX_start(ctx);
+    BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx);
+    ok = y != NULL;
+    for(i = 0; i < n && ok; i++) {
+        ok = loadPoint(gobj, P[i], a->data + i * a->width, x, y, ctx) &&
+             (k[i] = BN_bin2bn(b->data + i * b->width, b->width, NULL)) != NULL;
+    }
+    BN_CTX_end(ctx);
+    ok = ok && EC_POINTs_mul(gobj->ec_group, ans->P, NULL, n, (const EC_POINT **) P, (const BIGNUM **) k, ctx);
+    for(i = 0; i < n; i++) BN_clear_free(k[i]);
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(P, n);
+    PyMem_Free(k);
+    if(!ok) {
+        Py_DECREF(ans);
+        EXIT_IF(TRUE, "multi-exponentiation failed.");
+    }
+    UPDATE_BENCH_N(MULTIEXP, G, gobj, n);
+    return (PyObject *) ans;
+}
+
+static PyMemberDef ECArray_members[] = {
+    {"group", T_OBJECT, offsetof(ECArray, group), READONLY, "group of the elements"},
+    {"itemsize", T_PYSSIZET, offsetof(ECArray, width), READONLY, "size in bytes of an element in the buffer"},
+    {NULL}
+};
+
+static PyMethodDef PointArray_methods[] = {
+    {"frombytes", (PyCFunction)ECArray_frombytes, METH_VARARGS | METH_CLASS, "Array from the fixed-width form exported by the buffer protocol, checking every point."},
+    {"deserialize", (PyCFunction)PointArray_deserialize, METH_VARARGS | METH_CLASS, "Array from a buffer of compressed points (with type bytes if typed)."},
+    {"serialize", (PyCFunction)PointArray_serialize, METH_VARARGS, "All points compressed in one bytes object (with type bytes if typed)."},
+    {"tolist", (PyCFunction)ECArray_tolist, METH_NOARGS, "List of the elements."},
+    {"equal", (PyCFunction)ECArray_equal, METH_O, "Elementwise equality with another array, as a list."},
+    {"zeroize", (PyCFunction)ECArray_zeroize, METH_NOARGS, "Clears all elements from memory."},
+    {NULL}
+};
+
+static PyMethodDef ScalarArray_methods[] = {
+    {"frombytes", (PyCFunction)ECArray_frombytes, METH_VARARGS | METH_CLASS, "Array from big-endian scalars of the fixed width exported by the buffer protocol."},
+    {"tolist", (PyCFunction)ECArray_tolist, METH_NOARGS, "List of the elements."},
+    {"equal", (PyCFunction)ECArray_equal, METH_O, "Elementwise equality with another array, as a list."},
+    {"zeroize", (PyCFunction)ECArray_zeroize, METH_NOARGS, "Clears all elements from memory."},
+    {NULL}
+};
+
+static PyNumberMethods ECArray_number = {
+    .nb_add = ECArray_add,
+    .nb_subtract = ECArray_sub,
+    .nb_multiply = ECArray_mul,
+    .nb_power = ECArray_pow,
+    .nb_invert = ECArray_invert,
+    .nb_true_divide = ECArray_div,
+};
+
+static PyMappingMethods ECArray_mapping = {
+    .mp_length = (lenfunc)ECArray_length,
+    .mp_subscript = (binaryfunc)ECArray_subscript,
+    .mp_ass_subscript = (objobjargproc)ECArray_ass_subscript,
+};
+
+static PySequenceMethods ECArray_sequence = {
+    .sq_length = (lenfunc)ECArray_length,
+    .sq_item = (ssizeargfunc)arrayItem,
+};
+
+static PyBufferProcs ECArray_buffer = {
+    .bf_getbuffer = (getbufferproc)ECArray_getbuffer,
+};
+
+PyTypeObject PointArrayType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "elliptic_curve.PointArray",
+    .tp_basicsize = sizeof(ECArray),
+    .tp_dealloc = (destructor)ECArray_dealloc,
+    .tp_repr = (reprfunc)ECArray_repr,
+    .tp_as_number = &ECArray_number,
+    .tp_as_sequence = &ECArray_sequence,
+    .tp_as_mapping = &ECArray_mapping,
+    .tp_as_buffer = &ECArray_buffer,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "Contiguous array of points of a group",
+    .tp_richcompare = ECArray_richcompare,
+    .tp_methods = PointArray_methods,
+    .tp_members = ECArray_members,
+    .tp_new = ECArray_new,
+};
+
+PyTypeObject ScalarArrayType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "elliptic_curve.ScalarArray",
+    .tp_basicsize = sizeof(ECArray),
+    .tp_dealloc = (destructor)ECArray_dealloc,
+    .tp_repr = (reprfunc)ECArray_repr,
+    .tp_as_number = &ECArray_number,
+    .tp_as_sequence = &ECArray_sequence,
+    .tp_as_mapping = &ECArray_mapping,
+    .tp_as_buffer = &ECArray_buffer,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_doc = "Contiguous array of elements of ZR of a group",
+    .tp_richcompare = ECArray_richcompare,
+    .tp_methods = ScalarArray_methods,
+    .tp_members = ECArray_members,
+    .tp_new = ECArray_new,
+};
@@ -145,37 +145,115 @@ int hash_to_bytes(uint8_t *input_buf, int input_len, uint8_t *output_buf, int ha
 
 
 /*
- * Create a new point with an existing group object
+ * Create a new point with an existing group object. Elements released
+ * to the group's freelist are reused along with their EC_POINT or BIGNUM.
  */
 ECElement *createNewPoint(GroupType type, ECGroup *gobj) {
     if(type != ZR && type != G) return NULL;
-    ECElement *newObj = PyObject_New(ECElement, &ECType);
+    ECElement *newObj;
+    if(gobj->freelist_len[type] > 0) {
+        newObj = (ECElement *) gobj->freelist[type][--gobj->freelist_len[type]];
+        PyObject_Init((PyObject *) newObj, &ECType);
+    }
+    else if(type == ZR) {
+        newObj = PyObject_New(ECElement, &ECType);
+        newObj->elemZ = BN_new();
+    }
+    else {
+        newObj = PyObject_New(ECElement, &ECType);
+        newObj->P = EC_POINT_new(gobj->ec_group);
+    }
     if(type == ZR) {
         newObj->type = type;
-        newObj->elemZ = BN_new();
         newObj->P = NULL;
     }
     else if(type == G) {
         newObj->type = type;
-        newObj->P = EC_POINT_new(gobj->ec_group);
         newObj->elemZ = NULL;
     }
     newObj->point_init = TRUE;
+    newObj->accumulator = FALSE;
     newObj->group = gobj; // gobj->group
     Py_INCREF(newObj->group);
     return newObj;
 }
 
+/*
+ * Frees the elements kept in the freelists of a group (with the GIL held)
+ */
+static void clearFreelists(ECGroup *gobj) {
+    int t;
+    for(t = ZR; t < NONE_G; t++) {
+        while(gobj->freelist_len[t] > 0) {
+            ECElement *elem = (ECElement *) gobj->freelist[t][--gobj->freelist_len[t]];
+            EC_POINT_free(elem->P);
+            BN_free(elem->elemZ);
+            PyObject_Del(elem);
+        }
+    }
+}
+
+/*
+ * BN_CTX objects for operations which run with the GIL released.
+ * A BN_CTX must not be shared between threads, so every such operation
+ * takes its own context from the group's pool and puts it back afterwards.
+ * The pool itself is only touched while holding the GIL.
+ */
+BN_CTX *acquireCtx(ECGroup *gobj) {
+    if(gobj->ctx_pool_len > 0)
+        return gobj->ctx_pool[--gobj->ctx_pool_len];
+    return BN_CTX_new();
+}
+
+void releaseCtx(ECGroup *gobj, BN_CTX *ctx) {
+    if(gobj->ctx_pool_len < CTX_POOL_MAX)
+        gobj->ctx_pool[gobj->ctx_pool_len++] = ctx;
+    else
+        BN_CTX_free(ctx);
+}
+
+/* Length of a compressed point encoding (without the serialization type byte) */
+size_t pointLen(ECGroup *gobj) {
+    return 1 + (EC_GROUP_get_degree(gobj->ec_group) + 7) / 8;
+}
+
 int ECElement_init(ECElement *self, PyObject *args, PyObject *kwds)
 {
     return 0;
 }
 
 
+/*
+ * Clears a point in place, leaving the point at infinity: its coordinates
+ * are overwritten with those of the generator first, as setting it to
+ * infinity only zeroes Z. The EC_POINT itself is kept, so that operations
+ * running without the GIL on it never see freed memory.
+ */
+void clearPoint(ECGroup *gobj, EC_POINT *P) {
+    const EC_POINT *gen = EC_GROUP_get0_generator(gobj->ec_group);
+
+    if(gen != NULL) EC_POINT_copy(P, gen);
+    EC_POINT_set_to_infinity(gobj->ec_group, P);
+}
+
 void ECElement_dealloc(ECElement* self) {
+    ECGroup *gobj = self->group;
+
+    /* keep the element for reuse by createNewPoint, clearing its value */
+    if(gobj != NULL && Py_TYPE(self) == &ECType && self->point_init &&
+       (self->type == ZR ? self->elemZ != NULL : self->type == G && self->P != NULL) &&
+       gobj->freelist_len[self->type] < FREELIST_MAX) {
+        if(self->type == ZR) BN_clear(self->elemZ);
+        else clearPoint(gobj, self->P);
+        gobj->freelist[self->type][gobj->freelist_len[self->type]++] = (PyObject *) self;
+        // may free the group, and this element with its freelists
+        Py_DECREF(gobj);
+        return;
+    }
+
     /* clear structure */
-    if(self->point_init && self->type == G)  { debug("clearing ec point.\n"); EC_POINT_free(self->P);    }
-    if(self->point_init && self->type == ZR) { debug("clearing ec zr element.\n"); BN_free(self->elemZ); }
+    if(self->point_init && self->type == G)  { debug("clearing ec point.\n"); EC_POINT_clear_free(self->P);    }
+    if(self->point_init && self->type == ZR) { debug("clearing ec zr element.\n"); BN_clear_free(self->elemZ); }
     Py_XDECREF(self->group);
     Py_TYPE(self)->tp_free((PyObject*)self);
 }
@@ -192,30 +270,138 @@ PyObject *ECElement_new(PyTypeObject *type, PyObject *args, PyObject *kwds) {
         self->P = NULL;
         self->elemZ = NULL;
         self->point_init = FALSE;
+        self->accumulator = FALSE;
     }
     return (PyObject *) self;
 }
 
+static void freeEncodeParams(EncodeParams *params) {
+    if(params == NULL) return;
+    mpz_clears(params->p, params->a, params->b, params->sqrt_exp, NULL);
+    BN_free(params->bn_p);
+    free(params);
+}
+
+static int bnToMPZ(mpz_t m, const BIGNUM *n) {
+    char *hex = BN_bn2hex(n);
+    int ok = hex != NULL && mpz_set_str(m, hex, 16) == 0;
+    OPENSSL_free(hex);
+    return ok;
+}
+
+/* Returns the encoding parameters of a group (see encodeChunk) */
+static EncodeParams *newEncodeParams(ECGroup *gobj) {
+    EncodeParams *params = (EncodeParams *) calloc(1, sizeof(EncodeParams));
+    BIGNUM *a = BN_new(), *b = BN_new();
+    int ok;
+
+    if(params == NULL) {
+        BN_free(a);
+        BN_free(b);
+        return NULL;
+    }
+    mpz_inits(params->p, params->a, params->b, params->sqrt_exp, NULL);
+    params->bn_p = BN_new();
+    ok = params->bn_p != NULL && a != NULL && b != NULL &&
+         EC_GROUP_get_curve_GFp(gobj->ec_group, params->bn_p, a, b, gobj->ctx) &&
+         bnToMPZ(params->p, params->bn_p) && bnToMPZ(params->a, a) && bnToMPZ(params->b, b);
+    if(ok && mpz_fdiv_ui(params->p, 4) == 3) {
+        mpz_add_ui(params->sqrt_exp, params->p, 1);
+        mpz_fdiv_q_2exp(params->sqrt_exp, params->sqrt_exp, 2);
+    }
+    BN_free(a);
+    BN_free(b);
+    if(!ok) {
+        freeEncodeParams(params);
+        return NULL;
+    }
+    return params;
+}
+
+/*
+ * Compute r = k * P with EC_POINT_mul, whose running time does not depend
+ * on k: the path for all secret scalars. r may be P. Safe to call without
+ * the GIL.
+ */
+int mulPoint(ECGroup *gobj, EC_POINT *r, const EC_POINT *P, const BIGNUM *k, BN_CTX *ctx) {
+    return EC_POINT_mul(gobj->ec_group, r, NULL, P, k, ctx);
+}
+
+/* ans = k * base, computed without the GIL */
+static int powPoint(ECElement *ans, ECElement *base, const BIGNUM *k) {
+    ECGroup *gobj = ans->group;
+    BN_CTX *ctx = acquireCtx(gobj);
+    int ok;
+
+    if(ctx == NULL) return FALSE;
+    Py_BEGIN_ALLOW_THREADS;
+    ok = mulPoint(gobj, ans->P, base->P, k, ctx);
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    return ok;
+}
+
+/* ans = a ^ e mod order, computed without the GIL */
+static int powZR(ECElement *ans, const BIGNUM *a, const BIGNUM *e) {
+    ECGroup *gobj = ans->group;
+    BN_CTX *ctx = acquireCtx(gobj);
+    int ok;
+
+    if(ctx == NULL) return FALSE;
+    Py_BEGIN_ALLOW_THREADS;
+    ok = BN_mod_exp(ans->elemZ, a, e, gobj->order, ctx);
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    return ok;
+}
+
+/*
+ * ans = a + b (or a - b if 'subtract' is set) for points, computed without the GIL.
+ * ans->P may be a (in-place operators).
+ */
+static int addPoints(ECElement *ans, const EC_POINT *a, const EC_POINT *b, int subtract) {
+    ECGroup *gobj = ans->group;
+    BN_CTX *ctx = acquireCtx(gobj);
+    int ok;
+
+    if(ctx == NULL) return FALSE;
+    Py_BEGIN_ALLOW_THREADS;
+    if(subtract && ans->P == a) {
+        // a - b = -(-a + b), without a temporary point
+        ok = EC_POINT_invert(gobj->ec_group, ans->P, ctx) &&
+             EC_POINT_add(gobj->ec_group, ans->P, ans->P, b, ctx) &&
+             EC_POINT_invert(gobj->ec_group, ans->P, ctx);
+    }
+    else if(subtract) {
+        ok = EC_POINT_copy(ans->P, b) &&
+             EC_POINT_invert(gobj->ec_group, ans->P, ctx) &&
+             EC_POINT_add(gobj->ec_group, ans->P, a, ans->P, ctx);
+    }
+    else {
+        ok = EC_POINT_add(gobj->ec_group, ans->P, a, b, ctx);
+    }
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    return ok;
+}
+
 void ECGroup_dealloc(ECGroup *self)
 {
+    clearFreelists(self);
     if(self->group_init == TRUE && self->ec_group != NULL) {
         Py_BEGIN_ALLOW_THREADS;
         debug("clearing ec group struct.\n");
+        freeEncodeParams(self->encode);
+        self->encode = NULL;
         EC_GROUP_clear_free(self->ec_group);
         BN_free(self->order);
         BN_CTX_free(self->ctx);
+        while(self->ctx_pool_len > 0)
+            BN_CTX_free(self->ctx_pool[--self->ctx_pool_len]);
         self->group_init = FALSE;
         Py_END_ALLOW_THREADS;
     }
 
-#ifdef BENCHMARK_ENABLED
-    if(self->dBench != NULL) {
-        Py_CLEAR(self->dBench);
-        if(self->gBench != NULL) {
-            Py_CLEAR(self->gBench);
-        }
-    }
-#endif
     debug("Releasing ECGroup object!\n");
     Py_TYPE(self)->tp_free((PyObject *) self);
 }
@@ -225,14 +411,18 @@ PyObject *ECGroup_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
     ECGroup *self = (ECGroup *) type->tp_alloc(type, 0);
     if(self != NULL) {
         self->group_init = FALSE;
+        self->checked    = FALSE;
         self->nid        = -1;
         self->ec_group   = NULL;
         self->order         = BN_new();
         self->ctx        = BN_CTX_new();
+        self->encode     = NULL;
+        self->ctx_pool_len = 0;
+        self->freelist_len[ZR] = self->freelist_len[G] = 0;
+        memset(self->counters, 0, sizeof(self->counters));
 #ifdef BENCHMARK_ENABLED
-        memset(self->bench_id, 0, ID_LEN);
-        self->dBench = NULL;
-        self->gBench = NULL;
+        self->bench_active = FALSE;
+        memset(self->bench, 0, sizeof(self->bench));
 #endif
     }
 
@@ -243,12 +433,12 @@ int ECGroup_init(ECGroup *self, PyObject *args, PyObject *kwds)
 {
     PyObject *pObj = NULL, *aObj = NULL, *bObj = NULL;
     char *params = NULL, *param_string = NULL;
-    int pf_len, ps_len, nid;
-    static char *kwlist[] = {"params", "param_string", "p", "a", "b", "nid", NULL};
+    int pf_len, ps_len, nid = 0, check = TRUE;
+    static char *kwlist[] = {"params", "param_string", "p", "a", "b", "nid", "check", NULL};
 
-    if (! PyArg_ParseTupleAndKeywords(args, kwds, "|s#s#OOOi", kwlist,
+    if (! PyArg_ParseTupleAndKeywords(args, kwds, "|s#s#OOOii", kwlist,
                                       &params, &pf_len, &param_string, &ps_len,
-                                      &pObj, &aObj, &bObj, &nid)) {
+                                      &pObj, &aObj, &bObj, &nid, &check)) {
         return -1;
     }
 
@@ -304,11 +494,16 @@ int ECGroup_init(ECGroup *self, PyObject *args, PyObject *kwds)
 #ifdef DEBUG
         printf("OK!\n");
 #endif
-        debug("ec group check...\n");
-        if(!EC_GROUP_check(self->ec_group, self->ctx)) {
-            EC_GROUP_free(self->ec_group);
-            PyErr_SetString(PyECErrorObject, "group check failed, try another curve.");
-            return -1;
+        // check=False defers the group check to ec.check
+        if(check) {
+            debug("ec group check...\n");
+            if(!EC_GROUP_check(self->ec_group, self->ctx)) {
+                EC_GROUP_free(self->ec_group);
+                self->ec_group = NULL;
+                PyErr_SetString(PyECErrorObject, "group check failed, try another curve.");
+                return -1;
+            }
+            self->checked = TRUE;
         }
         self->nid = nid;
 #ifdef DEBUG
@@ -322,6 +517,10 @@ int ECGroup_init(ECGroup *self, PyObject *args, PyObject *kwds)
 
     // obtain the order of the elliptic curve and store in group object
     EC_GROUP_get_order(self->ec_group, self->order, self->ctx);
+    if((self->encode = newEncodeParams(self)) == NULL) {
+        PyErr_SetString(PyECErrorObject, "could not initialize ec group.");
+        return -1;
+    }
     self->group_init = TRUE;
     return 0;
 }
@@ -482,6 +681,23 @@ static PyObject *ECE_is_infinity(ECElement *self, PyObject *args) {
      return Py_False;
 }
 
+/*
+ * Wipes the secret held by an element: a scalar becomes 0 and a point the
+ * point at infinity, with the memory of the old value cleared. The value is
+ * cleared in place, as operations on it may be running without the GIL.
+ */
+static PyObject *ECE_zeroize(ECElement *self, PyObject *args) {
+
+    Point_Init(self);
+    if(self->type == ZR) {
+        BN_clear(self->elemZ);
+    }
+    else {
+        clearPoint(self->group, self->P);
+    }
+    Py_RETURN_NONE;
+}
+
 static PyObject *ECE_add(PyObject *o1, PyObject *o2) {
     ECElement *lhs = NULL, *rhs = NULL, *ans = NULL;
     int foundLHS = FALSE, foundRHS = FALSE;
@@ -497,9 +713,7 @@ static PyObject *ECE_add(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, rhs->group);
             BN_mod_add(ans->elemZ, lhs_val, rhs->elemZ, ans->group->order, ans->group->ctx);
             BN_free(lhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(ADDITION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -512,9 +726,7 @@ static PyObject *ECE_add(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, lhs->group); // ->group, lhs->ctx);
             BN_mod_add(ans->elemZ, lhs->elemZ, rhs_val, ans->group->order, ans->group->ctx);
             BN_free(rhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(ADDITION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -528,9 +740,7 @@ static PyObject *ECE_add(PyObject *o1, PyObject *o2) {
             // easy, just call BN_add
             ans = createNewPoint(ZR, lhs->group);
             BN_mod_add(ans->elemZ, lhs->elemZ, rhs->elemZ, ans->group->order, ans->group->ctx);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(ADDITION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
         else { // if(lhs->type == G && rhs->type == ZR) or vice versa operation undefined...
@@ -563,9 +773,7 @@ static PyObject *ECE_sub(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, rhs->group); // ->group, rhs->ctx);
             BN_mod_sub(ans->elemZ, lhs_val, rhs->elemZ, ans->group->order, ans->group->ctx);
             BN_free(lhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(SUBTRACTION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -579,9 +787,7 @@ static PyObject *ECE_sub(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, lhs->group);
             BN_mod_sub(ans->elemZ, lhs->elemZ, rhs_val, ans->group->order, ans->group->ctx);
             BN_free(rhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(SUBTRACTION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -594,9 +800,7 @@ static PyObject *ECE_sub(PyObject *o1, PyObject *o2) {
             IS_SAME_GROUP(lhs, rhs);
             ans = createNewPoint(ZR, lhs->group);
             BN_mod_sub(ans->elemZ, lhs->elemZ, rhs->elemZ, ans->group->order, ans->group->ctx);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(SUBTRACTION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
         else {
@@ -625,9 +829,7 @@ static PyObject *ECE_mul(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, rhs->group);
             BN_mod_mul(ans->elemZ, lhs_val, rhs->elemZ, ans->group->order, ans->group->ctx);
             BN_free(lhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(MULTIPLICATION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -641,9 +843,7 @@ static PyObject *ECE_mul(PyObject *o1, PyObject *o2) {
             ans = createNewPoint(ZR, lhs->group); // ->group, lhs->ctx);
             BN_mod_mul(ans->elemZ, lhs->elemZ, rhs_val, ans->group->order, ans->group->ctx);
             BN_free(rhs_val);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(MULTIPLICATION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -655,7 +855,7 @@ static PyObject *ECE_mul(PyObject *o1, PyObject *o2) {
 
         if(ElementG(lhs, rhs)) {
             ans = createNewPoint(G, lhs->group);
-            EC_POINT_add(ans->group->ec_group, ans->P, lhs->P, rhs->P, ans->group->ctx);
+            addPoints(ans, lhs->P, rhs->P, FALSE);
         }
         else if(ElementZR(lhs, rhs)) {
             ans = createNewPoint(ZR, lhs->group);
@@ -665,9 +865,7 @@ static PyObject *ECE_mul(PyObject *o1, PyObject *o2) {
 
             EXIT_IF(TRUE, "elements are not of the same type.");
         }
-#ifdef BENCHMARK_ENABLED
         UPDATE_BENCH(MULTIPLICATION, ans->type, ans->group);
-#endif
         return (PyObject *) ans;
     }
 
@@ -695,9 +893,7 @@ static PyObject *ECE_div(PyObject *o1, PyObject *o2) {
             BN_div(ans->elemZ, rm, lhs_val, rhs->elemZ, ans->group->ctx);
             BN_free(lhs_val);
             BN_free(rm);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(DIVISION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -713,9 +909,7 @@ static PyObject *ECE_div(PyObject *o1, PyObject *o2) {
             BN_div(ans->elemZ, rm, lhs->elemZ, rhs_val, ans->group->ctx);
             BN_free(rhs_val);
             BN_free(rm);
-#ifdef BENCHMARK_ENABLED
             UPDATE_BENCH(DIVISION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
     }
@@ -726,12 +920,8 @@ static PyObject *ECE_div(PyObject *o1, PyObject *o2) {
         IS_SAME_GROUP(lhs, rhs);
 
         if(ElementG(lhs, rhs)) {
-            ECElement *rhs_neg = negatePoint(rhs);
-            if(rhs_neg != NULL) {
-                ans = createNewPoint(G, lhs->group);
-                EC_POINT_add(ans->group->ec_group, ans->P, lhs->P, rhs_neg->P, ans->group->ctx);
-            }
-            Py_DECREF(rhs_neg);
+            ans = createNewPoint(G, lhs->group);
+            addPoints(ans, lhs->P, rhs->P, TRUE);
         }
         else if(ElementZR(lhs, rhs)) {
             ans = createNewPoint(ZR, lhs->group);
@@ -743,9 +933,7 @@ static PyObject *ECE_div(PyObject *o1, PyObject *o2) {
 
             EXIT_IF(TRUE, "elements not the same type.");
         }
-#ifdef BENCHMARK_ENABLED
         UPDATE_BENCH(DIVISION, ans->type, ans->group);
-#endif
         return (PyObject *) ans;
     }
 
@@ -808,7 +996,7 @@ static PyObject *ECE_rem(PyObject *o1, PyObject *o2) {
 
 static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
     ECElement *lhs = NULL, *rhs = NULL, *ans = NULL;
-    int foundLHS = FALSE, foundRHS = FALSE;
+    int foundLHS = FALSE, foundRHS = FALSE, ok = TRUE;
 
     Check_Types2(o1, o2, lhs, rhs, foundLHS, foundRHS);
 
@@ -818,11 +1006,13 @@ static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
             BIGNUM *lhs_val = BN_new();
             setBigNum((PyLongObject *) o1, &lhs_val);
             ans = createNewPoint(ZR, rhs->group);
-            BN_mod_exp(ans->elemZ, lhs_val, rhs->elemZ, ans->group->order, ans->group->ctx);
+            ok = powZR(ans, lhs_val, rhs->elemZ);
             BN_free(lhs_val);
-#ifdef BENCHMARK_ENABLED
+            if(!ok) {
+                Py_DECREF(ans);
+                EXIT_IF(TRUE, "could not exponentiate.");
+            }
             UPDATE_BENCH(EXPONENTIATION, ans->type, ans->group);
-#endif
             return (PyObject *) ans;
         }
         EXIT_IF(TRUE, "element type combination not supported.");
@@ -839,7 +1029,7 @@ static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
                     setBigNum((PyLongObject *) o2, &rhs_val);
 
                     ans = createNewPoint(ZR, lhs->group);
-                    BN_mod_exp(ans->elemZ, lhs->elemZ, rhs_val, ans->group->order, ans->group->ctx);
+                    ok = powZR(ans, lhs->elemZ, rhs_val);
                     BN_free(rhs_val);
             }
             else if(rhs == -1) {
@@ -858,7 +1048,8 @@ static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
                     BIGNUM *rhs_val = BN_new();
                     setBigNum((PyLongObject *) o2, &rhs_val);
                     ans = createNewPoint(G, lhs->group); // ->group, lhs->ctx);
-                    EC_POINT_mul(ans->group->ec_group, ans->P, NULL, lhs->P, rhs_val, ans->group->ctx);
+                    ok = powPoint(ans, lhs, rhs_val);
+                    BN_free(rhs_val);
             }
             else if(rhs == -1) {
                 debug("finding modular inverse.\n");
@@ -871,9 +1062,12 @@ static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
         else {
             EXIT_IF(TRUE, "element type combination not supported.");
         }
-#ifdef BENCHMARK_ENABLED
+        EXIT_IF(ans == NULL, "could not find inverse of element.");
+        if(!ok) {
+            Py_DECREF(ans);
+            EXIT_IF(TRUE, "could not exponentiate.");
+        }
         UPDATE_BENCH(EXPONENTIATION, ans->type, ans->group);
-#endif
         return (PyObject *) ans;
     }
     else {
@@ -884,25 +1078,107 @@ static PyObject *ECE_pow(PyObject *o1, PyObject *o2, PyObject *o3) {
 
         if(lhs->type == G && rhs->type == ZR) {
             ans = createNewPoint(G, lhs->group);
-            EC_POINT_mul(ans->group->ec_group, ans->P, NULL, lhs->P, rhs->elemZ, ans->group->ctx);
+            ok = powPoint(ans, lhs, rhs->elemZ);
         }
         else if(ElementZR(lhs, rhs)) {
             ans = createNewPoint(ZR, lhs->group);
-            BN_mod_exp(ans->elemZ, lhs->elemZ, rhs->elemZ, ans->group->order, ans->group->ctx);
+            ok = powZR(ans, lhs->elemZ, rhs->elemZ);
         }
         else {
 
             EXIT_IF(TRUE, "cannot exponentiate two points.");
         }
-#if BENCHMARK_ENABLED
+        if(!ok) {
+            Py_DECREF(ans);
+            EXIT_IF(TRUE, "could not exponentiate.");
+        }
         UPDATE_BENCH(EXPONENTIATION, ans->type, ans->group);
-#endif
         return (PyObject *) ans;
     }
 
     EXIT_IF(TRUE, "invalid arguments.");
 }
 
+/*
+ * _mulInto(acc, x) and _addInto(acc, x): acc = acc * x and acc = acc + x,
+ * stored in the EC_POINT or BIGNUM of acc, for the running products and
+ * sums of internal loops (lambda_coeffs, poly_eval). acc must come from
+ * _accumulator, a private copy no other code refers to; any other element
+ * is refused, as it may be shared or read by an operation running without
+ * the GIL. Elements otherwise have value semantics: the in-place operators
+ * are the binary ones and return a new element.
+ */
+static PyObject *inplaceOp(PyObject *args, int add) {
+    ECElement *lhs = NULL, *rhs = NULL;
+    PyObject *o2 = NULL;
+    ECGroup *gobj;
+    BIGNUM *k = NULL, *owned = NULL;
+    int ok;
+
+    if(!PyArg_ParseTuple(args, "OO", &lhs, &o2)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    EXIT_IF(Py_TYPE(lhs) != &ECType || !lhs->point_init, "accumulator must be an initialized element.");
+    EXIT_IF(!lhs->accumulator, "accumulator must be created with _accumulator.");
+    gobj = lhs->group;
+    if(PyEC_Check(o2)) {
+        rhs = (ECElement *) o2;
+        EXIT_IF(!rhs->point_init, "element not initialized.");
+        EXIT_IF(rhs->group->nid != gobj->nid, "mixing group elements from different curves.");
+        EXIT_IF(rhs->type != lhs->type, "mismatched element types.");
+        if(rhs->type == ZR) k = rhs->elemZ;
+    }
+    else if(PyLong_Check(o2) && Py_SIZE(o2) >= 0 && lhs->type == ZR) {
+        owned = BN_new();
+        setBigNum((PyLongObject *) o2, &owned);
+        k = owned;
+    }
+    else {
+        EXIT_IF(TRUE, "invalid argument type.");
+    }
+
+    if(lhs->type == ZR) {
+        // same arithmetic as the binary operators
+        if(add) ok = BN_mod_add(lhs->elemZ, lhs->elemZ, k, gobj->order, gobj->ctx);
+        else ok = BN_mod_mul(lhs->elemZ, lhs->elemZ, k, gobj->order, gobj->ctx);
+        UPDATE_BENCH(add ? ADDITION : MULTIPLICATION, ZR, gobj);
+    }
+    else {
+        // the group law of G is written multiplicatively
+        EXIT_IF(add, "cannot add points.");
+        ok = addPoints(lhs, lhs->P, rhs->P, FALSE);
+        UPDATE_BENCH(MULTIPLICATION, G, gobj);
+    }
+    BN_free(owned);
+    EXIT_IF(!ok, "in-place operation failed.");
+    Py_RETURN_NONE;
+}
+
+/* A new element equal to x, which _mulInto and _addInto may update in place */
+static PyObject *ECE_accumulator(ECElement *self, PyObject *arg) {
+    ECElement *x = (ECElement *) arg, *acc;
+    int ok;
+
+    EXIT_IF(!PyEC_Check(arg) || !x->point_init, "argument must be an initialized element.");
+    if((acc = createNewPoint(x->type, x->group)) == NULL) return PyErr_NoMemory();
+    if(x->type == ZR) ok = BN_copy(acc->elemZ, x->elemZ) != NULL;
+    else ok = EC_POINT_copy(acc->P, x->P);
+    if(!ok) {
+        Py_DECREF(acc);
+        EXIT_IF(TRUE, "could not copy element.");
+    }
+    acc->accumulator = TRUE;
+    return (PyObject *) acc;
+}
+
+static PyObject *ECE_mulInto(ECElement *self, PyObject *args) {
+    return inplaceOp(args, FALSE);
+}
+
+static PyObject *ECE_addInto(ECElement *self, PyObject *args) {
+    return inplaceOp(args, TRUE);
+}
+
 /* assume 'self' is a valid ECElement instance */
 ECElement *invertECElement(ECElement *self) {
     ECElement *newObj = NULL;
@@ -916,11 +1192,15 @@ ECElement *invertECElement(ECElement *self) {
     }
     else if(self->type == ZR) {
         // get modulus and compute mod_inverse
-        BIGNUM *x = BN_mod_inverse(NULL, self->elemZ, self->group->order, self->group->ctx);
+        BIGNUM *x = NULL;
+        BN_CTX *ctx = acquireCtx(self->group);
+        if(ctx == NULL) return NULL;
+        newObj = createNewPoint(ZR, self->group);
+        Py_BEGIN_ALLOW_THREADS;
+        x = BN_mod_inverse(newObj->elemZ, self->elemZ, self->group->order, ctx);
+        Py_END_ALLOW_THREADS;
+        releaseCtx(self->group, ctx);
         if(x != NULL) {
-            newObj = createNewPoint(ZR, self->group);
-            BN_copy(newObj->elemZ, x);
-            BN_free(x);
             return newObj;
         }
         Py_XDECREF(newObj);
@@ -938,7 +1218,7 @@ static PyObject *ECE_invert(PyObject *o1) {
         ECElement *obj2 = invertECElement(obj1);
 
         if(obj2 != NULL) {
-
+            UPDATE_BENCH(INVERSION, obj2->type, obj2->group);
             return (PyObject *) obj2;
         }
 
@@ -1167,6 +1447,339 @@ static PyObject *ECE_getGen(ECElement *self, PyObject *arg) {
     EXIT_IF(TRUE, "invalid argument.");
 }
 
+/*
+ * Raise many points to the same power in one call, without the GIL.
+ *
+ * 'points' is either a sequence of elements of G, giving a list of elements,
+ * or a buffer of concatenated serialized points (as returned by serialize),
+ * giving a buffer of serialized results in the same layout.
+ */
+static PyObject *ECE_powMany(ECElement *self, PyObject *args) {
+    ECGroup *gobj = NULL;
+    ECElement *k = NULL;
+    PyObject *points = NULL, *seq = NULL, *result = NULL;
+    Py_ssize_t i, n;
+    int ok = TRUE;
+    BN_CTX *ctx;
+
+    if(!PyArg_ParseTuple(args, "OOO", &gobj, &points, &k)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    EXIT_IF(!PyEC_Check(k) || k->type != ZR, "exponent not of type ZR.");
+    EXIT_IF(k->group->nid != gobj->nid, "mixing group elements from different curves.");
+
+    if(PyObject_CheckBuffer(points)) {
+        Py_buffer view;
+        size_t width = pointLen(gobj) + 1;
+        Py_ssize_t bad = -1;
+        EC_POINT *P;
+        uint8_t *in, *out;
+
+        if(PyObject_GetBuffer(points, &view, PyBUF_SIMPLE) < 0) return NULL;
+        if(view.len % width != 0) {
+            PyBuffer_Release(&view);
+            EXIT_IF(TRUE, "buffer length is not a multiple of the serialized point size.");
+        }
+        n = view.len / width;
+        result = PyBytes_FromStringAndSize(NULL, view.len);
+        P = EC_POINT_new(gobj->ec_group);
+        ctx = acquireCtx(gobj);
+        if(result == NULL || P == NULL || ctx == NULL) {
+            PyBuffer_Release(&view);
+            Py_XDECREF(result);
+            EC_POINT_free(P);
+            if(ctx != NULL) releaseCtx(gobj, ctx);
+            return PyErr_NoMemory();
+        }
+        in = (uint8_t *) view.buf;
+        out = (uint8_t *) PyBytes_AS_STRING(result);
+
+        Py_BEGIN_ALLOW_THREADS;
+        for(i = 0; i < n && bad < 0; i++, in += width, out += width) {
+            if(in[0] != G ||
+               !EC_POINT_oct2point(gobj->ec_group, P, in + 1, width - 1, ctx) ||
+               !EC_POINT_is_on_curve(gobj->ec_group, P, ctx) ||
+               !mulPoint(gobj, P, P, k->elemZ, ctx) ||
+               EC_POINT_point2oct(gobj->ec_group, P, POINT_CONVERSION_COMPRESSED, out + 1, width - 1, ctx) != width - 1) {
+                bad = i;
+            }
+            out[0] = G;
+        }
+        Py_END_ALLOW_THREADS;
+
+        releaseCtx(gobj, ctx);
+        EC_POINT_free(P);
+        PyBuffer_Release(&view);
+        if(bad >= 0) {
+            Py_DECREF(result);
+            PyErr_Format(PyECErrorObject, "could not exponentiate point at index %zd.", bad);
+            return NULL;
+        }
+        UPDATE_BENCH_N(EXPONENTIATION, G, gobj, n);
+        return result;
+    }
+
+    seq = PySequence_Fast(points, "points must be a sequence or a buffer.");
+    if(seq == NULL) return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    for(i = 0; i < n; i++) {
+        ECElement *P = (ECElement *) PySequence_Fast_GET_ITEM(seq, i);
+        if(!PyEC_Check(P) || P->type != G || P->group->nid != gobj->nid) {
+            Py_DECREF(seq);
+            PyErr_Format(PyECErrorObject, "element at index %zd is not a point of this group.", i);
+            return NULL;
+        }
+    }
+    if((result = PyList_New(n)) == NULL) {
+        Py_DECREF(seq);
+        return NULL;
+    }
+    for(i = 0; i < n; i++) {
+        PyList_SET_ITEM(result, i, (PyObject *) createNewPoint(G, gobj));
+    }
+    if((ctx = acquireCtx(gobj)) == NULL) {
+        Py_DECREF(seq);
+        Py_DECREF(result);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    for(i = 0; i < n && ok; i++) {
+        ECElement *P = (ECElement *) PySequence_Fast_GET_ITEM(seq, i);
+        ECElement *ans = (ECElement *) PyList_GET_ITEM(result, i);
+        ok = mulPoint(gobj, ans->P, P->P, k->elemZ, ctx);
+    }
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    Py_DECREF(seq);
+    if(!ok) {
+        Py_DECREF(result);
+        EXIT_IF(TRUE, "could not exponentiate points.");
+    }
+    UPDATE_BENCH_N(EXPONENTIATION, G, gobj, n);
+    return result;
+}
+
+/*
+ * Multi-exponentiation: computes points[0] ** scalars[0] * ... * points[n-1] ** scalars[n-1]
+ * with OpenSSL's interleaved wNAF (EC_POINTs_mul), without the GIL.
+ * Scalars are elements of ZR or non-negative integers. points can also be a
+ * PointArray, with a ScalarArray of scalars.
+ */
+static PyObject *ECE_multiexp(ECElement *self, PyObject *args) {
+    PyObject *pointsObj = NULL, *scalarsObj = NULL, *points = NULL, *scalars = NULL;
+    const EC_POINT **P = NULL;
+    const BIGNUM **k = NULL;
+    BIGNUM **owned = NULL;
+    ECGroup *gobj = NULL;
+    ECElement *ans = NULL;
+    BN_CTX *ctx = NULL;
+    Py_ssize_t i, n;
+    int ok = FALSE;
+
+    if(!PyArg_ParseTuple(args, "OO", &pointsObj, &scalarsObj)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    if(PyPointArray_Check(pointsObj)) {
+        return arrayMultiexp(pointsObj, scalarsObj);
+    }
+    points = PySequence_Fast(pointsObj, "points must be a sequence.");
+    scalars = PySequence_Fast(scalarsObj, "scalars must be a sequence.");
+    if(points == NULL || scalars == NULL) goto done;
+
+    n = PySequence_Fast_GET_SIZE(points);
+    if(n == 0 || n != PySequence_Fast_GET_SIZE(scalars)) {
+        PyErr_SetString(PyECErrorObject, "expected the same non-zero number of points and scalars.");
+        goto done;
+    }
+    P = (const EC_POINT **) PyMem_Malloc(n * sizeof(EC_POINT *));
+    k = (const BIGNUM **) PyMem_Malloc(n * sizeof(BIGNUM *));
+    owned = (BIGNUM **) PyMem_Calloc(n, sizeof(BIGNUM *));
+    if(P == NULL || k == NULL || owned == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    for(i = 0; i < n; i++) {
+        ECElement *p = (ECElement *) PySequence_Fast_GET_ITEM(points, i);
+        PyObject *e = PySequence_Fast_GET_ITEM(scalars, i);
+
+        if(!PyEC_Check(p) || p->type != G || (gobj != NULL && p->group->nid != gobj->nid)) {
+            PyErr_Format(PyECErrorObject, "element at index %zd is not a point of the group.", i);
+            goto done;
+        }
+        gobj = p->group;
+        P[i] = p->P;
+
+        if(PyEC_Check(e) && ((ECElement *) e)->type == ZR && ((ECElement *) e)->group->nid == gobj->nid) {
+            k[i] = ((ECElement *) e)->elemZ;
+        }
+        else if(PyLong_Check(e) && Py_SIZE(e) >= 0) {
+            owned[i] = BN_new();
+            setBigNum((PyLongObject *) e, &owned[i]);
+            k[i] = owned[i];
+        }
+        else {
+            PyErr_Format(PyECErrorObject, "scalar at index %zd is not an element of ZR or a non-negative integer.", i);
+            goto done;
+        }
+    }
+
+    ans = createNewPoint(G, gobj);
+    if((ctx = acquireCtx(gobj)) == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    Py_BEGIN_ALLOW_THREADS;
+    ok = EC_POINTs_mul(gobj->ec_group, ans->P, NULL, n, P, k, ctx);
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    if(!ok) PyErr_SetString(PyECErrorObject, "multi-exponentiation failed.");
+    UPDATE_BENCH_N(MULTIEXP, G, gobj, n);
+
+done:
+    if(owned != NULL) {
+        for(i = 0; i < n; i++) BN_free(owned[i]);
+    }
+    PyMem_Free(owned);
+    PyMem_Free(k);
+    PyMem_Free(P);
+    Py_XDECREF(points);
+    Py_XDECREF(scalars);
+    if(!ok) {
+        Py_XDECREF(ans);
+        return NULL;
+    }
+    return (PyObject *) ans;
+}
+
+/*
+ * Evaluates the polynomial coeffs[0] + coeffs[1] x + ... (elements of ZR)
+ * at every x of xs with Horner's rule, without the GIL.
+ * Returns the list of values.
+ */
+static PyObject *ECE_polyEval(ECElement *self, PyObject *args) {
+    PyObject *coeffsObj = NULL, *xsObj = NULL, *coeffs = NULL, *xs = NULL, *result = NULL;
+    const BIGNUM **c = NULL, **x = NULL;
+    ECGroup *gobj = NULL;
+    BN_CTX *ctx = NULL;
+    Py_ssize_t i, j, t, n;
+    int ok = FALSE;
+
+    if(!PyArg_ParseTuple(args, "OO", &coeffsObj, &xsObj)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    coeffs = PySequence_Fast(coeffsObj, "coefficients must be a sequence.");
+    xs = PySequence_Fast(xsObj, "points of evaluation must be a sequence.");
+    if(coeffs == NULL || xs == NULL) goto done;
+
+    t = PySequence_Fast_GET_SIZE(coeffs);
+    n = PySequence_Fast_GET_SIZE(xs);
+    if(t == 0) {
+        PyErr_SetString(PyECErrorObject, "expected at least one coefficient.");
+        goto done;
+    }
+    c = (const BIGNUM **) PyMem_Malloc(t * sizeof(BIGNUM *));
+    x = (const BIGNUM **) PyMem_Malloc((n > 0 ? n : 1) * sizeof(BIGNUM *));
+    if(c == NULL || x == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    for(j = 0; j < t + n; j++) {
+        ECElement *e = (ECElement *) (j < t ? PySequence_Fast_GET_ITEM(coeffs, j) : PySequence_Fast_GET_ITEM(xs, j - t));
+        if(!PyEC_Check(e) || e->type != ZR || (gobj != NULL && e->group->nid != gobj->nid)) {
+            PyErr_Format(PyECErrorObject, "%s at index %zd is not an element of ZR of the group.",
+                         j < t ? "coefficient" : "point of evaluation", j < t ? j : j - t);
+            goto done;
+        }
+        gobj = e->group;
+        if(j < t) c[j] = e->elemZ;
+        else x[j - t] = e->elemZ;
+    }
+
+    if((result = PyList_New(n)) == NULL) goto done;
+    for(i = 0; i < n; i++) {
+        PyList_SET_ITEM(result, i, (PyObject *) createNewPoint(ZR, gobj));
+    }
+    if((ctx = acquireCtx(gobj)) == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    /*
+     * With x in Montgomery form xR, a Montgomery product a * xR / R = a * x
+     * needs no division. Coefficients are reduced once, so that the sums
+     * can use BN_mod_add_quick.
+     */
+    BN_MONT_CTX *mont = BN_MONT_CTX_new();
+    BIGNUM **cr = NULL, *xm = NULL;
+    BN_CTX_start(ctx);
+    if(mont != NULL && BN_MONT_CTX_set(mont, gobj->order, ctx) &&
+       (xm = BN_CTX_get(ctx)) != NULL &&
+       (cr = (BIGNUM **) calloc(t, sizeof(BIGNUM *))) != NULL) {
+        ok = TRUE;
+        for(j = 0; j < t && ok; j++) {
+            ok = (cr[j] = BN_CTX_get(ctx)) != NULL && BN_nnmod(cr[j], c[j], gobj->order, ctx);
+        }
+    }
+    for(i = 0; i < n && ok; i++) {
+        BIGNUM *ans = ((ECElement *) PyList_GET_ITEM(result, i))->elemZ;
+        ok = BN_nnmod(xm, x[i], gobj->order, ctx) &&
+             BN_to_montgomery(xm, xm, mont, ctx) &&
+             BN_copy(ans, cr[t - 1]) != NULL;
+        for(j = t - 2; j >= 0 && ok; j--) {
+            ok = BN_mod_mul_montgomery(ans, ans, xm, mont, ctx) &&
+                 BN_mod_add_quick(ans, ans, cr[j], gobj->order);
+        }
+    }
+    BN_CTX_end(ctx);
+    free(cr);
+    BN_MONT_CTX_free(mont);
+    Py_END_ALLOW_THREADS;
+    releaseCtx(gobj, ctx);
+    if(!ok) PyErr_SetString(PyECErrorObject, "polynomial evaluation failed.");
+    UPDATE_BENCH_N(MULTIPLICATION, ZR, gobj, n * (t - 1));
+    UPDATE_BENCH_N(ADDITION, ZR, gobj, n * (t - 1));
+
+done:
+    PyMem_Free(c);
+    PyMem_Free(x);
+    Py_XDECREF(coeffs);
+    Py_XDECREF(xs);
+    if(!ok) {
+        Py_XDECREF(result);
+        return NULL;
+    }
+    return result;
+}
+
+/*
+ * Runs the group check skipped by elliptic_curve(nid=..., check=False).
+ * The result is kept, so only the first call does the work.
+ */
+static PyObject *ECE_check(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    BN_CTX *ctx;
+    int ok;
+
+    VERIFY_GROUP(gobj);
+    if(!gobj->checked) {
+        EXIT_IF(gobj->nid < 0, "only named curves can be checked.");
+        EXIT_IF((ctx = acquireCtx(gobj)) == NULL, "could not allocate BN_CTX.");
+        Py_BEGIN_ALLOW_THREADS;
+        ok = EC_GROUP_check(gobj->ec_group, ctx);
+        Py_END_ALLOW_THREADS;
+        releaseCtx(gobj, ctx);
+        EXIT_IF(!ok, "group check failed, try another curve.");
+        gobj->checked = TRUE;
+    }
+    Py_RETURN_TRUE;
+}
+
 /*
  * Takes an arbitrary string and returns a group element
  */
@@ -1229,6 +1842,7 @@ static PyObject *ECE_hash(ECElement *self, PyObject *args) {
             printf_buffer_as_hex(hash_buf, hash_len);
             // generate an EC element from message digest
             hashObj = createNewPoint(G, gobj);
+            EC_POINT_free(hashObj->P);
             hashObj->P = element_from_hash(gobj->ec_group, gobj->order, (uint8_t *) hash_buf, hash_len);
             return (PyObject *) hashObj;
         }
@@ -1252,6 +1866,100 @@ static PyObject *ECE_hash(ECElement *self, PyObject *args) {
     EXIT_IF(TRUE, "invalid arguments");
 }
 
+/*
+ * Sets up the scratch state of encodeChunk; encodeEnd must be called
+ * afterwards, even if this fails. Safe to call without the GIL.
+ */
+static int encodeStart(ECGroup *gobj, EncodeState *st, BN_CTX *ctx) {
+    st->params = gobj->encode;
+    st->ctx = ctx;
+    st->retries = 0;
+    mpz_inits(st->x, st->rhs, st->y, st->check, NULL);
+    BN_CTX_start(ctx);
+    st->bn_x = BN_CTX_get(ctx);
+    st->bn_y = BN_CTX_get(ctx);
+    return st->bn_y != NULL;
+}
+
+static void encodeEnd(EncodeState *st) {
+    // the input holds plaintext
+    OPENSSL_cleanse(st->input, sizeof(st->input));
+    mpz_clears(st->x, st->rhs, st->y, st->check, NULL);
+    BN_CTX_end(st->ctx);
+}
+
+/*
+ * Odd square root y of rhs, a nonzero square modulo p, in bn_y
+ */
+static int encodeSqrt(EncodeState *st) {
+    EncodeParams *params = st->params;
+    uint8_t buf[MAX_BUF];
+    size_t count;
+
+    if(mpz_sgn(params->sqrt_exp) != 0) {
+        mpz_powm(st->y, st->rhs, params->sqrt_exp, params->p);
+        if(mpz_even_p(st->y)) mpz_sub(st->y, params->p, st->y);
+        if(mpz_sizeinbase(st->y, 256) > MAX_BUF) return FALSE;
+        mpz_export(buf, &count, 1, 1, 1, 0, st->y);
+        return BN_bin2bn(buf, count, st->bn_y) != NULL;
+    }
+    if(mpz_sizeinbase(st->rhs, 256) > MAX_BUF) return FALSE;
+    mpz_export(buf, &count, 1, 1, 1, 0, st->rhs);
+    if(BN_bin2bn(buf, count, st->bn_y) == NULL ||
+       BN_mod_sqrt(st->bn_y, st->bn_y, params->bn_p, st->ctx) == NULL) return FALSE;
+    return BN_is_odd(st->bn_y) || BN_usub(st->bn_y, params->bn_p, st->bn_y);
+}
+
+/*
+ * Try-and-increment encoding of msg_len bytes of msg to a point P of the group:
+ * x = msg | ctr (unless include_ctr) for ctr = 1, 2, ... until x is the
+ * abscissa of a point, i.e. x^3 + ax + b is a nonzero square. Squares are
+ * told apart with the Jacobi symbol, and only one square root is computed.
+ * P gets the odd ordinate, like compressed points with y_bit 1, and is set
+ * without further checks. st must have been set up by encodeStart. Failed
+ * attempts are added to st->retries. Safe to call without the GIL.
+ */
+static int encodeChunk(ECGroup *gobj, EncodeState *st, EC_POINT *P, const uint8_t *msg, int msg_len, int len, int include_ctr) {
+    uint32_t ctr = 1; // always have a ctr start from 1
+    EncodeParams *params = st->params;
+
+    memset(st->input, 0, len);
+    memcpy(st->input, msg, msg_len);
+    do {
+        if (include_ctr == FALSE) {
+            /*                == msg_len       ctr
+             * encoding [    message    |  \x01 \x00 \x00 \x00 ]
+             */
+            memcpy(st->input + msg_len, &ctr, sizeof(uint32_t));
+        }
+
+        debug("input hex msg => ");
+        printf_buffer_as_hex(st->input, len);
+        mpz_import(st->x, len, 1, 1, 1, 0, st->input);
+        // x would be reduced, and decoded to another message
+        if(mpz_cmp(st->x, params->p) >= 0) return FALSE;
+        if(mpz_sgn(st->x) != 0) {
+            // rhs = (x^2 + a) * x + b
+            mpz_mul(st->rhs, st->x, st->x);
+            mpz_add(st->rhs, st->rhs, params->a);
+            mpz_mul(st->rhs, st->rhs, st->x);
+            mpz_add(st->rhs, st->rhs, params->b);
+            mpz_mod(st->rhs, st->rhs, params->p);
+            if(mpz_sgn(st->rhs) != 0 && mpz_jacobi(st->rhs, params->p) == 1) {
+                debug("point is on curve!\n");
+                return encodeSqrt(st) && BN_bin2bn(st->input, len, st->bn_x) != NULL &&
+                       EC_POINT_set_Jprojective_coordinates_GFp(gobj->ec_group, P, st->bn_x, st->bn_y,
+                                                                BN_value_one(), st->ctx);
+            }
+        }
+        // without a counter there is nothing else to try
+        if (include_ctr == TRUE) return FALSE;
+        st->retries++;
+    } while(++ctr != 0);
+
+    return FALSE;
+}
+
 /*
  * Encode a message as a group element
  */
@@ -1259,8 +1967,7 @@ static PyObject *ECE_encode(ECElement *self, PyObject *args) {
     PyObject *old_m;
     uint8_t *old_msg;
     int include_ctr = FALSE;
-    uint32_t msg_len, ctr = 1, ERROR_SET = FALSE; // always have a ctr start from 1
-    BIGNUM *x = NULL, *y = NULL;
+    uint32_t msg_len;
     ECGroup *gobj = NULL;
 
     if(PyArg_ParseTuple(args, "OO|i", &gobj, &old_m, &include_ctr)) {
@@ -1293,72 +2000,39 @@ static PyObject *ECE_encode(ECElement *self, PyObject *args) {
         // concatenate 'ctr' to buffer and set x coordinate and test for y coordiate on curve
         // if point not on curve, increment ctr by 1
         if(len == max_len) {
-            // concatenate msg
-            char *input = (char *) malloc(len + 1);
-            memset(input, 0, len);
-            memcpy(input, old_msg, msg_len);
-            int TryNextCTR = TRUE;
-            ECElement *encObj = NULL;
-            y=BN_new();
-            x=BN_new();
-            do {
-
-                if(encObj!=NULL)
-                    Py_DECREF(encObj);
-
-                if (include_ctr == FALSE) {
-                    /*                == msg_len       ctr
-                     * encoding [    message    |  \x01 \x00 \x00 \x00 ]
-                     */
-                    *((uint32_t*)(input + msg_len)) = (uint32_t) ctr;
-                }
-
-                debug("input hex msg => ");
-                // check if msg len is big enough to fit into length
-                printf_buffer_as_hex((uint8_t *) input, len);
-                encObj = createNewPoint(G, gobj);
-                BN_bin2bn((const uint8_t *) input, len, x);
-                BN_free(y);
-                y = BN_new();
-                // Uncomment for debugging purposes
-                //char *xstr = BN_bn2dec(x);
-                //debug("gen x => %s\n", xstr);
-                //OPENSSL_free(xstr);
-                EC_POINT_set_compressed_coordinates_GFp(gobj->ec_group, encObj->P, x, 1, gobj->ctx);
-                EC_POINT_get_affine_coordinates_GFp(gobj->ec_group, encObj->P, x, y, gobj->ctx);
-
-                if(BN_is_zero(x) || BN_is_zero(y)) {
-                    ctr++;
-                    continue;
-                }
-
-                if(EC_POINT_is_on_curve(gobj->ec_group, encObj->P, gobj->ctx)) {
-                    debug("point is on curve!\n");
-                    debug("final hex msg => ");
-                    // check if msg len is big enough to fit into length
-                    printf_buffer_as_hex((uint8_t *) input, len);
-                    free(input);
-                    TryNextCTR = FALSE;
-                }
-                else {
-                    ctr++;
-                }
-            }while(TryNextCTR);
-
-            BN_free(x);
-            BN_free(y);
-
+            EncodeState st;
+            int ok = FALSE;
+            ECElement *encObj = createNewPoint(G, gobj);
+            BN_CTX *ctx = acquireCtx(gobj);
+            if(encObj == NULL || ctx == NULL) {
+                Py_XDECREF(encObj);
+                if(ctx != NULL) releaseCtx(gobj, ctx);
+                return PyErr_NoMemory();
+            }
+            Py_BEGIN_ALLOW_THREADS;
+            ok = encodeStart(gobj, &st, ctx) &&
+                 encodeChunk(gobj, &st, encObj->P, old_msg, msg_len, len, include_ctr);
+            encodeEnd(&st);
+            Py_END_ALLOW_THREADS;
+            releaseCtx(gobj, ctx);
+            UPDATE_BENCH_N(ENCODE_RETRY, G, gobj, st.retries);
+
+            if(!ok) {
+                Py_DECREF(encObj);
+                EXIT_IF(TRUE, "Ran out of counters. So, could not be encode message at given length. make it smaller.");
+            }
+            UPDATE_BENCH(ENCODE, G, gobj);
             return (PyObject *) encObj;
         }
         else {
-            printf("expected message len: %d, you provided: %d\n", (max_len - sizeof(uint32_t)), msg_len);
-            EXIT_IF(TRUE, "message length does not match the selected group size.");
+            PyErr_Format(PyECErrorObject,
+                         "message length does not match the selected group size: expected %d bytes, got %u.",
+                         include_ctr ? max_len : max_len - (int) RESERVED_ENCODING_BYTES, (unsigned int) msg_len);
+            return NULL;
         }
     }
 
-    EXIT_IF(ERROR_SET, "Ran out of counters. So, could not be encode message at given length. make it smaller.");
     Py_INCREF(Py_False);
-
     return Py_False;
 }
 
@@ -1376,43 +2050,427 @@ static PyObject *ECE_decode(ECElement *self, PyObject *args) {
 
         // make sure it is a point and not a scalar
         if(PyEC_Check(obj) && isPoint(obj)) {
-            BIGNUM *x = BN_new(), *y = BN_new();
-            // verifies that element is on the curve then gets coordinates
-            EC_POINT_get_affine_coordinates_GFp(gobj->ec_group, obj->P, x, y, gobj->ctx);
-
+            uint8_t xstr[MAX_BUF];
             int max_byte_len = BN_num_bytes(gobj->order);
-            int prepend_zeros = max_byte_len;
+            BIGNUM *x = BN_new();
+            // BN_bn2binpad keeps the leading null bytes of the original message
+            int ok = x != NULL &&
+                     EC_POINT_get_affine_coordinates_GFp(gobj->ec_group, obj->P, x, NULL, gobj->ctx) &&
+                     BN_bn2binpad(x, xstr, max_byte_len) >= 0;
+            BN_free(x);
+            EXIT_IF(!ok, "could not decode point.");
+            debug("Decoded x => ");
+            printf_buffer_as_hex(xstr, max_byte_len);
+
             // by default we will strip out the counter part (unless specified otherwise by user)
             if (include_ctr == FALSE) {
                 max_byte_len -= RESERVED_ENCODING_BYTES;
             }
-            debug("Size of order => '%d'\n", max_byte_len);
-            int x_len = BN_num_bytes(x);
-            prepend_zeros -= x_len;
-            if (prepend_zeros > 0) {
-                x_len += prepend_zeros;
-            }
-            uint8_t *xstr = (uint8_t*) malloc(x_len + 1);
-            memset(xstr, 0, x_len);
-            debug("Size of xstr => '%d'\n", x_len);
-            // BN_bn2bin does not include leading null bytes that might've been included in original message
-            // so doing that here by counting length and then pre-pending zeroes
-            BN_bn2bin(x, (uint8_t*)(xstr + prepend_zeros));
-            debug("Decoded x => ");
-            printf_buffer_as_hex((uint8_t *) (xstr), x_len);
-            BN_free(x);
-            BN_free(y);
-
-            int size_msg = max_byte_len;
-            PyObject *decObj = PyBytes_FromStringAndSize(xstr, size_msg);
-            OPENSSL_free(xstr);
-            return decObj;
+            return PyBytes_FromStringAndSize((const char *) xstr, max_byte_len);
         }
     }
 
     EXIT_IF(TRUE, "invalid argument");
 }
 
+/*
+ * Frees the first n points of an array from newPoints and the array itself.
+ */
+static void freePoints(EC_POINT **points, Py_ssize_t n) {
+    Py_ssize_t i;
+    if(points == NULL) return;
+    for(i = 0; i < n; i++) EC_POINT_free(points[i]);
+    free(points);
+}
+
+static EC_POINT **newPoints(ECGroup *gobj, Py_ssize_t n) {
+    Py_ssize_t i;
+    EC_POINT **points = (EC_POINT **) calloc(n > 0 ? n : 1, sizeof(EC_POINT *));
+    if(points == NULL) return NULL;
+    for(i = 0; i < n; i++) {
+        if((points[i] = EC_POINT_new(gobj->ec_group)) == NULL) {
+            freePoints(points, i);
+            return NULL;
+        }
+    }
+    return points;
+}
+
+/*
+ * Affine coordinates of a point made affine by EC_POINTs_make_affine (Z = 1),
+ * read directly: EC_POINT_get_affine_coordinates does a field inversion for
+ * some curves (P-256) even then. z is scratch. Safe to call without the GIL.
+ */
+static int getAffine(ECGroup *gobj, const EC_POINT *P, BIGNUM *x, BIGNUM *y, BIGNUM *z, BN_CTX *ctx) {
+    if(EC_POINT_get_Jprojective_coordinates_GFp(gobj->ec_group, P, x, y, z, ctx) && BN_is_one(z))
+        return TRUE;
+    return EC_POINT_get_affine_coordinates_GFp(gobj->ec_group, P, x, y, ctx);
+}
+
+/* Compressed encoding (pointLen bytes) of a point with affine coordinates x, y */
+static int compressPoint(ECGroup *gobj, const BIGNUM *x, const BIGNUM *y, uint8_t *out) {
+    out[0] = POINT_CONVERSION_COMPRESSED | BN_is_odd(y);
+    return BN_bn2binpad(x, out + 1, pointLen(gobj) - 1) >= 0;
+}
+
+#include "ecarray.c"
+
+/*
+ * BBS98 chunk encryption of a whole message in one call: every chunk of
+ * bitsize bytes of data is encoded to a point, multiplied by blind (g ** r)
+ * and written compressed to one contiguous buffer, with the type prefix of
+ * serialize if typed is set. All points are made affine with a single
+ * inversion before serializing. Runs without the GIL.
+ */
+static PyObject *ECE_encryptChunks(ECElement *self, PyObject *args) {
+    ECGroup *gobj = NULL;
+    ECElement *blind = NULL;
+    PyObject *data = NULL, *result = NULL;
+    EC_POINT **points = NULL;
+    EncodeState st;
+    BN_CTX *ctx = NULL;
+    Py_buffer view;
+    Py_ssize_t i, n, bad = -1;
+    int typed = FALSE;
+    size_t width;
+
+    if(!PyArg_ParseTuple(args, "OOO|i", &gobj, &data, &blind, &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    EXIT_IF(!PyEC_Check(blind) || blind->type != G, "blinding factor not of type G.");
+    EXIT_IF(blind->group->nid != gobj->nid, "mixing group elements from different curves.");
+
+    int len = BN_num_bytes(gobj->order);
+    int chunk_len = len - RESERVED_ENCODING_BYTES;
+    width = pointLen(gobj) + (typed ? 1 : 0);
+
+    if(PyObject_GetBuffer(data, &view, PyBUF_SIMPLE) < 0) return NULL;
+    if(view.len == 0 || view.len % chunk_len != 0) {
+        PyBuffer_Release(&view);
+        EXIT_IF(TRUE, "message length is not a multiple of the chunk size.");
+    }
+    n = view.len / chunk_len;
+
+    result = PyBytes_FromStringAndSize(NULL, n * width);
+    points = newPoints(gobj, n);
+    ctx = acquireCtx(gobj);
+    if(result == NULL || points == NULL || ctx == NULL) {
+        PyBuffer_Release(&view);
+        Py_XDECREF(result);
+        freePoints(points, n);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    const uint8_t *msg = (const uint8_t *) view.buf;
+    uint8_t *out = (uint8_t *) PyBytes_AS_STRING(result);
+    if(!encodeStart(gobj, &st, ctx)) {
+        bad = 0;
+    }
+    for(i = 0; i < n && bad < 0; i++, msg += chunk_len) {
+        if(!encodeChunk(gobj, &st, points[i], msg, chunk_len, len, FALSE) ||
+           !EC_POINT_add(gobj->ec_group, points[i], points[i], blind->P, ctx)) {
+            bad = i;
+        }
+    }
+    encodeEnd(&st);
+    if(bad < 0 && !EC_POINTs_make_affine(gobj->ec_group, n, points, ctx)) {
+        bad = 0;
+    }
+    for(i = 0; i < n && bad < 0; i++, out += width) {
+        if(typed) out[0] = G;
+        if(EC_POINT_point2oct(gobj->ec_group, points[i], POINT_CONVERSION_COMPRESSED,
+                              out + (typed ? 1 : 0), pointLen(gobj), ctx) != pointLen(gobj)) {
+            bad = i;
+        }
+    }
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(points, n);
+    PyBuffer_Release(&view);
+    UPDATE_BENCH_N(ENCODE_RETRY, G, gobj, st.retries);
+    if(bad >= 0) {
+        Py_DECREF(result);
+        PyErr_Format(PyECErrorObject, "could not encrypt chunk at index %zd.", bad);
+        return NULL;
+    }
+    UPDATE_BENCH_N(ENCODE, G, gobj, n);
+    UPDATE_BENCH_N(MULTIPLICATION, G, gobj, n);
+    return result;
+}
+
+/*
+ * Inverse of encryptChunks: every compressed point of data (with the type
+ * prefix of serialize if typed is set) is divided by blind (c1 ** (1 / priv))
+ * and decoded, and the chunks are returned as one contiguous bytes object.
+ */
+static PyObject *ECE_decryptChunks(ECElement *self, PyObject *args) {
+    ECGroup *gobj = NULL;
+    ECElement *blind = NULL;
+    PyObject *data = NULL, *result = NULL;
+    EC_POINT **points = NULL, *inverse = NULL;
+    BIGNUM *x = NULL;
+    BN_CTX *ctx = NULL;
+    Py_buffer view;
+    Py_ssize_t i, n, bad = -1;
+    int typed = FALSE;
+    size_t width;
+
+    if(!PyArg_ParseTuple(args, "OOO|i", &gobj, &data, &blind, &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    EXIT_IF(!PyEC_Check(blind) || blind->type != G, "blinding factor not of type G.");
+    EXIT_IF(blind->group->nid != gobj->nid, "mixing group elements from different curves.");
+
+    int len = BN_num_bytes(gobj->order);
+    int chunk_len = len - RESERVED_ENCODING_BYTES;
+    width = pointLen(gobj) + (typed ? 1 : 0);
+
+    if(PyObject_GetBuffer(data, &view, PyBUF_SIMPLE) < 0) return NULL;
+    if(view.len == 0 || view.len % width != 0) {
+        PyBuffer_Release(&view);
+        EXIT_IF(TRUE, "buffer length is not a multiple of the serialized point size.");
+    }
+    n = view.len / width;
+
+    result = PyBytes_FromStringAndSize(NULL, n * chunk_len);
+    points = newPoints(gobj, n);
+    inverse = EC_POINT_dup(blind->P, gobj->ec_group);
+    ctx = acquireCtx(gobj);
+    x = BN_new();
+    if(result == NULL || points == NULL || inverse == NULL || ctx == NULL || x == NULL) {
+        PyBuffer_Release(&view);
+        Py_XDECREF(result);
+        freePoints(points, n);
+        EC_POINT_free(inverse);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        BN_free(x);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    uint8_t xstr[MAX_BUF];
+    const uint8_t *in = (const uint8_t *) view.buf;
+    uint8_t *out = (uint8_t *) PyBytes_AS_STRING(result);
+    if(!EC_POINT_invert(gobj->ec_group, inverse, ctx)) {
+        bad = 0;
+    }
+    for(i = 0; i < n && bad < 0; i++, in += width) {
+        if((typed && in[0] != G) ||
+           !EC_POINT_oct2point(gobj->ec_group, points[i], in + (typed ? 1 : 0), pointLen(gobj), ctx) ||
+           !EC_POINT_is_on_curve(gobj->ec_group, points[i], ctx) ||
+           !EC_POINT_add(gobj->ec_group, points[i], points[i], inverse, ctx)) {
+            bad = i;
+        }
+    }
+    if(bad < 0 && !EC_POINTs_make_affine(gobj->ec_group, n, points, ctx)) {
+        bad = 0;
+    }
+    for(i = 0; i < n && bad < 0; i++, out += chunk_len) {
+        // same as decode: x padded to the size of the order, counter stripped
+        if(!EC_POINT_get_affine_coordinates_GFp(gobj->ec_group, points[i], x, NULL, ctx) ||
+           BN_num_bytes(x) > MAX_BUF) {
+            bad = i;
+            break;
+        }
+        if(BN_num_bytes(x) < len) {
+            BN_bn2binpad(x, xstr, len);
+        }
+        else {
+            BN_bn2bin(x, xstr);
+        }
+        memcpy(out, xstr, chunk_len);
+    }
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(points, n);
+    EC_POINT_free(inverse);
+    BN_free(x);
+    PyBuffer_Release(&view);
+    if(bad >= 0) {
+        Py_DECREF(result);
+        PyErr_Format(PyECErrorObject, "could not decrypt chunk at index %zd.", bad);
+        return NULL;
+    }
+    UPDATE_BENCH_N(DIVISION, G, gobj, n);
+    return result;
+}
+
+/*
+ * Serializes a sequence of elements of one type and group into a single
+ * buffer of fixed-width encodings: compressed points, or big-endian scalars
+ * padded to the size of the group order. If typed is set, every encoding
+ * starts with the type byte of serialize. All points are made affine with a
+ * single field inversion (EC_POINTs_make_affine) before they are encoded.
+ */
+static PyObject *ECE_serializeMany(ECElement *self, PyObject *args) {
+    PyObject *elemsObj = NULL, *seq = NULL, *result = NULL;
+    EC_POINT **P = NULL;
+    ECGroup *gobj = NULL;
+    GroupType type = NONE_G;
+    BN_CTX *ctx = NULL;
+    Py_ssize_t i, n, bad = -1;
+    size_t len, width;
+    int typed = FALSE, ok = TRUE;
+
+    if(!PyArg_ParseTuple(args, "O|p", &elemsObj, &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    if((seq = PySequence_Fast(elemsObj, "elements must be a sequence.")) == NULL) return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    for(i = 0; i < n; i++) {
+        ECElement *e = (ECElement *) PySequence_Fast_GET_ITEM(seq, i);
+        if(!PyEC_Check(e) || !e->point_init || (gobj != NULL && (e->type != type || e->group->nid != gobj->nid))) {
+            Py_DECREF(seq);
+            PyErr_Format(PyECErrorObject, "element at index %zd is not of the type and group of the first one.", i);
+            return NULL;
+        }
+        gobj = e->group;
+        type = e->type;
+    }
+    if(n == 0) {
+        Py_DECREF(seq);
+        return PyBytes_FromStringAndSize(NULL, 0);
+    }
+
+    len = type == G ? pointLen(gobj) : (size_t) BN_num_bytes(gobj->order);
+    width = len + (typed ? 1 : 0);
+    result = PyBytes_FromStringAndSize(NULL, n * width);
+    if(type == G) P = newPoints(gobj, n);
+    ctx = acquireCtx(gobj);
+    if(result == NULL || (type == G && P == NULL) || ctx == NULL) {
+        Py_DECREF(seq);
+        Py_XDECREF(result);
+        freePoints(P, n);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    uint8_t *out = (uint8_t *) PyBytes_AS_STRING(result);
+    if(type == G) {
+        // work on copies, the elements may be in use by other threads
+        for(i = 0; i < n && ok; i++) {
+            ok = EC_POINT_copy(P[i], ((ECElement *) PySequence_Fast_GET_ITEM(seq, i))->P);
+            if(ok && EC_POINT_is_at_infinity(gobj->ec_group, P[i])) bad = i;
+        }
+        ok = ok && bad < 0 && EC_POINTs_make_affine(gobj->ec_group, n, P, ctx);
+        BN_CTX_start(ctx);
+        BIGNUM *x = BN_CTX_get(ctx), *y = BN_CTX_get(ctx), *z = BN_CTX_get(ctx);
+        ok = ok && z != NULL;
+        for(i = 0; i < n && ok; i++, out += width) {
+            if(typed) out[0] = G;
+            ok = getAffine(gobj, P[i], x, y, z, ctx) && compressPoint(gobj, x, y, out + (typed ? 1 : 0));
+        }
+        BN_CTX_end(ctx);
+    }
+    else {
+        for(i = 0; i < n && ok && bad < 0; i++, out += width) {
+            const BIGNUM *k = ((ECElement *) PySequence_Fast_GET_ITEM(seq, i))->elemZ;
+            if(typed) out[0] = ZR;
+            if(BN_is_negative(k) || BN_bn2binpad(k, out + (typed ? 1 : 0), len) < 0) bad = i;
+        }
+    }
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    freePoints(P, n);
+    Py_DECREF(seq);
+    if(!ok || bad >= 0) {
+        Py_DECREF(result);
+        if(bad >= 0) PyErr_Format(PyECErrorObject, "element at index %zd has no fixed-width encoding.", bad);
+        else PyErr_SetString(PyECErrorObject, "could not serialize the elements.");
+        return NULL;
+    }
+    return result;
+}
+
+/*
+ * Deserializes a buffer of fixed-width encodings of elements of the given
+ * type, as written by serializeMany, without the GIL. Returns the list of
+ * elements and the list of the indices of invalid encodings (points not on
+ * the curve, scalars not below the order or wrong type bytes), which have
+ * None in the list of elements.
+ */
+static PyObject *ECE_deserializeMany(ECElement *self, PyObject *args) {
+    PyObject *buffer = NULL, *elems = NULL, *invalid = NULL;
+    ECGroup *gobj = NULL;
+    Py_buffer view;
+    BN_CTX *ctx;
+    uint8_t *valid;
+    Py_ssize_t i, n;
+    size_t len, width;
+    int type = NONE_G, typed = FALSE;
+
+    if(!PyArg_ParseTuple(args, "OOi|p", &gobj, &buffer, &type, &typed)) {
+        EXIT_IF(TRUE, "invalid argument.");
+    }
+    VERIFY_GROUP(gobj);
+    EXIT_IF(type != G && type != ZR, "invalid type.");
+    len = type == G ? pointLen(gobj) : (size_t) BN_num_bytes(gobj->order);
+    width = len + (typed ? 1 : 0);
+    if(PyObject_GetBuffer(buffer, &view, PyBUF_SIMPLE) < 0) return NULL;
+    if(view.len % width != 0) {
+        PyBuffer_Release(&view);
+        EXIT_IF(TRUE, "buffer length is not a multiple of the encoding size.");
+    }
+
+    n = view.len / width;
+    elems = PyList_New(n);
+    valid = (uint8_t *) PyMem_Malloc(n > 0 ? n : 1);
+    ctx = acquireCtx(gobj);
+    if(elems == NULL || valid == NULL || ctx == NULL) {
+        PyBuffer_Release(&view);
+        Py_XDECREF(elems);
+        PyMem_Free(valid);
+        if(ctx != NULL) releaseCtx(gobj, ctx);
+        return PyErr_NoMemory();
+    }
+    for(i = 0; i < n; i++) {
+        PyList_SET_ITEM(elems, i, (PyObject *) createNewPoint(type, gobj));
+    }
+
+    Py_BEGIN_ALLOW_THREADS;
+    const uint8_t *in = (const uint8_t *) view.buf;
+    for(i = 0; i < n; i++, in += width) {
+        ECElement *e = (ECElement *) PyList_GET_ITEM(elems, i);
+        valid[i] = !typed || in[0] == type;
+        if(typed) in++;
+        if(type == G) {
+            // EC_POINT_oct2point only accepts points on the curve
+            valid[i] = valid[i] && EC_POINT_oct2point(gobj->ec_group, e->P, in, len, ctx);
+        }
+        else {
+            valid[i] = valid[i] && BN_bin2bn(in, len, e->elemZ) != NULL && BN_cmp(e->elemZ, gobj->order) < 0;
+        }
+        if(typed) in--;
+    }
+    Py_END_ALLOW_THREADS;
+
+    releaseCtx(gobj, ctx);
+    PyBuffer_Release(&view);
+    invalid = PyList_New(0);
+    for(i = 0; i < n && invalid != NULL; i++) {
+        if(valid[i]) continue;
+        PyObject *index = PyLong_FromSsize_t(i);
+        if(index == NULL || PyList_Append(invalid, index) < 0) Py_CLEAR(invalid);
+        Py_XDECREF(index);
+        Py_INCREF(Py_None);
+        PyList_SetItem(elems, i, Py_None);
+    }
+    PyMem_Free(valid);
+    if(invalid == NULL) {
+        Py_DECREF(elems);
+        return NULL;
+    }
+    return Py_BuildValue("(NN)", elems, invalid);
+}
+
 static PyObject *Serialize(ECElement *self, PyObject *args) {
     /* Serialize in format:
      * 0x00<number> or 0x01<number> for ZR and G respectively
@@ -1453,35 +2511,66 @@ static PyObject *Serialize(ECElement *self, PyObject *args) {
     return NULL;
 }
 
+/*
+ * Deserialize an element from a buffer in serialize's format, or from its
+ * bare encoding (compressed point or big-endian scalar) when the type is
+ * given explicitly. Returns False if the buffer does not hold a valid element.
+ */
 static PyObject *Deserialize(ECElement *self, PyObject *args)
 {
     PyObject *obj = NULL;
     ECGroup *gobj = NULL;
+    int explicit_type = -1;
+    Py_buffer view;
 
-    if(PyArg_ParseTuple(args, "OO", &gobj, &obj)) {
+    if(PyArg_ParseTuple(args, "OO|i", &gobj, &obj, &explicit_type)) {
         VERIFY_GROUP(gobj);
-        if(PyBytes_Check(obj)) {
-            size_t len = PyBytes_Size(obj);
-            uint8_t *buf = (uint8_t *) PyBytes_AsString(obj);
+        if(PyObject_CheckBuffer(obj)) {
+            if(PyObject_GetBuffer(obj, &view, PyBUF_SIMPLE) < 0)
+                return NULL;
+            size_t len = view.len;
+            uint8_t *buf = (uint8_t *) view.buf;
+            GroupType type = explicit_type;
 
-            GroupType type = buf[0];
             debug("Deserialize this => ");
             printf_buffer_as_hex(buf, len);
-            len -= 1;
+            if(explicit_type < 0) {
+                type = len > 0 ? buf[0] : NONE_G;
+                buf += 1;
+                len -= 1;
+            }
 
+            obj = NULL;
             if(type == G) {
                 ECElement *newObj = createNewPoint(type, gobj); // ->group, gobj->ctx);
-                EC_POINT_oct2point(gobj->ec_group, newObj->P, (const uint8_t *) buf + 1, len, gobj->ctx);
-
-                if(EC_POINT_is_on_curve(gobj->ec_group, newObj->P, gobj->ctx)) {
-                    obj=(PyObject *) newObj;
+                BN_CTX *ctx = acquireCtx(gobj);
+                int on_curve = FALSE;
+                if(ctx == NULL) {
+                    Py_DECREF(newObj);
+                    PyBuffer_Release(&view);
+                    EXIT_IF(TRUE, "could not allocate BN_CTX.");
+                }
+                Py_BEGIN_ALLOW_THREADS;
+                on_curve = EC_POINT_oct2point(gobj->ec_group, newObj->P, (const uint8_t *) buf, len, ctx) &&
+                           EC_POINT_is_on_curve(gobj->ec_group, newObj->P, ctx);
+                Py_END_ALLOW_THREADS;
+                releaseCtx(gobj, ctx);
+
+                if(on_curve) {
+                    obj = (PyObject *) newObj;
+                }
+                else {
+                    Py_DECREF(newObj);
                 }
             }
             else if(type == ZR) {
                 ECElement *newObj = createNewPoint(type, gobj);
-                BN_bin2bn((const uint8_t *) buf + 1, len, newObj->elemZ);
+                BN_bin2bn((const uint8_t *) buf, len, newObj->elemZ);
                 obj = (PyObject *) newObj;
-            }else{
+            }
+            PyBuffer_Release(&view);
+
+            if(obj == NULL) {
                 Py_INCREF(Py_False);
                 obj = Py_False;
             }
@@ -1494,24 +2583,77 @@ static PyObject *Deserialize(ECElement *self, PyObject *args)
     EXIT_IF(TRUE, "invalid argument");
 }
 
-#ifdef BENCHMARK_ENABLED
+static const char *bench_names[BENCH_OPS] = {"Mul", "Div", "Add", "Sub", "Exp", "MultiExp", "Inv", "Encode", "EncodeRetry"};
 
-#define BenchmarkIdentifier 2
-#define GET_RESULTS_FUNC    GetResults
-#define GROUP_OBJECT        ECGroup
-#define BENCH_ERROR            PyECErrorObject
+/* {operation: [count in ZR, count in G]} */
+static PyObject *countersToDict(unsigned long long counters[BENCH_OPS][NONE_G]) {
+    PyObject *dict, *counts;
+    int op;
 
-PyObject *PyCreateList(Operations *gBench, MeasureType type)
-{
-    int countZR = -1, countG = -1;
-    GetField(countZR, type, ZR, gBench);
-    GetField(countG,  type,  G, gBench);
+    if((dict = PyDict_New()) == NULL) return NULL;
+    for(op = 0; op < BENCH_OPS; op++) {
+        counts = Py_BuildValue("[KK]", counters[op][ZR], counters[op][G]);
+        if(counts == NULL || PyDict_SetItemString(dict, bench_names[op], counts) < 0) {
+            Py_XDECREF(counts);
+            Py_DECREF(dict);
+            return NULL;
+        }
+        Py_DECREF(counts);
+    }
+    return dict;
+}
 
-    PyObject *objList = Py_BuildValue("[ii]", countZR, countG);
-    return objList;
+/*
+ * getCounters(group): returns the operations done in group since it was
+ * created or its counters were reset, as {operation: [count in ZR, count in G]}.
+ */
+static PyObject *ECE_getCounters(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    VERIFY_GROUP(gobj);
+    return countersToDict(gobj->counters);
 }
 
-#include "benchmark_util.c"
+/*
+ * resetCounters(group): sets the operation counters of group to zero.
+ */
+static PyObject *ECE_resetCounters(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    VERIFY_GROUP(gobj);
+    memset(gobj->counters, 0, sizeof(gobj->counters));
+    Py_RETURN_NONE;
+}
+
+#ifdef BENCHMARK_ENABLED
+
+/*
+ * StartBenchmark(group): resets the operation counters of group and starts counting.
+ */
+static PyObject *StartBenchmark(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    VERIFY_GROUP(gobj);
+    memset(gobj->bench, 0, sizeof(gobj->bench));
+    gobj->bench_active = TRUE;
+    Py_RETURN_NONE;
+}
+
+/*
+ * EndBenchmark(group): stops counting, the counters keep their values.
+ */
+static PyObject *EndBenchmark(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    VERIFY_GROUP(gobj);
+    gobj->bench_active = FALSE;
+    Py_RETURN_NONE;
+}
+
+/*
+ * GetGranularBenchmarks(group): returns {operation: [count in ZR, count in G]}.
+ */
+static PyObject *GranularBenchmark(ECElement *self, PyObject *arg) {
+    ECGroup *gobj = (ECGroup *) arg;
+    VERIFY_GROUP(gobj);
+    return countersToDict(gobj->bench);
+}
 
 #endif
 
@@ -1520,11 +2662,14 @@ PyMemberDef ECElement_members[] = {
         "group type"},
     {"initialized", T_INT, offsetof(ECElement, point_init), 0,
         "determine initialization status"},
+    {"group", T_OBJECT, offsetof(ECElement, group), READONLY,
+        "group of the element"},
     {NULL}  /* Sentinel */
 };
 
 PyMethodDef ECElement_methods[] = {
         {"isInf", (PyCFunction)ECE_is_infinity, METH_NOARGS, "Checks whether a point is at infinity."},
+        {"zeroize", (PyCFunction)ECE_zeroize, METH_NOARGS, "Clears the value of an element from memory, leaving 0 or the point at infinity."},
         {NULL}
 };
 
@@ -1696,6 +2841,14 @@ PyTypeObject ECType = {
 
 #if PY_MAJOR_VERSION >= 3
 
+PyMemberDef ECGroup_members[] = {
+    {"checked", T_INT, offsetof(ECGroup, checked), READONLY,
+        "whether the group passed EC_GROUP_check"},
+    {"nid", T_INT, offsetof(ECGroup, nid), READONLY,
+        "curve identifier (-1 for custom curves)"},
+    {NULL}  /* Sentinel */
+};
+
 PyTypeObject ECGroupType = {
     PyVarObject_HEAD_INIT(NULL, 0)
     "elliptic_curve.ECGroup",  /*tp_name*/
@@ -1725,7 +2878,7 @@ PyTypeObject ECGroupType = {
     0,                       /* tp_iter */
     0,                       /* tp_iternext */
     0,                       /* tp_methods */
-    0,                       /* tp_members */
+    ECGroup_members,         /* tp_members */
     0,                         /* tp_getset */
     0,                         /* tp_base */
     0,                         /* tp_dict */
@@ -1802,20 +2955,30 @@ static PyMethodDef ec_methods[] = {
         {"random", (PyCFunction)ECE_random, METH_VARARGS, "Return a random element in a specific group G or ZR."},
         {"order", (PyCFunction)ECE_getOrder, METH_O, "Return the order of a group."},
         {"getGenerator", (PyCFunction)ECE_getGen, METH_O, "Get the generator of the group."},
+        {"multiexp", (PyCFunction)ECE_multiexp, METH_VARARGS, "Compute the product of points raised to scalars."},
+        {"polyEval", (PyCFunction)ECE_polyEval, METH_VARARGS, "Evaluate a polynomial over ZR at many points."},
+        {"powMany", (PyCFunction)ECE_powMany, METH_VARARGS, "Raise a sequence or buffer of points to the same power."},
+        {"check", (PyCFunction)ECE_check, METH_O, "Check the parameters of a group created with check=False."},
+        {"_accumulator", (PyCFunction)ECE_accumulator, METH_O, "Private copy of an element, for _mulInto and _addInto."},
+        {"_mulInto", (PyCFunction)ECE_mulInto, METH_VARARGS, "acc = acc * x, in place (acc from _accumulator)."},
+        {"_addInto", (PyCFunction)ECE_addInto, METH_VARARGS, "acc = acc + x, in place (acc from _accumulator)."},
         {"bitsize", (PyCFunction)ECE_bitsize, METH_O, "Returns number of bytes to represent a message."},
         {"serialize", (PyCFunction)Serialize, METH_VARARGS, "Serialize an element to a string"},
-        {"deserialize", (PyCFunction)Deserialize, METH_VARARGS, "Deserialize an element to G or ZR"},
+        {"deserialize", (PyCFunction)Deserialize, METH_VARARGS, "Deserialize an element to G or ZR, optionally from its bare encoding of the given type"},
         {"hashEC", (PyCFunction)ECE_hash, METH_VARARGS, "Perform a hash of a string to a group element of G."},
         {"encode", (PyCFunction)ECE_encode, METH_VARARGS, "Encode string as a group element of G"},
         {"decode", (PyCFunction)ECE_decode, METH_VARARGS, "Decode group element to a string."},
+        {"encryptChunks", (PyCFunction)ECE_encryptChunks, METH_VARARGS, "Encode, blind and serialize all chunks of a message."},
+        {"decryptChunks", (PyCFunction)ECE_decryptChunks, METH_VARARGS, "Unblind and decode a buffer of serialized chunk points."},
+        {"serializeMany", (PyCFunction)ECE_serializeMany, METH_VARARGS, "Serialize elements into one buffer of fixed-width encodings."},
+        {"deserializeMany", (PyCFunction)ECE_deserializeMany, METH_VARARGS, "Deserialize a buffer of fixed-width encodings, returning the elements and the invalid indices."},
         {"getXY", (PyCFunction)ECE_convertToZR, METH_VARARGS, "Returns the x and/or y coordinates of point on an elliptic curve."},
+        {"getCounters", (PyCFunction)ECE_getCounters, METH_O, "Retrieve the operations done in a group as a dictionary"},
+        {"resetCounters", (PyCFunction)ECE_resetCounters, METH_O, "Reset the operation counters of a group"},
 #ifdef BENCHMARK_ENABLED
-        {"InitBenchmark", (PyCFunction)InitBenchmark, METH_VARARGS, "Initialize a benchmark object"},
-        {"StartBenchmark", (PyCFunction)StartBenchmark, METH_VARARGS, "Start a new benchmark with some options"},
-        {"EndBenchmark", (PyCFunction)EndBenchmark, METH_VARARGS, "End a given benchmark"},
-        {"GetBenchmark", (PyCFunction)GetBenchmark, METH_VARARGS, "Returns contents of a benchmark object"},
-        {"GetGeneralBenchmarks", (PyCFunction)GetAllBenchmarks, METH_VARARGS, "Retrieve general benchmark info as a dictionary"},
-        {"GetGranularBenchmarks", (PyCFunction) GranularBenchmark, METH_VARARGS, "Retrieve granular benchmarks as a dictionary"},
+        {"StartBenchmark", (PyCFunction)StartBenchmark, METH_O, "Reset the operation counters of a group and start counting"},
+        {"EndBenchmark", (PyCFunction)EndBenchmark, METH_O, "Stop counting operations of a group"},
+        {"GetGranularBenchmarks", (PyCFunction) GranularBenchmark, METH_O, "Retrieve the operation counters of a group as a dictionary"},
 #endif
         {NULL, NULL}
 };
@@ -1859,14 +3022,10 @@ void initelliptic_curve(void)         {
         CLEAN_EXIT;
     if(PyType_Ready(&ECType) < 0)
         CLEAN_EXIT;
-#ifdef BENCHMARK_ENABLED
-    if(import_benchmark() < 0)
-        CLEAN_EXIT;
-    if(PyType_Ready(&BenchmarkType) < 0)
+    if(PyType_Ready(&PointArrayType) < 0)
         CLEAN_EXIT;
-    if(PyType_Ready(&OperationsType) < 0)
+    if(PyType_Ready(&ScalarArrayType) < 0)
         CLEAN_EXIT;
-#endif
 
 #if PY_MAJOR_VERSION >= 3
     m = PyModule_Create(&moduledef);
@@ -1880,6 +3039,9 @@ void initelliptic_curve(void)         {
         CLEAN_EXIT;
     PyECErrorObject = st->error;
     Py_INCREF(PyECErrorObject);
+    Py_INCREF(PyECErrorObject);
+    if(PyModule_AddObject(m, "Error", PyECErrorObject) != 0)
+        CLEAN_EXIT;
 
     Py_INCREF(&ECType);
     if(PyModule_AddObject(m, "ec_element", (PyObject *)&ECType) != 0)
@@ -1887,13 +3049,15 @@ void initelliptic_curve(void)         {
     Py_INCREF(&ECGroupType);
     if(PyModule_AddObject(m, "elliptic_curve", (PyObject *)&ECGroupType) != 0)
         CLEAN_EXIT;
+    Py_INCREF(&PointArrayType);
+    if(PyModule_AddObject(m, "PointArray", (PyObject *)&PointArrayType) != 0)
+        CLEAN_EXIT;
+    Py_INCREF(&ScalarArrayType);
+    if(PyModule_AddObject(m, "ScalarArray", (PyObject *)&ScalarArrayType) != 0)
+        CLEAN_EXIT;
 
     PyModule_AddIntConstant(m, "G", G);
     PyModule_AddIntConstant(m, "ZR", ZR);
-#ifdef BENCHMARK_ENABLED
-    ADD_BENCHMARK_OPTIONS(m);
-    PyModule_AddStringConstant(m, "Granular", _GRAN_OPT);
-#endif
     // initialize PRNG
     // replace with read from some source of randomness
 #ifndef MS_WINDOWS
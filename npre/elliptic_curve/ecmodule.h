@@ -71,22 +71,72 @@
 PyTypeObject ECType;
 PyTypeObject ECGroupType;
 PyTypeObject OperationType;
+PyTypeObject PointArrayType;
+PyTypeObject ScalarArrayType;
 static PyObject *PyECErrorObject;
 #define PyEC_Check(obj) PyObject_TypeCheck(obj, &ECType)
 #define PyECGroup_Check(obj) PyObject_TypeCheck(obj, &ECGroupType)
+#define PyPointArray_Check(obj) PyObject_TypeCheck(obj, &PointArrayType)
+#define PyScalarArray_Check(obj) PyObject_TypeCheck(obj, &ScalarArrayType)
 enum Group {ZR = 0, G, NONE_G};
 typedef enum Group GroupType;
 
 PyMethodDef ECElement_methods[];
 PyNumberMethods ecc_number;
 
+/* Maximum number of idle BN_CTX objects kept for operations running without the GIL */
+#define CTX_POOL_MAX 64
+/* Maximum number of released elements of each type kept for reuse by a group */
+#define FREELIST_MAX 128
+
+/* Operations counted per group and element type (encodings and their retries are counted as G) */
+enum BenchOp {MULTIPLICATION = 0, DIVISION, ADDITION, SUBTRACTION, EXPONENTIATION, MULTIEXP, INVERSION, ENCODE, ENCODE_RETRY, BENCH_OPS};
+
+/*
+ * Curve parameters of the message encoding (see encodeChunk), in GMP
+ * integers: its Jacobi symbol and modular exponentiation are several times
+ * faster than OpenSSL's. When p = 3 mod 4, sqrt_exp is (p + 1) / 4 and a
+ * square root is a single exponentiation; otherwise sqrt_exp is 0 and
+ * BN_mod_sqrt is used.
+ */
+typedef struct {
+	mpz_t p, a, b;
+	mpz_t sqrt_exp;
+	BIGNUM *bn_p;
+} EncodeParams;
+
+/*
+ * Scratch state of the encoding, set up once per call by encodeStart and
+ * reused for every chunk and attempt. bn_x and bn_y come from ctx.
+ */
+typedef struct {
+	EncodeParams *params;
+	BN_CTX *ctx;
+	mpz_t x, rhs, y, check;
+	BIGNUM *bn_x, *bn_y;
+	uint8_t input[MAX_BUF];
+	unsigned long long retries;
+} EncodeState;
+
 typedef struct {
 	PyObject_HEAD
 	EC_GROUP *ec_group;
 	int group_init;
+	int checked;
 	int nid;
 	BN_CTX *ctx;
 	BIGNUM *order;
+	BN_CTX *ctx_pool[CTX_POOL_MAX];
+	int ctx_pool_len;
+	PyObject *freelist[NONE_G][FREELIST_MAX];
+	int freelist_len[NONE_G];
+	EncodeParams *encode;
+	/* Since the group was created or resetCounters was called */
+	unsigned long long counters[BENCH_OPS][NONE_G];
+#ifdef BENCHMARK_ENABLED
+	int bench_active;
+	unsigned long long bench[BENCH_OPS][NONE_G];
+#endif
 } ECGroup;
 
 typedef struct {
@@ -96,6 +146,8 @@ typedef struct {
 	EC_POINT *P;
 	BIGNUM *elemZ;
 	int point_init;
+	/* Set by _accumulator: may be updated in place by _mulInto and _addInto */
+	int accumulator;
 } ECElement;
 
 #if PY_MAJOR_VERSION >= 3
@@ -112,6 +164,9 @@ typedef struct {
 	return NULL;
 
 #define Check_Types2(o1, o2, lhs, rhs, foundLHS, foundRHS)  \
+	if(PyPointArray_Check(o1) || PyScalarArray_Check(o1) || \
+	   PyPointArray_Check(o2) || PyScalarArray_Check(o2)) { \
+		Py_RETURN_NOTIMPLEMENTED; } /* elementwise, see ecarray.c */ \
 	if(PyEC_Check(o1)) { \
 		lhs = (ECElement *) o1; \
 		debug("found a lhs object.\n"); \
@@ -157,10 +212,26 @@ PyObject *ECElement_print(ECElement *self);
 void	ECElement_dealloc(ECElement* self);
 
 ECElement *negatePoint(ECElement *self);
+BN_CTX *acquireCtx(ECGroup *gobj);
+void releaseCtx(ECGroup *gobj, BN_CTX *ctx);
+void clearPoint(ECGroup *gobj, EC_POINT *P);
+int mulPoint(ECGroup *gobj, EC_POINT *r, const EC_POINT *P, const BIGNUM *k, BN_CTX *ctx);
+size_t pointLen(ECGroup *gobj);
+PyObject *arrayMultiexp(PyObject *points, PyObject *scalars);
 ECElement *invertECElement(ECElement *self);
 int hash_to_bytes(uint8_t *input_buf, int input_len, uint8_t *output_buf, int hash_len, uint8_t hash_prefix);
 EC_POINT *element_from_hash(EC_GROUP *group, BIGNUM *order, uint8_t *input, int input_len);
 
+/* Counters are only updated with the GIL held */
+#ifdef BENCHMARK_ENABLED
+#define UPDATE_BENCH_N(op, t, gobj, n) do { \
+	(gobj)->counters[op][t] += (n); \
+	if((gobj)->bench_active) { (gobj)->bench[op][t] += (n); } } while(0)
+#else
+#define UPDATE_BENCH_N(op, t, gobj, n) do { (gobj)->counters[op][t] += (n); } while(0)
+#endif
+#define UPDATE_BENCH(op, t, gobj) UPDATE_BENCH_N(op, t, gobj, 1)
+
 #define EXIT_IF(check, msg) \
 	if(check) { 						\
 	PyErr_SetString(PyECErrorObject, msg); \
@@ -0,0 +1,164 @@
+'''
+Pool of precomputed ephemeral key pairs (r, g ** r)
+
+Encapsulation and BBS98 encryption start with a random r and the
+exponentiation g ** r, which does not depend on the recipient. A pool
+computes these pairs ahead of time in a background thread, so the request
+path is left with the recipient-dependent exponentiation only. The
+exponentiation releases the GIL, so the thread runs on another core while
+requests are served.
+
+Below `low` pairs the thread refills the pool straight away. Above it, the
+pool is only topped up to `high` pairs once no pair has been taken for
+`idle` seconds, so that on busy machines the work moves to quiet periods.
+Every pair is handed out once. Pairs left over when the pool is closed, or
+collected, are wiped with zeroize. A pool used in a forked child drops the
+pairs it inherited (which the parent hands out too) and starts a new thread.
+'''
+
+import os
+import time
+import weakref
+from collections import deque
+from threading import Condition, Thread
+
+import npre.elliptic_curve as ec
+
+
+def generate(ecgroup, g):
+    """
+    Returns a fresh ephemeral key pair (r, g ** r)
+    """
+    r = ec.random(ecgroup, ec.ZR)
+    return r, g ** r
+
+
+def _wipe(pairs):
+    while pairs:
+        r, pub = pairs.pop()
+        r.zeroize()
+        pub.zeroize()
+
+
+# Longest wait of the thread before it checks whether the pool is still used
+_MAX_WAIT = 1.0
+
+
+def _refill(pool_ref, cond):
+    # Only a weak reference is kept while waiting, so that a pool which is no
+    # longer used is collected (and closed by its finalizer) and the thread ends
+    while True:
+        pool = pool_ref()
+        if pool is None or not pool._refill():
+            return
+        with cond:
+            timeout = pool._wait_time()
+            del pool
+            if timeout:
+                cond.wait(timeout)
+
+
+def _close(cond, pairs):
+    with cond:
+        _wipe(pairs)
+        cond.notify()
+
+
+class EphemeralPool(object):
+    def __init__(self, ecgroup, g, low=64, high=256, idle=0.05):
+        if not 0 <= low < high:
+            raise ValueError('Watermarks must satisfy 0 <= low < high')
+        self.ecgroup = ecgroup
+        self.g = g
+        self.low = low
+        self.high = high
+        self.idle = idle
+        self.hits = 0
+        self.misses = 0
+        self._pairs = deque()
+        self._last_take = 0
+        self._closed = False
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._cond = Condition()
+        # Unused pairs are wiped even if the pool is dropped without close()
+        self._finalizer = weakref.finalize(self, _close, self._cond, self._pairs)
+        self._thread = None
+        if not self._closed:
+            self._thread = Thread(target=_refill, args=(weakref.ref(self), self._cond),
+                                  name='npre-ephemeral-pool', daemon=True)
+            self._thread.start()
+
+    def _after_fork(self):
+        # The lock may have been copied while held by the parent's thread,
+        # which does not exist here: replace it rather than acquire it
+        self._finalizer.detach()
+        _wipe(self._pairs)
+        self._start()
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def take(self):
+        """
+        Returns an unused key pair (r, g ** r). It is computed on the spot if
+        the pool is empty or closed. The caller should zeroize r once it is
+        done with it.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._cond:
+            full = len(self._pairs) >= self.high
+            pair = self._pairs.popleft() if self._pairs else None
+            if pair is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._last_take = time.monotonic()
+            # The thread sleeps until woken up when the pool is full
+            if full or len(self._pairs) < self.low:
+                self._cond.notify()
+        return pair or generate(self.ecgroup, self.g)
+
+    def _wait_time(self):
+        # Called with the lock held: how long the thread waits for the pool
+        # to run low, or to be idle while not full
+        if self._closed or len(self._pairs) < self.low:
+            return 0
+        return _MAX_WAIT if len(self._pairs) >= self.high else self.idle
+
+    def _refill(self):
+        """
+        Fills the pool up if it is low, or idle while not full. Returns False
+        once the pool is closed.
+        """
+        while True:
+            with self._cond:
+                if self._closed:
+                    return False
+                size = len(self._pairs)
+                idle = time.monotonic() - self._last_take >= self.idle
+                if size >= self.high or (size >= self.low and not idle):
+                    return True
+            r, pub = generate(self.ecgroup, self.g)
+            with self._cond:
+                if self._closed:
+                    r.zeroize()
+                    pub.zeroize()
+                    return False
+                self._pairs.append((r, pub))
+
+    def close(self):
+        """
+        Stops the background thread and wipes the unused pairs
+        """
+        if self._pid != os.getpid():
+            self._closed = True
+            self._after_fork()
+        with self._cond:
+            self._closed = True
+        self._finalizer()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
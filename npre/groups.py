@@ -0,0 +1,77 @@
+'''
+Process-wide registry of elliptic curve groups and generators
+
+Creating a group builds the curve and allocates its BN_CTX. PRE objects
+take their group and generator from here, so all PRE objects of one curve
+share them and constructing one is a dictionary lookup.
+
+The parameters of a curve are validated with EC_GROUP_check (ec.check) when
+its group is first created, so at most once per curve and process rather
+than once per PRE object.
+'''
+
+from threading import Lock
+import npre.elliptic_curve as ec
+
+_groups = {}
+_generators = {}
+_lock = Lock()
+
+
+def group(nid):
+    """
+    Returns the shared group of curve nid, with checked parameters
+    """
+    ecgroup = _groups.get(nid)
+    if ecgroup is None:
+        with _lock:
+            ecgroup = _groups.get(nid)
+            if ecgroup is None:
+                ecgroup = ec.elliptic_curve(nid=nid, check=False)
+                # Raises ec.Error, leaving nothing registered, if it fails
+                ec.check(ecgroup)
+                _groups[nid] = ecgroup
+    return ecgroup
+
+
+def generator(nid, g=None):
+    """
+    Returns the shared generator of curve nid, or the shared element for a
+    custom generator g (an element or its serialization)
+    """
+    if g is None:
+        key = (nid, None)
+    elif isinstance(g, ec.ec_element):
+        key = (nid, ec.serialize(g))
+    else:
+        key = (nid, bytes(g))
+
+    element = _generators.get(key)
+    if element is None:
+        ecgroup = group(nid)
+        if g is None:
+            element = ec.getGenerator(ecgroup)
+        else:
+            element = ec.deserialize(ecgroup, key[1])
+            if element is False or element.type != ec.G:
+                raise ec.Error('invalid generator.')
+        with _lock:
+            element = _generators.setdefault(key, element)
+    return element
+
+
+def registered():
+    """
+    Returns {nid: group} of the shared groups
+    """
+    with _lock:
+        return dict(_groups)
+
+
+def clear():
+    """
+    Drops all shared groups and generators (PRE objects keep theirs)
+    """
+    with _lock:
+        _groups.clear()
+        _generators.clear()
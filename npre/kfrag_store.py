@@ -0,0 +1,302 @@
+'''
+Memory-mapped store of kFrags for proxy nodes
+
+A proxy holding kFrags for many policies keeps them in a KFragStore rather
+than as RekeyFrag objects in memory. The store is a file of fixed-size
+records forming an open addressing hash table (linear probing) keyed by an
+arbitrary byte string, typically the policy id:
+
+    header   magic b'NPKS' | version | curve nid | capacity | used | deleted
+    record   state (1 byte) | key digest (16 bytes) | kFrag | vKeys offset | vKeys count
+
+The kFrag is kept in the npre.wire format, so raw() hands out a memoryview
+of the mapped file that can be passed on as is (to AsyncPRE.areencrypt for
+instance). get() converts it to a RekeyFrag on first use, and keeps the most
+recently used ones in a small cache. vKeys live in a sidecar file
+(path + '.vkeys') of concatenated compressed points.
+
+Opening a store maps the file and reads its header, whatever the number of
+kFrags, and only the pages of the records looked up become resident.
+The table doubles once more than 3/4 of its slots are used or deleted.
+Keys are identified by the first 16 bytes of their SHA-256 digest. Space
+taken by replaced or deleted vKeys is not reclaimed.
+
+A store is safe to use from several threads of one process, but not to be
+written by several processes at once.
+'''
+
+import hashlib
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from threading import Lock
+
+from npre import curves, groups, umbral, wire
+
+MAGIC = b'NPKS'
+VERSION = 1
+HEADER = struct.Struct('>4sBxHQQQ')
+VKEYS = struct.Struct('>QI')
+DIGEST_SIZE = 16
+
+EMPTY = 0
+USED = 1
+DELETED = 2
+
+
+def digest(key):
+    return hashlib.sha256(key).digest()[:DIGEST_SIZE]
+
+
+class KFragStore(object):
+    # Number of RekeyFrag objects kept by get()
+    cache_size = 1024
+
+    def __init__(self, path, curve=curves.secp256k1, capacity=1024):
+        self.path = path
+        self.ecgroup = groups.group(curve)
+        self.pre = umbral.PRE(curve=curve)
+        point_size, scalar_size = wire.sizes(self.ecgroup)
+        self.point_size = point_size
+        self.kfrag_size = wire.HEADER.size + 2 * scalar_size + 1
+        self.record_size = 1 + DIGEST_SIZE + self.kfrag_size + VKEYS.size
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+        if not os.path.exists(path):
+            size = 1
+            while size < capacity:
+                size *= 2
+            self._create(path, size)
+        self._map = self._open(path)
+        self._vkeys = open(path + '.vkeys', 'a+b')
+        self._vmap = None
+
+    def _create(self, path, capacity):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.ecgroup.nid, capacity, 0, 0))
+            f.truncate(HEADER.size + capacity * self.record_size)
+
+    def _open(self, path):
+        with open(path, 'r+b') as f:
+            m = mmap.mmap(f.fileno(), 0)
+        magic, version, nid, capacity, used, deleted = HEADER.unpack_from(m)
+        if magic != MAGIC:
+            raise ValueError('Not a kFrag store')
+        if version != VERSION:
+            raise ValueError('Unsupported kFrag store version: {}'.format(version))
+        if nid != self.ecgroup.nid:
+            raise ValueError('Store is for curve {}, not {}'.format(nid, self.ecgroup.nid))
+        if len(m) != HEADER.size + capacity * self.record_size:
+            raise ValueError('Truncated kFrag store')
+        self._capacity = capacity
+        self._used = used
+        self._deleted = deleted
+        return m
+
+    def _offset(self, slot):
+        return HEADER.size + slot * self.record_size
+
+    def _find(self, key_digest):
+        """
+        Returns (slot, found): the slot holding key_digest, or else the slot
+        where it would be inserted
+        """
+        m = self._map
+        mask = self._capacity - 1
+        slot = int.from_bytes(key_digest[:8], 'big') & mask
+        free = None
+        while True:
+            offset = self._offset(slot)
+            state = m[offset]
+            if state == EMPTY:
+                return (slot if free is None else free), False
+            if state == DELETED:
+                if free is None:
+                    free = slot
+            elif m[offset + 1:offset + 1 + DIGEST_SIZE] == key_digest:
+                return slot, True
+            slot = (slot + 1) & mask
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.ecgroup.nid,
+                         self._capacity, self._used, self._deleted)
+
+    def _resize(self):
+        capacity = self._capacity
+        if self._used + 1 > capacity // 2:
+            capacity *= 2
+        old, old_capacity = self._map, self._capacity
+        tmp = self.path + '.tmp'
+        self._create(tmp, capacity)
+        self._map = self._open(tmp)
+        for slot in range(old_capacity):
+            offset = HEADER.size + slot * self.record_size
+            if old[offset] == USED:
+                record = old[offset:offset + self.record_size]
+                new_slot, _ = self._find(record[1:1 + DIGEST_SIZE])
+                new_offset = self._offset(new_slot)
+                self._map[new_offset:new_offset + self.record_size] = record
+                self._used += 1
+        self._write_header()
+        self._map.flush()
+        os.replace(tmp, self.path)
+        # Memoryviews handed out by raw() keep the old mapping alive
+        try:
+            old.close()
+        except BufferError:
+            pass
+
+    def _vkeys_view(self, offset, count):
+        end = offset + count * self.point_size
+        if self._vmap is None or len(self._vmap) < end:
+            self._vkeys.flush()
+            self._vmap = mmap.mmap(self._vkeys.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._vmap)[offset:end]
+
+    def __len__(self):
+        return self._used
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._find(digest(key))[1]
+
+    def put(self, key, kfrag, vkeys=None, threshold=None):
+        """
+        Stores kfrag (a RekeyFrag or its wire encoding) and optionally its
+        vKeys (points or their concatenated compressed encodings) under key,
+        replacing what was stored under it. If the threshold of the split is
+        given, there must be that many vKeys.
+        """
+        if isinstance(kfrag, umbral.RekeyFrag):
+            kfrag = self.pre.save_kfrag(kfrag)
+        else:
+            # Checks the encoding
+            self.pre.load_kfrag(kfrag)
+        if vkeys is not None:
+            if not isinstance(vkeys, (bytes, bytearray, memoryview)):
+                vkeys = wire.dump_points(self.ecgroup, vkeys)
+            count, extra = divmod(len(vkeys), self.point_size)
+            if extra or count == 0:
+                raise ValueError('Invalid vKeys length')
+            if threshold is not None and count != threshold:
+                raise ValueError('Expected {} vKeys, got {}'.format(threshold, count))
+
+        key_digest = digest(key)
+        with self._lock:
+            vkeys_offset = vkeys_count = 0
+            if vkeys is not None:
+                self._vkeys.seek(0, os.SEEK_END)
+                vkeys_offset = self._vkeys.tell()
+                vkeys_count = len(vkeys) // self.point_size
+                self._vkeys.write(vkeys)
+
+            slot, found = self._find(key_digest)
+            if not found:
+                if self._used + self._deleted + 1 > self._capacity * 3 // 4:
+                    self._resize()
+                    slot, _ = self._find(key_digest)
+                elif self._map[self._offset(slot)] == DELETED:
+                    self._deleted -= 1
+                self._used += 1
+            offset = self._offset(slot)
+            self._map[offset + 1 + self.kfrag_size + DIGEST_SIZE:offset + self.record_size] = \
+                VKEYS.pack(vkeys_offset, vkeys_count)
+            self._map[offset + 1:offset + 1 + DIGEST_SIZE + self.kfrag_size] = key_digest + kfrag
+            self._map[offset] = USED
+            self._write_header()
+            self._cache.pop(key_digest, None)
+
+    def _record(self, key_digest):
+        slot, found = self._find(key_digest)
+        return self._offset(slot) if found else None
+
+    def raw(self, key):
+        """
+        Returns the wire encoding of the kFrag stored under key as a
+        memoryview of the store, or None. It must not be written to.
+        """
+        with self._lock:
+            offset = self._record(digest(key))
+            if offset is None:
+                return None
+            start = offset + 1 + DIGEST_SIZE
+            return memoryview(self._map)[start:start + self.kfrag_size]
+
+    def get(self, key, default=None):
+        """
+        Returns the RekeyFrag stored under key, or default
+        """
+        key_digest = digest(key)
+        with self._lock:
+            kfrag = self._cache.get(key_digest)
+            if kfrag is not None:
+                self._cache.move_to_end(key_digest)
+                return kfrag
+            offset = self._record(key_digest)
+            if offset is None:
+                return default
+            start = offset + 1 + DIGEST_SIZE
+            kfrag = self.pre.load_kfrag(self._map[start:start + self.kfrag_size])
+            self._cache[key_digest] = kfrag
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return kfrag
+
+    def vkeys(self, key):
+        """
+        Returns the vKeys stored with the kFrag under key, or None
+        """
+        with self._lock:
+            offset = self._record(digest(key))
+            if offset is None:
+                return None
+            vkeys_offset, count = VKEYS.unpack_from(
+                self._map, offset + 1 + DIGEST_SIZE + self.kfrag_size)
+            if not count:
+                return None
+            data = self._vkeys_view(vkeys_offset, count)
+        return wire.load_points(self.ecgroup, data)
+
+    def delete(self, key):
+        """
+        Removes the kFrag stored under key, returns whether there was one
+        """
+        key_digest = digest(key)
+        with self._lock:
+            offset = self._record(key_digest)
+            if offset is None:
+                return False
+            self._map[offset] = DELETED
+            self._used -= 1
+            self._deleted += 1
+            self._write_header()
+            self._cache.pop(key_digest, None)
+            return True
+
+    def flush(self):
+        """
+        Writes pending changes to disk
+        """
+        with self._lock:
+            self._vkeys.flush()
+            os.fsync(self._vkeys.fileno())
+            self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            self._vkeys.close()
+            for m in (self._map, self._vmap):
+                try:
+                    if m is not None:
+                        m.close()
+                except BufferError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
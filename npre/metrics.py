@@ -0,0 +1,207 @@
+'''
+Runtime instrumentation of PRE operations
+
+The main methods of umbral.PRE and bbs98.PRE (encapsulate, decapsulate,
+reencrypt, combine, split_rekey, encrypt, decrypt...) count their calls,
+failures and latency in a histogram. The extension also counts, per group,
+the operations it does (exponentiations, multiplications, inversions,
+encoding retries...) with ec.getCounters. Both are always on and cost a
+couple of clock reads and counter updates per call.
+
+    metrics.snapshot()       # {'calls': {...}, 'groups': {...}, 'encode_retries': {...}}
+    metrics.prometheus()     # the same in the Prometheus text format
+    metrics.reset()
+
+Groups are those of the npre.groups registry, which all PRE objects use.
+encode_retries gives the average number of failed attempts per message
+encoding (BBS98 chunks), about 1 since half of the abscissas are on the
+curve.
+
+set_sampler(hook, rate) calls hook(name, start, duration, error) for a
+random fraction rate of the calls, to feed a tracer with some of them.
+name is 'scheme.method', start a time.time() timestamp and error whether
+the call raised.
+'''
+
+import random
+import time
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+
+import npre.elliptic_curve as ec
+from npre import curves, groups
+
+# Upper bounds of the latency buckets in seconds, the last one is +Inf
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, float('inf'))
+
+# Set to False to stop timing calls
+enabled = True
+
+_methods = {}
+_sampler = None
+_sample_rate = 0.0
+
+_curve_names = {nid: name for name, nid in vars(curves).items()
+                if isinstance(nid, int) and not name.startswith('_')}
+
+
+class Histogram(object):
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(BUCKETS)
+            self.sum = 0.0
+            self.errors = 0
+
+    def observe(self, duration, error=False):
+        i = bisect_left(BUCKETS, duration)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += duration
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            return {'count': sum(counts), 'sum': self.sum, 'errors': self.errors,
+                    'buckets': counts}
+
+
+def timed(scheme, method):
+    """
+    Decorator counting the calls of a PRE method and their latency
+    """
+    name = '{}.{}'.format(scheme, method)
+    histogram = _methods.setdefault(name, Histogram())
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            error = True
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                duration = time.perf_counter() - start
+                histogram.observe(duration, error)
+                if _sampler is not None and random.random() < _sample_rate:
+                    _sampler(name, time.time() - duration, duration, error)
+        return wrapper
+    return decorate
+
+
+def set_sampler(hook, rate=0.01):
+    """
+    Calls hook(name, start, duration, error) for a fraction rate of the
+    timed calls, or for none if hook is None
+    """
+    global _sampler, _sample_rate
+    if not 0 <= rate <= 1:
+        raise ValueError('rate must be between 0 and 1')
+    _sampler, _sample_rate = hook, rate
+
+
+def curve_name(nid):
+    return _curve_names.get(nid, str(nid))
+
+
+def encode_retries(group_counts=None):
+    """
+    Returns {curve: average number of failed attempts per encoding} for the
+    curves with encodings, from the group counters of a snapshot (the
+    current ones by default)
+    """
+    if group_counts is None:
+        group_counts = snapshot()['groups']
+    return {curve: counts['EncodeRetry']['G'] / counts['Encode']['G']
+            for curve, counts in group_counts.items() if counts['Encode']['G']}
+
+
+def snapshot():
+    """
+    Returns the counters as a dictionary:
+
+        {'calls': {'umbral.reencrypt': {'count': .., 'sum': .., 'errors': ..,
+                                        'buckets': [count per bucket]}, ...},
+         'groups': {'secp256k1': {'Exp': {'ZR': .., 'G': ..}, ...}, ...},
+         'encode_retries': {'secp256k1': .., ...}}
+    """
+    calls = {name: h.snapshot() for name, h in sorted(_methods.items())}
+    group_counts = {}
+    for nid, ecgroup in sorted(groups.registered().items()):
+        group_counts[curve_name(nid)] = {
+            op: {'ZR': zr, 'G': g} for op, (zr, g) in sorted(ec.getCounters(ecgroup).items())}
+    return {'calls': calls, 'groups': group_counts,
+            'encode_retries': encode_retries(group_counts)}
+
+
+def reset():
+    """
+    Sets all the counters to zero
+    """
+    for histogram in _methods.values():
+        histogram.reset()
+    for ecgroup in groups.registered().values():
+        ec.resetCounters(ecgroup)
+
+
+def _bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def prometheus(data=None):
+    """
+    Renders a snapshot (a new one by default) in the Prometheus text format
+    """
+    if data is None:
+        data = snapshot()
+    lines = [
+        '# HELP npre_call_seconds Latency of PRE operations.',
+        '# TYPE npre_call_seconds histogram',
+    ]
+    for name, h in data['calls'].items():
+        scheme, method = name.split('.', 1)
+        labels = 'scheme="{}",method="{}"'.format(scheme, method)
+        total = 0
+        for bound, count in zip(BUCKETS, h['buckets']):
+            total += count
+            lines.append('npre_call_seconds_bucket{{{},le="{}"}} {}'.format(labels, _bound(bound), total))
+        lines.append('npre_call_seconds_sum{{{}}} {!r}'.format(labels, h['sum']))
+        lines.append('npre_call_seconds_count{{{}}} {}'.format(labels, h['count']))
+
+    lines += [
+        '# HELP npre_call_errors_total PRE operations which raised an exception.',
+        '# TYPE npre_call_errors_total counter',
+    ]
+    for name, h in data['calls'].items():
+        scheme, method = name.split('.', 1)
+        lines.append('npre_call_errors_total{{scheme="{}",method="{}"}} {}'.format(
+            scheme, method, h['errors']))
+
+    lines += [
+        '# HELP npre_group_operations_total Group operations done by the extension.',
+        '# TYPE npre_group_operations_total counter',
+    ]
+    for curve, ops in data['groups'].items():
+        for op, counts in ops.items():
+            for kind, count in sorted(counts.items()):
+                lines.append('npre_group_operations_total{{curve="{}",op="{}",type="{}"}} {}'.format(
+                    curve, op, kind, count))
+
+    lines += [
+        '# HELP npre_encode_retries_average Failed attempts per message encoding.',
+        '# TYPE npre_encode_retries_average gauge',
+    ]
+    for curve, average in data['encode_retries'].items():
+        lines.append('npre_encode_retries_average{{curve="{}"}} {!r}'.format(curve, average))
+    return '\n'.join(lines) + '\n'
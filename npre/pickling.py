@@ -0,0 +1,96 @@
+'''
+Pickle support for groups, elements and arrays of the elliptic curve extension
+
+Importing npre registers reducers with copyreg, so that elements, groups,
+PointArrays and ScalarArrays (and the EncryptedKey and RekeyFrag tuples and
+PRE objects holding them) can be pickled, e.g. to send them to a
+ProcessPoolExecutor:
+
+    elements     group nid and ec.serialize encoding
+    groups       nid only
+    arrays       group nid and their fixed-width buffer
+
+Unpickled elements and arrays are bound to the group of the npre.groups
+registry of the receiving process, so that no curve is set up per object.
+Only groups of named curves can be pickled.
+
+With pickle protocol 5 (Python 3.8+), array buffers are pickled out of band:
+pickle.dumps(..., protocol=5, buffer_callback=...) hands them over without
+copying them into the pickle. Arrays are checked like PointArray.frombytes
+does when they are loaded.
+
+Pickles of private keys carry the key: only send them to trusted processes,
+as unpickling untrusted data is unsafe anyway.
+'''
+
+import copyreg
+import pickle
+
+import npre.elliptic_curve as ec
+from npre import groups
+
+try:
+    PickleBuffer = pickle.PickleBuffer
+except AttributeError:  # Python < 3.8
+    PickleBuffer = None
+
+
+def _nid(ecgroup):
+    if ecgroup is None or ecgroup.nid <= 0:
+        raise pickle.PicklingError('only groups of named curves can be pickled')
+    return ecgroup.nid
+
+
+def _load_element(nid, data):
+    element = ec.deserialize(groups.group(nid), data)
+    if element is False:
+        raise pickle.UnpicklingError('invalid element encoding')
+    return element
+
+
+def _reduce_element(element):
+    return _load_element, (_nid(element.group), ec.serialize(element))
+
+
+def _reduce_group(ecgroup):
+    return groups.group, (_nid(ecgroup),)
+
+
+class _ArrayBuffer(object):
+    """
+    Buffer of an array, pickled out of band with protocol 5
+    """
+    __slots__ = ('array',)
+
+    def __init__(self, array):
+        self.array = array
+
+    def __reduce_ex__(self, protocol):
+        if protocol >= 5 and PickleBuffer is not None:
+            return _buffer, (PickleBuffer(self.array),)
+        return _buffer, (bytes(memoryview(self.array)),)
+
+
+def _buffer(data):
+    # Arrays are loaded from any buffer, without a copy of it
+    return data
+
+
+def _load_array(kind, nid, buffer):
+    cls = ec.PointArray if kind == ec.G else ec.ScalarArray
+    return cls.frombytes(groups.group(nid), buffer)
+
+
+def _reduce_array(array):
+    kind = ec.G if isinstance(array, ec.PointArray) else ec.ZR
+    return _load_array, (kind, _nid(array.group), _ArrayBuffer(array))
+
+
+def register():
+    """
+    Registers the reducers with copyreg (done when npre is imported)
+    """
+    copyreg.pickle(ec.ec_element, _reduce_element)
+    copyreg.pickle(ec.elliptic_curve, _reduce_group)
+    copyreg.pickle(ec.PointArray, _reduce_array)
+    copyreg.pickle(ec.ScalarArray, _reduce_array)
@@ -0,0 +1,119 @@
+'''
+Process pool running the operations of a PRE object
+
+The extension releases the GIL during exponentiations, so a thread pool
+spreads those over several cores, but not the Python code around them
+(hashing, Lagrange coefficients, parsing). ProcessPool runs whole PRE
+methods in worker processes instead. Arguments and results are pickled
+(see npre.pickling), and each worker keeps one PRE object per curve and
+generator:
+
+    with ProcessPool(umbral.PRE()) as pool:
+        ekeys_b = pool.reencrypt_many(kfrag, ekeys)
+        keys = pool.decapsulate_many(priv_b, ekeys_b)
+        ekey = pool.submit('combine', ekeys_b[:threshold]).result()
+
+reencrypt_many and decapsulate_many split their input (a list, a
+PointArray or a buffer of serialized points) into one chunk per worker, or
+chunks of chunk_size items, and join the results in the same form.
+Operations run in the workers are counted by the metrics of the workers.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import npre.elliptic_curve as ec
+
+# PRE objects of this (worker) process, by their reduced form
+_pres = {}
+
+
+def _get_pre(key):
+    pre = _pres.get(key)
+    if pre is None:
+        cls, args = key
+        pre = _pres[key] = cls(*args)
+    return pre
+
+
+def _run(key, method, *args):
+    return getattr(_get_pre(key), method)(*args)
+
+
+def _join(ecgroup, parts):
+    if isinstance(parts[0], ec.PointArray):
+        result = ec.PointArray(ecgroup, sum(len(part) for part in parts))
+        start = 0
+        for part in parts:
+            result[start:start + len(part)] = part
+            start += len(part)
+        return result
+    if isinstance(parts[0], bytearray):
+        return bytearray().join(parts)
+    if isinstance(parts[0], bytes):
+        return b''.join(parts)
+    return [x for part in parts for x in part]
+
+
+class ProcessPool(object):
+    def __init__(self, pre, max_workers=None, chunk_size=None):
+        self.pre = pre
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._key = pre.__reduce__()
+        # Size of a serialized point in buffers of points
+        self._width = len(ec.serialize(pre.g))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait)
+
+    def submit(self, method, *args):
+        """
+        Runs pre.method(*args) in a worker, returning a Future
+        """
+        return self.executor.submit(_run, self._key, method, *args)
+
+    def map(self, method, *iterables, chunksize=1):
+        """
+        Same as map(pre.method, *iterables), run in the workers
+        """
+        return self.executor.map(partial(_run, self._key, method), *iterables, chunksize=chunksize)
+
+    def _chunks(self, items):
+        if isinstance(items, (bytes, bytearray, memoryview)):
+            n = len(items) // self._width
+            width = self._width
+        else:
+            n = len(items)
+            width = 1
+        size = self.chunk_size or -(-n // self.max_workers)
+        # memoryviews can't be pickled
+        return [bytes(items[i * width:(i + size) * width]) if width > 1 else items[i:i + size]
+                for i in range(0, n, size)]
+
+    def _many(self, method, arg, items, *args):
+        chunks = self._chunks(items)
+        if len(chunks) < 2:
+            return getattr(self.pre, method)(arg, items, *args)
+        futures = [self.submit(method, arg, chunk, *args) for chunk in chunks]
+        return _join(self.pre.ecgroup, [future.result() for future in futures])
+
+    def reencrypt_many(self, rk, ekeys):
+        """
+        pre.reencrypt_many(rk, ekeys) split over the workers
+        """
+        return self._many('reencrypt_many', rk, ekeys)
+
+    def decapsulate_many(self, priv_key, ekeys, key_length=32):
+        """
+        umbral.PRE.decapsulate_many split over the workers
+        """
+        return self._many('decapsulate_many', priv_key, ekeys, key_length)
@@ -0,0 +1,155 @@
+'''
+Streaming hybrid encryption on top of Umbral's KEM
+
+The symmetric key from umbral.PRE.encapsulate encrypts the data in chunks
+with ChaCha20-Poly1305 (the STREAM construction of Hoang, Reyhanitabar,
+Rogaway and Vizár). Memory use is bounded by the chunk size, whatever the
+size of the data, and reencryption only ever touches the capsule.
+
+Layout of an encrypted stream:
+
+    header    version (1 byte) | chunk size (4 bytes) | nonce prefix (7 bytes)
+    chunks    ciphertext of chunk size bytes of plaintext + 16 byte tag, ...
+    last      ciphertext of the remaining 0..chunk size bytes + 16 byte tag
+
+Chunk i is encrypted with nonce = prefix | i (4 bytes) | last flag (1 byte)
+and the header as associated data, so chunks cannot be reordered, dropped,
+truncated or moved to another stream.
+'''
+
+import os
+import struct
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+
+VERSION = 1
+DEFAULT_CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+HEADER = struct.Struct('>BI{}s'.format(NONCE_PREFIX_SIZE))
+
+
+class _Reader(object):
+    """
+    Reads blocks of exactly `size` bytes (except at the end) from a buffer
+    (bytes, memoryview, mmap...), a file-like object or an iterable of byte
+    strings. Buffers are sliced without copying.
+    """
+    def __init__(self, source):
+        self._view = self._file = self._chunks = None
+        self._pending = bytearray()
+        self._pos = 0
+        if hasattr(source, 'read'):
+            self._file = source
+        else:
+            try:
+                self._view = memoryview(source).cast('B')
+            except TypeError:
+                self._chunks = iter(source)
+
+    def read(self, size):
+        if self._view is not None:
+            block = self._view[self._pos:self._pos + size]
+            self._pos += len(block)
+            return block
+
+        while len(self._pending) < size:
+            if self._file is not None:
+                data = self._file.read(size - len(self._pending))
+                if not data:
+                    break
+            else:
+                # Only the end of the iterable ends the stream, not an empty piece
+                data = next(self._chunks, None)
+                if data is None:
+                    break
+            self._pending += data
+        block = bytes(self._pending[:size])
+        del self._pending[:size]
+        return block
+
+
+def _nonce(prefix, counter, last):
+    if counter >= 2 ** 32:
+        raise ValueError('Too many chunks in one stream')
+    return prefix + struct.pack('>IB', counter, last)
+
+
+def encrypt_chunks(key, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encrypts the plaintext from source (a buffer, file-like object or
+    iterable of byte strings) with key. Yields the header, then one
+    ciphertext per chunk of plaintext.
+    """
+    if not 0 < chunk_size < 2 ** 32 - TAG_SIZE:
+        raise ValueError('Invalid chunk size: {}'.format(chunk_size))
+    aead = ChaCha20Poly1305(key)
+    header = HEADER.pack(VERSION, chunk_size, os.urandom(NONCE_PREFIX_SIZE))
+    prefix = header[-NONCE_PREFIX_SIZE:]
+    yield header
+
+    reader = _Reader(source)
+    block = reader.read(chunk_size)
+    counter = 0
+    while True:
+        # Read ahead to know whether this is the last chunk
+        following = reader.read(chunk_size) if len(block) == chunk_size else b''
+        last = len(following) == 0
+        yield aead.encrypt(_nonce(prefix, counter, last), bytes(block), header)
+        if last:
+            return
+        block = following
+        counter += 1
+
+
+def decrypt_chunks(key, source):
+    """
+    Decrypts a stream made by encrypt_chunks from source (a buffer such as
+    a memory-mapped file, a file-like object or an iterable of byte strings
+    split at arbitrary places). Yields the plaintext chunk by chunk.
+
+    Raises cryptography.exceptions.InvalidTag if any chunk was modified,
+    and ValueError if the stream is malformed or truncated.
+    """
+    aead = ChaCha20Poly1305(key)
+    reader = _Reader(source)
+
+    header = bytes(reader.read(HEADER.size))
+    if len(header) != HEADER.size:
+        raise ValueError('Stream is too short')
+    version, chunk_size, prefix = HEADER.unpack(header)
+    if version != VERSION:
+        raise ValueError('Unsupported stream version: {}'.format(version))
+
+    size = chunk_size + TAG_SIZE
+    block = reader.read(size)
+    counter = 0
+    while True:
+        following = reader.read(size) if len(block) == size else b''
+        last = len(following) == 0
+        if len(block) < TAG_SIZE:
+            raise ValueError('Stream is truncated')
+        yield aead.decrypt(_nonce(prefix, counter, last), bytes(block), header)
+        if last:
+            return
+        block = following
+        counter += 1
+
+
+def encrypt(pre, pub_key, source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encapsulates a fresh key to pub_key with pre (an umbral.PRE) and
+    encrypts source with it.
+
+    Returns the capsule (EncryptedKey) and an iterator of ciphertext chunks.
+    """
+    key, ekey = pre.encapsulate(pub_key, key_length=32)
+    return ekey, encrypt_chunks(key, source, chunk_size)
+
+
+def decrypt(pre, priv_key, ekey, source):
+    """
+    Decapsulates the key from ekey (as made by encrypt, or reencrypted and
+    combined) and returns an iterator of plaintext chunks of source.
+    """
+    key = pre.decapsulate(priv_key, ekey, key_length=32)
+    return decrypt_chunks(key, source)
@@ -6,10 +6,15 @@ David Nuñez (dnunez@lcc.uma.es);
 Michael Egorov (michael@nucypher.com)
 '''
 
+import hashlib
+import hmac
+import weakref
 import npre.elliptic_curve as ec
-from npre import curves
+from npre import cache, curves, ephemeral, groups, metrics, wire
+from npre.util import pow_many
 from typing import Union
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from threading import Lock
 from functools import reduce
 from operator import mul
 from cryptography.hazmat.primitives import hashes
@@ -28,27 +33,156 @@ def lambda_coeff(id_i, selected_ids):
     return x
 
 
+def lambda_coeffs(selected_ids):
+    """
+    Lagrange coefficients of all selected_ids at once, the same as
+    [lambda_coeff(id_i, selected_ids) for id_i in selected_ids].
+
+    The denominators are inverted together with Montgomery's trick, so this
+    takes one modular inversion instead of one per pair of ids. Running
+    products are kept in private copies (ec._accumulator) updated in place.
+    """
+    t = len(selected_ids)
+    if t == 1:
+        return [selected_ids[0] ** 0]
+
+    # Numerators: product of all other ids, from prefix and suffix products
+    prefix = [selected_ids[0]]
+    for id_j in selected_ids[1:-1]:
+        prefix.append(prefix[-1] * id_j)
+    suffix = [selected_ids[-1]]
+    for id_j in selected_ids[-2:0:-1]:
+        suffix.append(suffix[-1] * id_j)
+    suffix.reverse()
+    nums = [suffix[0]] + [p * s for p, s in zip(prefix, suffix[1:])] + [prefix[-1]]
+
+    dens = []
+    for i, id_i in enumerate(selected_ids):
+        den = None
+        for j, id_j in enumerate(selected_ids):
+            if j != i:
+                if den is None:
+                    den = ec._accumulator(id_j - id_i)
+                else:
+                    ec._mulInto(den, id_j - id_i)
+        dens.append(den)
+
+    # Batch inversion of the denominators
+    acc = [dens[0]]
+    for den in dens[1:]:
+        acc.append(acc[-1] * den)
+    inv = ec._accumulator(~acc[-1])
+    coeffs = [None] * t
+    for i in range(t - 1, 0, -1):
+        coeff = ec._accumulator(nums[i] * inv)
+        ec._mulInto(coeff, acc[i - 1])
+        coeffs[i] = coeff
+        ec._mulInto(inv, dens[i])
+    coeffs[0] = nums[0] * inv
+    return coeffs
+
+
+def _hmac(key, data):
+    # key is an hmac object keyed once, copied for every message
+    h = key.copy()
+    h.update(data)
+    return h.digest()
+
+
+def hkdf_many(secrets, width, key_length, skip=0):
+    """
+    HKDF-SHA512 without salt and info, as in PRE.kdf, of every width bytes
+    of secrets (past their first skip bytes). Returns the keys concatenated
+    in a bytearray.
+    """
+    if not 0 < key_length <= 255 * 64:
+        raise ValueError('Invalid key length for HKDF-SHA512')
+    salt = hmac.new(bytes(64), digestmod=hashlib.sha512)
+    blocks = [bytes((i,)) for i in range(1, (key_length + 63) // 64 + 1)]
+    secrets = memoryview(secrets)
+    keys = bytearray()
+    for start in range(0, len(secrets), width):
+        prk = hmac.new(_hmac(salt, secrets[start + skip:start + width]), digestmod=hashlib.sha512)
+        block = b''
+        okm = bytearray()
+        for i in blocks:
+            block = _hmac(prk, block + i)
+            okm += block
+        keys += okm[:key_length]
+    return keys
+
+
 def poly_eval(coeff, x):
-    result = coeff[-1]
-    for i in range(-2, -len(coeff) - 1, - 1):
-        result = result * x + coeff[i]
+    if len(coeff) == 1:
+        return coeff[0]
+    # A private copy, updated in place from then on
+    result = ec._accumulator(coeff[-1] * x)
+    ec._addInto(result, coeff[-2])
+    for c in reversed(coeff[:-2]):
+        ec._mulInto(result, x)
+        ec._addInto(result, c)
     return result
 
 
+def _wipe(coeffs):
+    for coeff in coeffs:
+        coeff.zeroize()
+
+
+def _kfrags(ecgroup, coeffs, N, batch_size):
+    for start in range(0, N, batch_size):
+        ids = [ec.random(ecgroup, ec.ZR) for _ in range(min(batch_size, N - start))]
+        for id, key in zip(ids, ec.polyEval(coeffs, ids)):
+            yield RekeyFrag(id, key=key)
+
+
+class KFragStream(object):
+    """
+    Iterator over the kFrags of PRE.split_rekey_stream. The polynomial is
+    wiped once the stream is exhausted, closed or collected, even if it was
+    never iterated.
+    """
+    def __init__(self, ecgroup, coeffs, N, batch_size):
+        self._kfrags = _kfrags(ecgroup, coeffs, N, batch_size)
+        self._finalizer = weakref.finalize(self, _wipe, coeffs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._kfrags)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        self._kfrags.close()
+        self._finalizer()
+
+
 class PRE(object):
+    # Number of id sets whose Lagrange coefficients are kept for combine
+    lambda_cache_size = 128
+    # Set by start_ephemeral_pool
+    ephemeral_pool = None
+    # Set by enable_result_cache
+    result_cache = None
+
     def __init__(self, curve=curves.secp256k1, g=None):
         self.curve = curve
-        self.ecgroup = ec.elliptic_curve(nid=self.curve)
-
-        if g is None:
-            self.g = ec.getGenerator(self.ecgroup)
-        else:
-            if isinstance(g, ec.ec_element):
-                self.g = g
-            else:
-                self.g = ec.deserialize(self.ecgroup, g)
+        # Shared by all PRE objects of the curve, see npre.groups
+        self.ecgroup = groups.group(self.curve)
+        self.g = groups.generator(self.curve, g)
 
         self.bitsize = ec.bitsize(self.ecgroup)
+        self._lambda_cache = OrderedDict()
+        self._lambda_lock = Lock()
+
+    def __reduce__(self):
+        # Same as in BBS98
+        g = None if self.g == groups.generator(self.curve) else ec.serialize(self.g)
+        return type(self), (self.curve, g)
 
     def kdf(self, ecdata, key_length):
         # XXX length
@@ -90,12 +224,36 @@ class PRE(object):
         # Same as in BBS98
         return ec.serialize(key)
 
+    def save_ekey(self, ekey):
+        """Encodes an EncryptedKey in the npre.wire format"""
+        return wire.dump_capsule(self.ecgroup, ekey.ekey, ekey.re_id)
+
+    def load_ekey(self, data):
+        return EncryptedKey(*wire.load_capsule(self.ecgroup, data))
+
+    def save_kfrag(self, kfrag):
+        """Encodes a RekeyFrag in the npre.wire format"""
+        return wire.dump_kfrag(self.ecgroup, kfrag.id, kfrag.key)
+
+    def load_kfrag(self, data):
+        return RekeyFrag(*wire.load_kfrag(self.ecgroup, data))
+
     def rekey(self, priv1, priv2, dtype=None):
         # Same as in BBS98
         rk = priv1 * (~priv2)
         return RekeyFrag(id=None, key=rk)
 
+    @metrics.timed('umbral', 'split_rekey')
     def split_rekey(self, priv_a, priv_b, threshold, N):
+        vKeys, kFrags = self.split_rekey_stream(priv_a, priv_b, threshold, N)
+        return list(kFrags), vKeys
+
+    def split_rekey_stream(self, priv_a, priv_b, threshold, N, batch_size=64):
+        """
+        Same as split_rekey, but returns vKeys and a KFragStream of the N
+        kFrags, so that the first Ursulas can be contacted while the others
+        are computed. kFrags are evaluated in C, batch_size at a time.
+        """
         coeffs = [priv_a * (~priv_b)]  # Standard rekey
         coeffs += [ec.random(self.ecgroup, ec.ZR) for _ in range(threshold - 1)]
 
@@ -104,12 +262,7 @@ class PRE(object):
 
         vKeys = [h ** coeff for coeff in coeffs]
 
-        ids = [ec.random(self.ecgroup, ec.ZR) for _ in range(N)]
-        rk_shares = [
-                RekeyFrag(id, key=poly_eval(coeffs, id))
-                for id in ids]
-
-        return rk_shares, vKeys
+        return vKeys, KFragStream(self.ecgroup, coeffs, N, batch_size)
 
     def check_kFrag_consistency(self, kFrag, vKeys):
         if vKeys is None or len(vKeys) == 0:
@@ -121,48 +274,233 @@ class PRE(object):
         lh_exp = h ** kFrag.key
 
         if len(vKeys) > 1:
-            i_j = [i]
+            i_j = [1, i]
             for _ in range(len(vKeys) - 2):
                 i_j.append(i_j[-1] * i)
-            rh_exp = reduce(mul, [x ** y for (x, y) in zip(vKeys[1:], i_j)])
-            rh_exp = vKeys[0] * rh_exp
+            rh_exp = ec.multiexp(vKeys, i_j)
 
         else:
             rh_exp = vKeys[0]
 
         return lh_exp == rh_exp
 
+    def check_kFrags_consistency(self, kFrags, vKeys):
+        """
+        Checks many kFrags against the same vKeys at once.
+
+        All kFrags are verified together with a random linear combination
+        of their equations: g ** sum(r_k * key_k) must equal
+        prod_j vKeys[j] ** sum(r_k * id_k ** j), which costs one
+        exponentiation and one multi-exponentiation over vKeys. If the batch
+        fails, it is bisected to find the bad kFrags.
+
+        Returns a list with the consistency of every kFrag.
+        """
+        if vKeys is None or len(vKeys) == 0:
+            raise ValueError('vKeys must not be empty')
+
+        def batch_holds(indices):
+            # Everything stays in ZR so the secret keys never become Python
+            # ints. With random weights a bad kFrag passes with probability
+            # 1 / order.
+            lh_exp = ec.init(self.ecgroup, ec.ZR)
+            exps = [ec.init(self.ecgroup, ec.ZR) for _ in vKeys]
+            for i in indices:
+                w = ec.random(self.ecgroup, ec.ZR)
+                lh_exp += w * kFrags[i].key
+                for j in range(len(vKeys)):
+                    exps[j] += w
+                    w = w * kFrags[i].id
+            return self.g ** lh_exp == ec.multiexp(vKeys, exps)
+
+        result = [False] * len(kFrags)
+        pending = [list(range(len(kFrags)))] if kFrags else []
+        while pending:
+            indices = pending.pop()
+            if batch_holds(indices):
+                for i in indices:
+                    result[i] = True
+            elif len(indices) > 1:
+                half = len(indices) // 2
+                pending += [indices[:half], indices[half:]]
+
+        return result
+
+    def lambda_coeffs(self, ids):
+        """
+        Lagrange coefficients for ids (see lambda_coeffs), cached by the set
+        of ids since Bob often combines shares from the same Ursulas. The
+        cache keeps them serialized: every call returns new elements.
+        """
+        width = wire.sizes(self.ecgroup)[1]
+        keys = ec.serializeMany(ids)
+        keys = [keys[i:i + width] for i in range(0, len(keys), width)]
+        order = sorted(range(len(ids)), key=keys.__getitem__)
+        cache_key = tuple(keys[i] for i in order)
+
+        with self._lambda_lock:
+            data = self._lambda_cache.get(cache_key)
+            if data is not None:
+                self._lambda_cache.move_to_end(cache_key)
+        if data is None:
+            coeffs = lambda_coeffs([ids[i] for i in order])
+            data = ec.serializeMany(coeffs)
+            with self._lambda_lock:
+                self._lambda_cache[cache_key] = data
+                if len(self._lambda_cache) > self.lambda_cache_size:
+                    self._lambda_cache.popitem(last=False)
+        else:
+            coeffs = ec.deserializeMany(self.ecgroup, data, ec.ZR)[0]
+
+        result = [None] * len(ids)
+        for coeff, i in zip(coeffs, order):
+            result[i] = coeff
+        return result
+
+    @metrics.timed('umbral', 'combine')
     def combine(self, encrypted_keys):
         if len(encrypted_keys) > 1:
             ids = [x.re_id for x in encrypted_keys]
-            map_list = [
-                    x.ekey ** lambda_coeff(x.re_id, ids)
-                    for x in encrypted_keys]
-            product = reduce(mul, map_list)
+            product = ec.multiexp(
+                    [x.ekey for x in encrypted_keys],
+                    self.lambda_coeffs(ids))
             return EncryptedKey(ekey=product, re_id=None)
 
         elif len(encrypted_keys) == 1:
             return encrypted_keys[0]
 
+    @metrics.timed('umbral', 'reencrypt')
     def reencrypt(self, rk, ekey):
+        results = self.result_cache
+        if results is not None:
+            tag = self.save_kfrag(rk)
+            key = cache.digest(b'reencrypt', tag, ec.serialize(ekey.ekey))
+            cached = results.get(key)
+            if cached is not None:
+                return EncryptedKey(ec.deserialize(self.ecgroup, cached), rk.id)
+
         new_ekey = ekey.ekey ** rk.key
+        if results is not None:
+            results.put(key, ec.serialize(new_ekey), tag)
         return EncryptedKey(new_ekey, rk.id)
 
+    @metrics.timed('umbral', 'reencrypt_many')
+    def reencrypt_many(self, rk, ekeys, executor=None):
+        """
+        Reencrypts many capsules with the same kFrag in one call.
+
+        ekeys is either a sequence of EncryptedKey, giving a list of
+        EncryptedKey, or a PointArray of capsule points or a buffer of their
+        concatenated serializations, giving the reencrypted points in the
+        same form (all with re_id = rk.id).
+        A thread pool executor spreads the work over several cores.
+        """
+        if isinstance(ekeys, (ec.PointArray, bytes, bytearray, memoryview)):
+            return pow_many(self.ecgroup, ekeys, rk.key, executor)
+
+        points = pow_many(self.ecgroup, [x.ekey for x in ekeys], rk.key, executor)
+        return [EncryptedKey(p, rk.id) for p in points]
+
+    @metrics.timed('umbral', 'encapsulate')
     def encapsulate(self, pub_key, key_length=32):
         """Generare an ephemeral key pair and symmetric key"""
-        priv_e = ec.random(self.ecgroup, ec.ZR)
-        pub_e = self.g ** priv_e
+        priv_e, pub_e = self._ephemeral()
 
         # DH between eph_private_key and public_key
         shared_key = pub_key ** priv_e
 
         # Key to be used for symmetric encryption
         key = self.kdf(shared_key, key_length)
+        priv_e.zeroize()
+        shared_key.zeroize()
 
         return key, EncryptedKey(pub_e, re_id=None)
 
+    @metrics.timed('umbral', 'decapsulate')
     def decapsulate(self, priv_key, ekey, key_length=32):
         """Derive the same symmetric key"""
+        results = self.result_cache
+        if results is not None:
+            tag = ec.serialize(priv_key)
+            cache_key = cache.digest(b'decapsulate', tag, ec.serialize(ekey.ekey),
+                                     key_length.to_bytes(4, 'big'))
+            cached = results.get(cache_key)
+            if cached is not None:
+                return cached
+
         shared_key = ekey.ekey ** priv_key
         key = self.kdf(shared_key, key_length)
+        shared_key.zeroize()
+        if results is not None:
+            results.put(cache_key, key, tag)
         return key
+
+    @metrics.timed('umbral', 'decapsulate_many')
+    def decapsulate_many(self, priv_key, ekeys, key_length=32, executor=None):
+        """
+        Derives the symmetric keys of many capsules, given like in
+        reencrypt_many, and returns them concatenated in a bytearray: the
+        key of capsule i is keys[i * key_length:(i + 1) * key_length].
+
+        The shared points are computed in one call and serialized together
+        for the KDF. Unlike in decapsulate, their serializations are bytes
+        objects which cannot be wiped, and the KDF runs in Python code
+        rather than in OpenSSL.
+        """
+        point_size = wire.sizes(self.ecgroup)[0]
+        if isinstance(ekeys, (bytes, bytearray, memoryview)):
+            shared = pow_many(self.ecgroup, ekeys, priv_key, executor)
+            return hkdf_many(shared, point_size + 1, key_length, skip=1)
+
+        if isinstance(ekeys, ec.PointArray):
+            shared = pow_many(self.ecgroup, ekeys, priv_key, executor)
+            data = shared.serialize()
+            shared.zeroize()
+        else:
+            shared = pow_many(self.ecgroup, [x.ekey for x in ekeys], priv_key, executor)
+            data = ec.serializeMany(shared) if shared else b''
+            for point in shared:
+                point.zeroize()
+        return hkdf_many(data, point_size, key_length)
+
+    def start_ephemeral_pool(self, low=64, high=256):
+        """
+        Precomputes the ephemeral key pairs of encapsulate in a background thread,
+        keeping between low and high of them ready (see npre.ephemeral)
+        """
+        self.stop_ephemeral_pool()
+        self.ephemeral_pool = ephemeral.EphemeralPool(self.ecgroup, self.g, low, high)
+        return self.ephemeral_pool
+
+    def stop_ephemeral_pool(self):
+        if self.ephemeral_pool is not None:
+            self.ephemeral_pool.close()
+            self.ephemeral_pool = None
+
+    def enable_result_cache(self, max_bytes=1 << 20, ttl=None):
+        """
+        Memoizes reencrypt and decapsulate in a ResultCache of max_bytes
+        (see npre.cache), whose entries expire after ttl seconds if set
+        """
+        self.disable_result_cache()
+        self.result_cache = cache.ResultCache(max_bytes, ttl)
+        return self.result_cache
+
+    def disable_result_cache(self):
+        if self.result_cache is not None:
+            self.result_cache.clear()
+            self.result_cache = None
+
+    def invalidate_kfrag(self, kfrag):
+        """
+        Drops the cached reencryptions with kfrag, when it is revoked.
+        Returns the number of results dropped.
+        """
+        if self.result_cache is None:
+            return 0
+        return self.result_cache.invalidate(self.save_kfrag(kfrag))
+
+    def _ephemeral(self):
+        if self.ephemeral_pool is not None:
+            return self.ephemeral_pool.take()
+        return ephemeral.generate(self.ecgroup, self.g)
@@ -1,2 +1,43 @@
+import npre.elliptic_curve as ec
+
 pad = lambda BS, s: s + bytes((BS - len(s) % BS) * [BS - len(s) % BS])
 unpad = lambda s: s[0:-s[-1]]
+
+
+def pow_many(ecgroup, points, scalar, executor=None, chunk_size=256):
+    """
+    Raises all points to the power scalar with ec.powMany.
+
+    points is either a sequence of elements, a PointArray or a buffer of
+    serialized points; the result has the same form. The elliptic curve
+    extension runs without
+    the GIL, so a thread pool passed as executor spreads chunks of the work
+    over several cores.
+    """
+    if isinstance(points, ec.PointArray):
+        if executor is None:
+            return points ** scalar
+        result = ec.PointArray(ecgroup, len(points))
+        bounds = [(i, min(i + chunk_size, len(points))) for i in range(0, len(points), chunk_size)]
+
+        def work(bound):
+            result[bound[0]:bound[1]] = points[bound[0]:bound[1]] ** scalar
+
+        for _ in executor.map(work, bounds):
+            pass
+        return result
+
+    if executor is None:
+        return ec.powMany(ecgroup, points, scalar)
+
+    if isinstance(points, (bytes, bytearray, memoryview)):
+        width = len(ec.serialize(ec.getGenerator(ecgroup)))
+        step = chunk_size * width
+        points = memoryview(points)
+        parts = [points[i:i + step] for i in range(0, len(points), step)]
+        join = b''.join
+    else:
+        parts = [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+        join = lambda results: [x for part in results for x in part]
+
+    return join(executor.map(lambda part: ec.powMany(ecgroup, part, scalar), parts))
@@ -0,0 +1,207 @@
+'''
+Compact binary wire format for capsules, kFrags and BBS98 ciphertexts
+
+Every message starts with a fixed 6 byte header:
+
+    magic b'NP' | version (1 byte) | kind (1 byte) | curve nid (2 bytes)
+
+followed by fixed-width fields. Points are compressed (POINT bytes, one more
+than the field size) and scalars are big-endian, padded to the size of the
+group order (SCALAR bytes):
+
+    CAPSULE   point ekey | has re_id (1 byte) | scalar re_id
+    KFRAG     has id (1 byte) | scalar id | scalar key
+    BBS98     point c1 | point c2[0] | point c2[1] | ...
+
+Parsing works on memoryviews, and points and scalars are deserialized
+straight from the message buffer without copying.
+'''
+
+import struct
+import npre.elliptic_curve as ec
+
+MAGIC = b'NP'
+VERSION = 1
+CAPSULE = 1
+KFRAG = 2
+BBS98 = 3
+
+HEADER = struct.Struct('>2sBBH')
+
+_sizes = {}
+_orders = {}
+
+
+def sizes(ecgroup):
+    """
+    Returns the sizes in bytes of a compressed point and of a scalar of ecgroup
+    """
+    if ecgroup.nid not in _sizes:
+        point = ec.serialize(ec.getGenerator(ecgroup))
+        scalar = ec.serialize(ec.order(ecgroup))
+        _sizes[ecgroup.nid] = (len(point) - 1, len(scalar) - 1)
+        _orders[ecgroup.nid] = scalar[1:]
+    return _sizes[ecgroup.nid]
+
+
+def is_wire(data):
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def header(ecgroup, kind):
+    if ecgroup.nid < 0:
+        raise ValueError('Custom curves have no wire format')
+    return HEADER.pack(MAGIC, VERSION, kind, ecgroup.nid)
+
+
+def parse_header(ecgroup, data, kind):
+    """
+    Checks the header of data and returns a memoryview of the payload
+    """
+    data = memoryview(data)
+    if len(data) < HEADER.size:
+        raise ValueError('Message is too short')
+    magic, version, msg_kind, nid = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC:
+        raise ValueError('Not a wire format message')
+    if version != VERSION:
+        raise ValueError('Unsupported wire format version: {}'.format(version))
+    if msg_kind != kind:
+        raise ValueError('Expected message kind {}, got {}'.format(kind, msg_kind))
+    if nid != ecgroup.nid:
+        raise ValueError('Message is for curve {}, not {}'.format(nid, ecgroup.nid))
+    return data[HEADER.size:]
+
+
+def dump_point(ecgroup, point):
+    data = ec.serialize(point)[1:]
+    if len(data) != sizes(ecgroup)[0]:
+        raise ValueError('Cannot encode the point at infinity')
+    return data
+
+
+def load_point(ecgroup, data):
+    point = ec.deserialize(ecgroup, data, ec.G)
+    if point is False:
+        raise ValueError('Invalid point')
+    return point
+
+
+def dump_points(ecgroup, points):
+    """
+    Concatenated compressed points, made affine together in one call
+    """
+    return ec.serializeMany(points)
+
+
+def load_points(ecgroup, data):
+    """
+    Points from concatenated compressed points, checked in one call
+    """
+    if len(data) % sizes(ecgroup)[0] != 0:
+        raise ValueError('Invalid length for a sequence of points')
+    points, invalid = ec.deserializeMany(ecgroup, data, ec.G)
+    if invalid:
+        raise ValueError('Invalid points at indices {}'.format(invalid))
+    return points
+
+
+def dump_scalar(ecgroup, scalar):
+    return ec.serialize(scalar)[1:].rjust(sizes(ecgroup)[1], b'\0')
+
+
+def load_scalar(ecgroup, data):
+    """
+    Scalar from its SCALAR bytes, which must be below the group order so
+    that every scalar has a single encoding
+    """
+    if len(data) != sizes(ecgroup)[1]:
+        raise ValueError('Invalid scalar length')
+    # Big-endian strings of the same length compare like the numbers
+    if bytes(data) >= _orders[ecgroup.nid]:
+        raise ValueError('Scalar out of range')
+    return ec.deserialize(ecgroup, data, ec.ZR)
+
+
+def _dump_optional_scalar(ecgroup, scalar):
+    if scalar is None:
+        return b'\0' * (1 + sizes(ecgroup)[1])
+    return b'\1' + dump_scalar(ecgroup, scalar)
+
+
+def _load_optional_scalar(ecgroup, data):
+    return load_scalar(ecgroup, data[1:]) if data[0] else None
+
+
+def dump_capsule(ecgroup, ekey, re_id):
+    return b''.join([
+        header(ecgroup, CAPSULE),
+        dump_point(ecgroup, ekey),
+        _dump_optional_scalar(ecgroup, re_id)])
+
+
+def load_capsule(ecgroup, data):
+    """
+    Returns (ekey, re_id) of a capsule, re_id being None if not reencrypted
+    """
+    point_size, scalar_size = sizes(ecgroup)
+    data = parse_header(ecgroup, data, CAPSULE)
+    if len(data) != point_size + 1 + scalar_size:
+        raise ValueError('Invalid capsule length')
+    return (load_point(ecgroup, data[:point_size]),
+            _load_optional_scalar(ecgroup, data[point_size:]))
+
+
+def dump_kfrag(ecgroup, id, key):
+    return b''.join([
+        header(ecgroup, KFRAG),
+        _dump_optional_scalar(ecgroup, id),
+        dump_scalar(ecgroup, key)])
+
+
+def load_kfrag(ecgroup, data):
+    """
+    Returns (id, key) of a kFrag, id being None for a plain rekey
+    """
+    scalar_size = sizes(ecgroup)[1]
+    data = parse_header(ecgroup, data, KFRAG)
+    if len(data) != 2 * scalar_size + 1:
+        raise ValueError('Invalid kFrag length')
+    return (_load_optional_scalar(ecgroup, data[:scalar_size + 1]),
+            load_scalar(ecgroup, data[scalar_size + 1:]))
+
+
+def dump_bbs98(ecgroup, c1, c2):
+    """
+    c1 is a compressed point, c2 the concatenated compressed points of the
+    message chunks
+    """
+    return b''.join([header(ecgroup, BBS98), c1, c2])
+
+
+def parse_bbs98(ecgroup, data):
+    """
+    Returns memoryviews of c1 and of the concatenated chunk points c2,
+    without decoding any of them
+    """
+    point_size = sizes(ecgroup)[0]
+    data = parse_header(ecgroup, data, BBS98)
+    if len(data) < point_size or len(data) % point_size != 0:
+        raise ValueError('Invalid BBS98 ciphertext length')
+    return data[:point_size], data[point_size:]
+
+
+def replace_c1(ecgroup, data, c1):
+    """
+    Puts a new c1 into a BBS98 ciphertext without touching the chunks.
+    A writable buffer (bytearray, writable memoryview) is modified in place
+    and returned, otherwise a new bytes object is returned.
+    """
+    parse_bbs98(ecgroup, data)
+    if len(c1) != sizes(ecgroup)[0]:
+        raise ValueError('Invalid c1 length')
+    view = memoryview(data)
+    if not view.readonly:
+        view[HEADER.size:HEADER.size + len(c1)] = c1
+        return data
+    return b''.join([view[:HEADER.size], c1, view[HEADER.size + len(c1):]])
@@ -1,3 +1,4 @@
+import os
 from distutils.core import setup, Extension
 
 # Alternative method:
@@ -18,8 +19,11 @@ TESTS_REQUIRE = [
 elliptic_curve = Extension(
         'npre.elliptic_curve',
         sources=['npre/elliptic_curve/ecmodule.c'],
+        depends=['npre/elliptic_curve/ecmodule.h', 'npre/elliptic_curve/ecarray.c'],
         include_dirs=['npre/elliptic_curve'],
-        libraries=['crypto', 'gmp'])
+        libraries=['crypto', 'gmp'],
+        # NPRE_BENCHMARK=1 compiles in the operation counters used by benchmarks/suite.py
+        define_macros=[('BENCHMARK_ENABLED', '1')] if os.environ.get('NPRE_BENCHMARK') else [])
 
 setup(name='npre',
       version='0.3',
@@ -0,0 +1,131 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from npre import aio, bbs98, umbral
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def umbral_setup(N=3, threshold=2):
+    pre = umbral.PRE()
+    priv_a = pre.gen_priv()
+    priv_b = pre.gen_priv()
+    kfrags, _ = pre.split_rekey(priv_a, priv_b, threshold, N)
+    sym_key, ekey = pre.encapsulate(pre.priv2pub(priv_a))
+    return pre, priv_b, kfrags, sym_key, ekey
+
+
+def test_reencrypt_batched():
+    pre, priv_b, kfrags, sym_key, ekey = umbral_setup()
+    apre = aio.AsyncPRE(pre)
+    ekeys = [pre.encapsulate(pre.priv2pub(priv_b))[1] for _ in range(10)]
+
+    async def many():
+        return await asyncio.gather(*[apre.areencrypt(kfrags[0], e) for e in ekeys])
+
+    results = run(many())
+    assert results == [pre.reencrypt(kfrags[0], e) for e in ekeys]
+    # Concurrent requests with the same kFrag make a single call
+    assert (apre.requests, apre.batches) == (10, 1)
+
+    apre.max_batch = 4
+    run(many())
+    assert apre.batches == 1 + 3
+    apre.close()
+
+
+def test_reencrypt_combine_decapsulate():
+    pre, priv_b, kfrags, sym_key, ekey = umbral_setup()
+    apre = aio.AsyncPRE(pre, batch_delay=0.001)
+
+    async def flow():
+        ekeys = await asyncio.gather(*[apre.areencrypt(k, ekey) for k in kfrags[:2]])
+        combined = await apre.acombine(ekeys)
+        return await apre.adecapsulate(priv_b, combined)
+
+    assert run(flow()) == sym_key
+    # One batch per kFrag
+    assert apre.batches == 2
+    apre.close()
+
+
+def test_wire_and_errors():
+    pre, priv_b, kfrags, sym_key, ekey = umbral_setup()
+    apre = aio.AsyncPRE(pre)
+    wire_kfrag = pre.save_kfrag(kfrags[0])
+
+    async def mixed():
+        return await asyncio.gather(
+            apre.areencrypt(wire_kfrag, pre.save_ekey(ekey)),
+            apre.areencrypt(kfrags[0], ekey),
+            apre.areencrypt(kfrags[0], b'garbage'),
+            return_exceptions=True)
+
+    as_wire, as_object, error = run(mixed())
+    assert pre.load_ekey(as_wire) == as_object == pre.reencrypt(kfrags[0], ekey)
+    assert isinstance(error, ValueError)
+    assert apre.batches == 1
+    apre.close()
+
+
+def test_bbs98():
+    pre = bbs98.PRE()
+    priv_a = pre.gen_priv()
+    priv_b = pre.gen_priv()
+    rk = pre.rekey(priv_a, priv_b)
+    emsgs = [pre.encrypt(pre.priv2pub(priv_a), b'message %d' % i) for i in range(5)]
+    apre = aio.AsyncPRE(pre)
+
+    async def many():
+        return await asyncio.gather(*[apre.areencrypt(rk, e) for e in emsgs])
+
+    results = run(many())
+    assert [pre.decrypt(priv_b, e) for e in results] == [b'message %d' % i for i in range(5)]
+    with pytest.raises(TypeError):
+        run(apre.acombine(results))
+    apre.close()
+
+
+def test_process_pool():
+    pre, priv_b, kfrags, sym_key, ekey = umbral_setup()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        apre = aio.AsyncPRE(pre, executor)
+
+        async def flow():
+            ekeys = await asyncio.gather(*[apre.areencrypt(k, ekey) for k in kfrags[:2]])
+            return ekeys, await apre.adecapsulate(priv_b, await apre.acombine(ekeys))
+
+        ekeys, key = run(flow())
+    assert ekeys == [pre.reencrypt(k, ekey) for k in kfrags[:2]]
+    assert key == sym_key
+
+
+def test_server():
+    pre, priv_b, kfrags, sym_key, ekey = umbral_setup()
+    apre = aio.AsyncPRE(pre)
+
+    async def session():
+        server = await aio.serve(apre)
+        port = server.sockets[0].getsockname()[1]
+        clients = [await aio.Client.connect('127.0.0.1', port) for _ in range(2)]
+        try:
+            capsules = await asyncio.gather(*[
+                c.reencrypt(pre.save_kfrag(k), pre.save_ekey(ekey))
+                for c, k in zip(clients, kfrags)])
+            with pytest.raises(aio.ServerError):
+                await clients[0].reencrypt(pre.save_kfrag(kfrags[0]), b'garbage')
+            return capsules
+        finally:
+            for c in clients:
+                c.close()
+            server.close()
+            await server.wait_closed()
+
+    capsules = run(session())
+    combined = pre.combine([pre.load_ekey(c) for c in capsules])
+    assert pre.decapsulate(priv_b, combined) == sym_key
+    apre.close()
@@ -84,3 +84,68 @@ def test_reencrypt():
         assert pre.decrypt(alice_priv, emsg) == m
         assert pre.decrypt(bob_priv, emsg2) == m
         assert pre.decrypt(bob_priv, emsg3) == m
+
+
+def test_custom_generator():
+    pre = bbs98.PRE()
+    pre2 = bbs98.PRE(g=pre.save_key(pre.g ** 3))
+    priv = pre2.gen_priv()
+    pub = pre2.priv2pub(priv)
+
+    assert pub == pre.priv2pub(priv) ** 3
+    assert pre2.decrypt(priv, pre2.encrypt(pub, long_msg)) == long_msg
+
+
+def test_reencrypt_many():
+    pre = bbs98.PRE()
+    alice_priv = pre.gen_priv()
+    alice_pub = pre.priv2pub(alice_priv)
+    bob_priv = pre.gen_priv()
+    rk = pre.rekey(alice_priv, bob_priv, dtype=bytes)
+
+    msgs = [msg, long_msg, msg28, b'']
+    emsgs = pre.reencrypt_many(rk, [pre.encrypt(alice_pub, m) for m in msgs])
+
+    assert [pre.decrypt(bob_priv, e) for e in emsgs] == msgs
+    assert pre.reencrypt_many(rk, []) == []
+
+
+def test_reencrypt_path():
+    pre = bbs98.PRE()
+    privs = [pre.gen_priv() for _ in range(4)]
+    rks = [pre.rekey(a, b) for a, b in zip(privs, privs[1:])]
+    emsg = pre.encrypt(pre.priv2pub(privs[0]), msg)
+
+    hop_by_hop = emsg
+    for rk in rks:
+        hop_by_hop = pre.reencrypt(rk, hop_by_hop)
+    assert pre.reencrypt_path(rks, emsg) == hop_by_hop
+    assert pre.decrypt(privs[3], hop_by_hop) == msg
+
+    route = pre.route(rks)
+    assert pre.route(rks) is route
+    assert pre.route([pre.save_key(rk) for rk in rks], dtype=bytes) == pre.save_key(route)
+    assert pre.decrypt(privs[3], pre.reencrypt(route, emsg)) == msg
+    pre.route(rks[:2])
+
+    dropped = []
+    pre.route_invalidation_hooks.append(dropped.append)
+    assert pre.invalidate_rekey(rks[1]) == 2
+    assert len(dropped) == 2
+    assert pre.invalidate_rekey(rks[1]) == 0
+    assert pre.route(rks) is not route
+    assert pre.route(rks) == route
+
+
+def test_route_cache_size():
+    pre = bbs98.PRE()
+    pre.route_cache_size = 2
+    privs = [pre.gen_priv() for _ in range(4)]
+    rks = [pre.rekey(a, b) for a, b in zip(privs, privs[1:])]
+    first = pre.route(rks[:2])
+    pre.route(rks[1:])
+    pre.route(rks)
+    assert len(pre._routes) == 2
+    assert pre.route(rks[:2]) is not first
+    # Evicted routes no longer hold their hops
+    assert all(pre._routes_by_hop.values())
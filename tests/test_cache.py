@@ -0,0 +1,98 @@
+import time
+
+from npre import bbs98, cache, umbral
+
+
+def test_result_cache():
+    results = cache.ResultCache(max_bytes=3 * (10 + cache.DIGEST_SIZE))
+    keys = [cache.digest(b'op', bytes([i])) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        results.put(key, bytes([i]) * 10, b'tag %d' % (i % 2))
+    assert results.get(keys[0]) == bytes(10)
+    assert results.get(keys[3]) is None
+
+    # keys[1] is the least recently used
+    value = results._entries[keys[1]][0]
+    results.put(keys[3], b'\xff' * 10, b'tag 1')
+    assert results.get(keys[1]) is None
+    assert value == bytes(10)
+
+    assert results.invalidate(b'tag 0') == 2
+    assert len(results) == 1
+    assert results.stats() == {
+        'entries': 1, 'bytes': 10 + cache.DIGEST_SIZE, 'max_bytes': results.max_bytes,
+        'hits': 1, 'misses': 2, 'evictions': 1, 'expirations': 0, 'invalidations': 2}
+
+    # Too large to be cached
+    results.put(keys[0], bytes(1000), b'tag')
+    assert results.get(keys[0]) is None
+
+
+def test_ttl():
+    results = cache.ResultCache(ttl=0.01)
+    results.put(b'key', b'value', b'tag')
+    assert results.get(b'key') == b'value'
+    time.sleep(0.02)
+    assert results.get(b'key') is None
+    assert results.expirations == 1 and len(results) == 0
+
+
+def test_ttl_purge():
+    results = cache.ResultCache(ttl=0.05)
+    results.put(b'old', b'value', b'tag')
+    value = results._entries[b'old'][0]
+    time.sleep(0.1)
+
+    # Dropped and wiped without being looked up
+    results.put(b'new', b'other', b'tag')
+    assert b'old' not in results._entries and value == bytes(5)
+    assert results.expirations == 1 and len(results) == 1
+
+    time.sleep(0.1)
+    assert results.stats()['entries'] == 0
+    assert results.expirations == 2 and results.size == 0
+
+
+def test_umbral():
+    pre = umbral.PRE()
+    priv_a = pre.gen_priv()
+    priv_b = pre.gen_priv()
+    kfrags, _ = pre.split_rekey(priv_a, priv_b, 1, 2)
+    sym_key, ekey = pre.encapsulate(pre.priv2pub(priv_a))
+    results = pre.enable_result_cache()
+
+    ekey_b = pre.reencrypt(kfrags[0], ekey)
+    assert pre.reencrypt(kfrags[0], ekey) == ekey_b
+    assert pre.reencrypt(kfrags[1], ekey) != ekey_b
+    assert pre.decapsulate(priv_b, ekey_b) == pre.decapsulate(priv_b, ekey_b) == sym_key
+    assert pre.decapsulate(priv_b, ekey_b, 16) == sym_key[:16]
+    assert (results.hits, results.misses) == (2, 4)
+
+    assert pre.invalidate_kfrag(kfrags[0]) == 1
+    assert pre.reencrypt(kfrags[0], ekey) == ekey_b
+    assert results.misses == 5
+
+    pre.disable_result_cache()
+    assert pre.result_cache is None and len(results) == 0
+    assert pre.invalidate_kfrag(kfrags[0]) == 0
+
+
+def test_bbs98():
+    pre = bbs98.PRE()
+    privs = [pre.gen_priv() for _ in range(3)]
+    rks = [pre.rekey(a, b) for a, b in zip(privs, privs[1:])]
+    emsg = pre.encrypt(pre.priv2pub(privs[0]), b'Hello world')
+    results = pre.enable_result_cache()
+
+    emsg_b = pre.reencrypt(rks[0], emsg)
+    assert pre.reencrypt(pre.save_key(rks[0]), emsg) == emsg_b
+    emsg_c = pre.reencrypt_path(rks, emsg)
+    assert pre.reencrypt_path(rks, emsg) == emsg_c
+    assert pre.decrypt(privs[2], emsg_c) == b'Hello world'
+    assert results.hits == 2
+
+    # Revoking the second hop drops the path result only
+    pre.invalidate_rekey(rks[1])
+    assert len(results) == 1
+    pre.invalidate_rekey(rks[0])
+    assert len(results) == 0
@@ -0,0 +1,295 @@
+import pytest
+import npre.elliptic_curve as ec
+from npre import curves
+
+
+def test_pow_many():
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    g = ec.getGenerator(group)
+    k = ec.random(group, ec.ZR)
+    points = [g] + [ec.random(group, ec.G) for _ in range(5)]
+
+    assert ec.powMany(group, points, k) == [p ** k for p in points]
+    buf = b''.join(map(ec.serialize, points))
+    assert ec.powMany(group, buf, k) == b''.join(ec.serialize(p ** k) for p in points)
+
+    with pytest.raises(ec.Error):
+        ec.powMany(group, buf[:-1], k)
+    with pytest.raises(ec.Error):
+        ec.powMany(group, b'\x00' * len(buf), k)
+    with pytest.raises(ec.Error):
+        ec.powMany(group, points + [k], k)
+
+
+def test_multiexp():
+    from functools import reduce
+    from operator import mul
+
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    for n in (1, 2, 3, 20):
+        points = [ec.random(group, ec.G) for _ in range(n)]
+        scalars = [ec.random(group, ec.ZR) for _ in range(n - 1)] + [12345]
+        expected = reduce(mul, [p ** k for p, k in zip(points, scalars)])
+        assert ec.multiexp(points, scalars) == expected
+
+    with pytest.raises(ec.Error):
+        ec.multiexp([], [])
+    with pytest.raises(ec.Error):
+        ec.multiexp(points, scalars[:-1])
+    with pytest.raises(ec.Error):
+        ec.multiexp(points, scalars[:-1] + [-1])
+
+
+@pytest.mark.parametrize("curve", [curves.secp256k1, curves.prime256v1, curves.secp384r1])
+def test_encrypt_chunks(curve):
+    group = ec.elliptic_curve(nid=curve)
+    size = ec.bitsize(group)
+    msg = bytes(range(256)) * (size * 3 // 256 + 1)
+    msg = msg[:size * 3]
+    blind = ec.random(group, ec.G)
+
+    expected = b''.join(
+            ec.serialize(blind * ec.encode(group, msg[i:i + size], False))
+            for i in range(0, len(msg), size))
+    assert ec.encryptChunks(group, msg, blind, True) == expected
+    assert ec.decryptChunks(group, expected, blind, True) == msg
+
+    bare = ec.encryptChunks(group, msg, blind)
+    assert len(bare) == len(expected) - 3
+    assert ec.decryptChunks(group, bare, blind) == msg
+
+    with pytest.raises(ec.Error):
+        ec.encryptChunks(group, msg[:-1], blind)
+    with pytest.raises(ec.Error):
+        ec.decryptChunks(group, bare[:-1], blind)
+    with pytest.raises(ec.Error):
+        ec.decryptChunks(group, expected, blind)
+
+
+# secp224r1 has p = 1 mod 4, where square roots take Tonelli-Shanks
+@pytest.mark.parametrize("curve", [curves.secp256k1, curves.prime256v1, curves.secp224r1])
+def test_encode(curve):
+    group = ec.elliptic_curve(nid=curve)
+    size = ec.bitsize(group)
+    for i in range(20):
+        msg = bytes([i]) * size
+        point = ec.encode(group, msg)
+        assert ec.decode(group, point) == msg
+        # A valid point with the odd ordinate
+        data = ec.serialize(point)
+        assert data[1] == 3 and ec.deserialize(group, data) == point
+
+    # Abscissas above p can't be used
+    if curve == curves.secp256k1:
+        with pytest.raises(ec.Error):
+            ec.encode(group, b'\xff' * size)
+    with pytest.raises(ec.Error, match='expected {} bytes, got {}'.format(size, size + 1)):
+        ec.encode(group, bytes(size + 1))
+
+
+@pytest.mark.skipif(not hasattr(ec, 'StartBenchmark'), reason='built without NPRE_BENCHMARK')
+def test_benchmark_counters():
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    g = ec.getGenerator(group)
+    k = ec.random(group, ec.ZR)
+
+    ec.StartBenchmark(group)
+    g ** k
+    g * g
+    ~k
+    ec.multiexp([g, g, g], [1, 2, 3])
+    ec.EndBenchmark(group)
+    g ** k
+
+    counts = ec.GetGranularBenchmarks(group)
+    assert counts['Exp'] == [0, 1]
+    assert counts['Mul'] == [0, 1]
+    assert counts['Inv'] == [1, 0]
+    assert counts['MultiExp'] == [0, 3]
+
+    ec.StartBenchmark(group)
+    assert not any(zr or g for zr, g in ec.GetGranularBenchmarks(group).values())
+
+
+def test_zeroize():
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    k = ec.random(group, ec.ZR)
+    p = ec.getGenerator(group) ** k
+
+    k.zeroize()
+    p.zeroize()
+    assert k == 0
+    assert p.isInf()
+    # Cleared in place: still a valid point
+    assert (p ** ec.random(group, ec.ZR)).isInf()
+    assert (p ** 5).isInf()
+
+
+def test_poly_eval():
+    from npre.umbral import poly_eval
+
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    zero = ec.init(group, ec.ZR)
+    xs = [ec.random(group, ec.ZR) for _ in range(5)] + [zero, zero + 1]
+    for t in (1, 2, 7):
+        coeffs = [ec.random(group, ec.ZR) for _ in range(t)]
+        assert ec.polyEval(coeffs, xs) == [poly_eval(coeffs, x) for x in xs]
+    assert ec.polyEval(coeffs, []) == []
+
+    # Unreduced coefficients
+    order = ec.deserialize(group, ec.serialize(ec.order(group)))
+    assert ec.polyEval([order, zero + 2], [zero + 3]) == [zero + 6]
+
+    with pytest.raises(ec.Error):
+        ec.polyEval([], xs)
+    with pytest.raises(ec.Error):
+        ec.polyEval(coeffs, xs + [ec.getGenerator(group)])
+
+
+@pytest.mark.parametrize("curve", [curves.secp256k1, curves.prime256v1, curves.secp384r1])
+def test_point_array(curve):
+    group = ec.elliptic_curve(nid=curve)
+    g = ec.getGenerator(group)
+    scalars = [ec.random(group, ec.ZR) for _ in range(300)]
+    points = [g ** k for k in scalars]
+    array = ec.PointArray(group, points)
+
+    assert len(array) == 300 and array.tolist() == points
+    assert array[-1] == points[-1] and array[3:290:7].tolist() == points[3:290:7]
+    assert len(memoryview(array)) == 300 * array.itemsize
+    assert ec.PointArray.frombytes(group, bytes(array)) == array
+    assert ec.PointArray.deserialize(group, array.serialize()) == array
+    assert array.serialize(True) == b''.join(map(ec.serialize, points))
+
+    k = scalars[0]
+    assert (array ** k).tolist() == [p ** k for p in points]
+    assert (array ** ec.ScalarArray(group, scalars)).tolist() == [p ** x for p, x in zip(points, scalars)]
+    assert (array * g).tolist() == (g * array).tolist() == [p * g for p in points]
+    assert (array / array[::-1]).tolist() == [p / q for p, q in zip(points, points[::-1])]
+    assert ec.multiexp(array[:20], ec.ScalarArray(group, scalars[:20])) == ec.multiexp(points[:20], scalars[:20])
+    assert array.equal(array ** 1) == [True] * 300
+
+    copy = ec.PointArray(group, array)
+    copy[0] = g
+    copy[1:3] = array[5:7]
+    assert copy.tolist()[:4] == [g, points[5], points[6], points[3]] and copy != array
+
+    empty = ec.PointArray(group, 2)
+    assert empty[0].isInf()
+    with pytest.raises(ec.Error):
+        empty.serialize()
+    with pytest.raises(ec.Error):
+        ec.PointArray.frombytes(group, b'\x01' * array.itemsize)
+    with pytest.raises(ec.Error):
+        ec.PointArray.deserialize(group, array.serialize()[:-1])
+    with pytest.raises(ec.Error):
+        array * empty
+    with pytest.raises(IndexError):
+        array[300]
+
+
+def test_scalar_array():
+    group = ec.elliptic_curve(nid=curves.secp256k1)
+    scalars = [ec.random(group, ec.ZR) for _ in range(50)]
+    k = scalars[0]
+    array = ec.ScalarArray(group, scalars)
+
+    assert array.tolist() == scalars
+    assert ec.ScalarArray(group, [ec.order(group) + 5]).tolist() == [ec.init(group, ec.ZR) + 5]
+    assert ec.ScalarArray.frombytes(group, b'\xff' * array.itemsize)[0] == ec.init(group, ec.ZR) + (2 ** 256 - 1)
+    assert (array + array).tolist() == [x + x for x in scalars]
+    assert (k - array).tolist() == [k - x for x in scalars]
+    assert (array * 3).tolist() == [x * 3 for x in scalars]
+    assert (~array).tolist() == [~x for x in scalars]
+
+    array.zeroize()
+    assert array == ec.ScalarArray(group, 50)
+    with pytest.raises(ec.Error):
+        ~array
+
+
+@pytest.mark.parametrize("curve", [curves.secp256k1, curves.prime256v1, curves.secp384r1])
+def test_inplace(curve):
+    from functools import reduce
+    from operator import imul
+
+    group = ec.elliptic_curve(nid=curve)
+    g = ec.getGenerator(group)
+    a, b = ec.random(group, ec.ZR), ec.random(group, ec.ZR)
+
+    # The operators never change their operands
+    scalars = [a * 1, b * 1, a * b]
+    first = scalars[0]
+    assert reduce(imul, scalars) == a * a * b * b
+    assert scalars[0] is first and first == a
+    x = a * 1
+    y = x
+    y *= b
+    y += a
+    assert x == a and y == a * b + a
+    p = g ** a
+    q = p
+    q **= b
+    q *= g
+    assert p == g ** a and q == g ** (a * b) * g
+
+    x = ec._accumulator(a)
+    ec._mulInto(x, b)
+    ec._addInto(x, a)
+    ec._addInto(x, 5)
+    assert x == a * b + a + 5 and a == a * 1
+    p = ec._accumulator(g ** a)
+    ec._mulInto(p, g)
+    assert p == g ** (a + 1)
+    with pytest.raises(ec.Error):
+        ec._mulInto(p, a)
+    with pytest.raises(ec.Error):
+        ec._addInto(p, g)
+    # Only private copies are updated in place
+    y = a * b
+    with pytest.raises(ec.Error):
+        ec._mulInto(y, b)
+    assert y == a * b
+
+
+def test_freelist():
+    for _ in range(20):
+        group = ec.elliptic_curve(nid=curves.secp256k1)
+        scalars = [ec.random(group, ec.ZR) for _ in range(200)]
+        points = [ec.random(group, ec.G) for _ in range(200)]
+        del scalars, points
+        reused = ec.random(group, ec.ZR), ec.random(group, ec.G)
+        assert reused[0] != 0 and not reused[1].isInf()
+        del group
+    assert reused[1] ** 1 == reused[1]
+
+
+@pytest.mark.parametrize("curve", [curves.secp256k1, curves.prime256v1, curves.secp384r1])
+def test_serialize_many(curve):
+    group = ec.elliptic_curve(nid=curve)
+    g = ec.getGenerator(group)
+    scalars = [ec.random(group, ec.ZR) for _ in range(20)] + [ec.init(group, ec.ZR)]
+    points = [g ** k * g for k in scalars[:-1]]
+
+    data = ec.serializeMany(points)
+    assert data == b''.join(ec.serialize(p)[1:] for p in points)
+    assert ec.serializeMany(points, True) == b''.join(map(ec.serialize, points))
+    assert ec.deserializeMany(group, data, ec.G) == (points, [])
+    assert ec.deserializeMany(group, ec.serializeMany(points, True), ec.G, True) == (points, [])
+    assert ec.deserializeMany(group, ec.serializeMany(scalars), ec.ZR) == (scalars, [])
+    assert ec.serializeMany([]) == b''
+
+    width = len(data) // len(points)
+    bad = bytearray(data)
+    bad[2 * width] = 7
+    bad[5 * width:6 * width] = b'\xff' * width
+    elements, invalid = ec.deserializeMany(group, bytes(bad), ec.G)
+    assert invalid == [2, 5] and elements[2] is None and elements[3] == points[3]
+    assert ec.deserializeMany(group, b'\xff' * (len(data) // len(points) - 1), ec.ZR)[1] == [0]
+    with pytest.raises(ec.Error):
+        ec.deserializeMany(group, data[:-1], ec.G)
+    with pytest.raises(ec.Error):
+        ec.serializeMany(points + [g / g])
+    with pytest.raises(ec.Error):
+        ec.serializeMany(points + scalars)
+
@@ -0,0 +1,105 @@
+import gc
+import os
+import time
+
+import pytest
+
+from npre import bbs98, ephemeral, umbral
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_pool():
+    pre = umbral.PRE()
+    pool = ephemeral.EphemeralPool(pre.ecgroup, pre.g, low=4, high=8)
+    assert wait_for(lambda: len(pool) == 8)
+
+    pairs = [pool.take() for _ in range(6)]
+    for r, pub in pairs:
+        assert pub == pre.g ** r
+    assert len({pre.save_key(r) for r, _ in pairs}) == 6
+    assert pool.hits == 6
+    assert wait_for(lambda: len(pool) == 8)
+
+    unused = pool._pairs[0]
+    pool.close()
+    assert len(pool) == 0
+    assert unused[0] == 0 and unused[1].isInf()
+    # A closed pool still hands out fresh pairs
+    r, pub = pool.take()
+    assert pub == pre.g ** r
+    assert pool.misses == 1
+
+
+def test_collected():
+    pre = umbral.PRE()
+    pool = ephemeral.EphemeralPool(pre.ecgroup, pre.g, low=2, high=4)
+    assert wait_for(lambda: len(pool) == 4)
+    thread = pool._thread
+    unused = pool._pairs[0]
+
+    # The waiting thread does not keep the pool alive
+    del pool
+    gc.collect()
+    assert unused[0] == 0 and unused[1].isInf()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork is needed')
+def test_fork():
+    pre = umbral.PRE()
+    pool = ephemeral.EphemeralPool(pre.ecgroup, pre.g, low=2, high=4)
+    assert wait_for(lambda: len(pool) == 4)
+    inherited = [pre.save_key(r) for r, _ in pool._pairs]
+
+    pid = os.fork()
+    if pid == 0:
+        # Pairs inherited from the parent are never handed out in the child
+        ok = False
+        try:
+            r, pub = pool.take()
+            ok = pre.save_key(r) not in inherited and pub == pre.g ** r
+            ok = ok and wait_for(lambda: len(pool) == 4)
+            ok = ok and not set(inherited) & {pre.save_key(r) for r, _ in pool._pairs}
+            pool.close()
+        finally:
+            os._exit(0 if ok else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert pre.save_key(pool.take()[0]) == inherited[0]
+    pool.close()
+
+
+def test_umbral_encapsulate():
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    pool = pre.start_ephemeral_pool(low=2, high=4)
+    assert wait_for(lambda: len(pool) == 4)
+
+    for _ in range(10):
+        key, ekey = pre.encapsulate(pub)
+        assert pre.decapsulate(priv, ekey) == key
+    assert pool.hits > 0
+
+    pre.stop_ephemeral_pool()
+    assert pre.ephemeral_pool is None
+    key, ekey = pre.encapsulate(pub)
+    assert pre.decapsulate(priv, ekey) == key
+
+
+def test_bbs98_encrypt():
+    pre = bbs98.PRE()
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    pre.start_ephemeral_pool(low=2, high=4)
+    try:
+        for msg in (b'', b'Hello world', b'x' * 100):
+            assert pre.decrypt(priv, pre.encrypt(pub, msg)) == msg
+    finally:
+        pre.stop_ephemeral_pool()
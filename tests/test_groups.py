@@ -0,0 +1,45 @@
+import pytest
+import npre.elliptic_curve as ec
+from npre import bbs98, curves, groups, umbral
+
+
+def test_shared_group():
+    group = groups.group(curves.secp256k1)
+    assert group.checked
+    assert groups.group(curves.secp256k1) is group
+    assert groups.group(curves.prime256v1) is not group
+
+    pre1 = umbral.PRE()
+    pre2 = bbs98.PRE()
+    assert pre1.ecgroup is pre2.ecgroup is group
+    assert pre1.g is pre2.g
+
+
+def test_lazy_check():
+    group = ec.elliptic_curve(nid=curves.secp384r1, check=False)
+    assert not group.checked
+    assert ec.check(group)
+    assert group.checked
+    assert ec.elliptic_curve(nid=curves.secp384r1).checked
+
+
+def test_custom_generator():
+    g = groups.generator(curves.secp256k1)
+    h = g ** 5
+    assert groups.generator(curves.secp256k1, h) is groups.generator(curves.secp256k1, ec.serialize(h))
+    assert groups.generator(curves.secp256k1, h) == h
+
+    pre = umbral.PRE(g=h)
+    priv = pre.gen_priv()
+    assert pre.priv2pub(priv) == g ** (priv * 5)
+
+    with pytest.raises(ec.Error):
+        groups.generator(curves.secp256k1, b'\x01' + b'\x00' * 33)
+
+
+def test_clear():
+    group = groups.group(curves.secp256k1)
+    pre = umbral.PRE()
+    groups.clear()
+    assert groups.group(curves.secp256k1) is not group
+    assert pre.ecgroup is group
@@ -0,0 +1,61 @@
+import pytest
+
+from npre import curves, umbral, wire
+from npre.kfrag_store import KFragStore
+
+
+def test_store(tmpdir):
+    pre = umbral.PRE()
+    priv_a = pre.gen_priv()
+    priv_b = pre.gen_priv()
+    kfrags, vkeys = pre.split_rekey(priv_a, priv_b, 3, 40)
+    path = str(tmpdir.join('kfrags'))
+
+    with KFragStore(path, capacity=4) as store:
+        for i, kfrag in enumerate(kfrags):
+            store.put(b'policy %d' % i, kfrag, vkeys if i % 2 else None)
+        assert len(store) == 40
+        # The table grew from 4 slots
+        assert store._capacity == 64
+        assert store.get(b'policy 0') == kfrags[0]
+        assert store.get(b'missing') is None
+        assert bytes(store.raw(b'policy 1')) == pre.save_kfrag(kfrags[1])
+
+        assert store.delete(b'policy 0')
+        assert not store.delete(b'policy 0')
+        assert b'policy 0' not in store
+        store.put(b'policy 2', pre.save_kfrag(kfrags[39]))
+        assert store.get(b'policy 2') == kfrags[39]
+
+    with KFragStore(path) as store:
+        assert len(store) == 39
+        assert store.get(b'policy 0') is None
+        for i in range(3, 40):
+            assert store.get(b'policy %d' % i) == kfrags[i]
+            assert store.vkeys(b'policy %d' % i) == (vkeys if i % 2 else None)
+        assert pre.check_kFrag_consistency(store.get(b'policy 3'), store.vkeys(b'policy 3'))
+
+
+def test_invalid(tmpdir):
+    pre = umbral.PRE()
+    path = str(tmpdir.join('kfrags'))
+    with KFragStore(path) as store:
+        with pytest.raises(ValueError):
+            store.put(b'policy', b'garbage')
+
+        kfrags, vkeys = pre.split_rekey(pre.gen_priv(), pre.gen_priv(), 2, 3)
+        data = wire.dump_points(pre.ecgroup, vkeys)
+        for bad in (data[:-1], data + b'\x02', b''):
+            with pytest.raises(ValueError):
+                store.put(b'policy', kfrags[0], bad)
+        with pytest.raises(ValueError):
+            store.put(b'policy', kfrags[0], vkeys + vkeys[:1], threshold=2)
+        assert b'policy' not in store
+        store.put(b'policy', kfrags[0], data, threshold=2)
+        assert store.vkeys(b'policy') == vkeys
+    with pytest.raises(ValueError):
+        KFragStore(path, curve=curves.secp384r1)
+    with open(path, 'r+b') as f:
+        f.write(b'XXXX')
+    with pytest.raises(ValueError):
+        KFragStore(path)
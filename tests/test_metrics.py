@@ -0,0 +1,84 @@
+import pytest
+
+import npre.elliptic_curve as ec
+from npre import bbs98, metrics, umbral
+
+
+def test_calls():
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    metrics.reset()
+
+    for _ in range(3):
+        key, ekey = pre.encapsulate(pre.priv2pub(priv))
+    assert pre.decapsulate(priv, ekey) == key
+    with pytest.raises(Exception):
+        pre.decapsulate(priv, None)
+
+    calls = metrics.snapshot()['calls']
+    assert calls['umbral.encapsulate']['count'] == 3
+    assert calls['umbral.encapsulate']['errors'] == 0
+    assert calls['umbral.decapsulate']['count'] == 2
+    assert calls['umbral.decapsulate']['errors'] == 1
+    assert sum(calls['umbral.encapsulate']['buckets']) == 3
+    assert calls['umbral.encapsulate']['sum'] > 0
+    assert calls['bbs98.encrypt']['count'] == 0
+    # The methods keep their names and docstrings
+    assert umbral.PRE.encapsulate.__name__ == 'encapsulate'
+
+    metrics.reset()
+    assert metrics.snapshot()['calls']['umbral.encapsulate']['count'] == 0
+
+
+def test_group_counters():
+    pre = bbs98.PRE()
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    metrics.reset()
+    assert not any(zr or g for zr, g in ec.getCounters(pre.ecgroup).values())
+
+    emsg = pre.encrypt(pub, b'Hello world' * 10)
+    counts = metrics.snapshot()['groups']['secp256k1']
+    assert counts['Exp']['G'] == 2
+    # Half of the abscissas are not on the curve
+    assert counts['EncodeRetry']['G'] > 0
+    assert counts['Encode']['G'] == 4
+    assert metrics.encode_retries() == {'secp256k1': counts['EncodeRetry']['G'] / 4}
+    assert pre.decrypt(priv, emsg) == b'Hello world' * 10
+
+    ec.resetCounters(pre.ecgroup)
+    assert ec.getCounters(pre.ecgroup)['Exp'] == [0, 0]
+
+
+def test_prometheus():
+    pre = umbral.PRE()
+    pub = pre.priv2pub(pre.gen_priv())
+    metrics.reset()
+    pre.encapsulate(pub)
+    text = metrics.prometheus()
+
+    assert '# TYPE npre_call_seconds histogram' in text
+    assert 'npre_call_seconds_count{scheme="umbral",method="encapsulate"} 1' in text
+    assert 'npre_call_seconds_bucket{scheme="umbral",method="encapsulate",le="+Inf"} 1' in text
+    assert 'npre_group_operations_total{curve="secp256k1",op="Exp",type="G"} 2' in text
+    assert '# TYPE npre_encode_retries_average gauge' in text
+    assert text.endswith('\n')
+
+
+def test_sampler():
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    samples = []
+    metrics.set_sampler(lambda *sample: samples.append(sample), rate=1)
+    try:
+        pre.encapsulate(pre.priv2pub(priv))
+    finally:
+        metrics.set_sampler(None)
+    pre.encapsulate(pre.priv2pub(priv))
+
+    assert len(samples) == 1
+    name, start, duration, error = samples[0]
+    assert name == 'umbral.encapsulate'
+    assert duration > 0 and not error
+    with pytest.raises(ValueError):
+        metrics.set_sampler(print, rate=2)
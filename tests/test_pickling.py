@@ -0,0 +1,77 @@
+import copy
+import pickle
+
+import pytest
+
+import npre.elliptic_curve as ec
+from npre import bbs98, curves, groups, umbral
+from npre.pool import ProcessPool
+
+
+def test_elements():
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    kfrags, _ = pre.split_rekey(priv, pre.gen_priv(), 2, 3)
+    _, ekey = pre.encapsulate(pub)
+
+    for obj in (priv, pub, pub ** (priv - priv), pre.ecgroup, ekey, kfrags):
+        for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+            assert pickle.loads(pickle.dumps(obj, protocol)) == obj
+    # Rebound to the shared group
+    assert pickle.loads(pickle.dumps(pub)).group is pre.ecgroup
+    assert pickle.loads(pickle.dumps(pre.ecgroup)) is pre.ecgroup
+
+    custom = ec.elliptic_curve(p=2 ** 127 - 1, a=1, b=3)
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(custom)
+
+
+def test_arrays():
+    group = groups.group(curves.secp256k1)
+    pre = umbral.PRE()
+    points = ec.PointArray(group, [pre.priv2pub(pre.gen_priv()) for _ in range(10)])
+    scalars = ec.ScalarArray(group, [pre.gen_priv() for _ in range(10)])
+    for array in (points, scalars):
+        assert pickle.loads(pickle.dumps(array)).tolist() == array.tolist()
+    assert copy.deepcopy(points).tolist() == points.tolist()
+
+
+@pytest.mark.skipif(not hasattr(pickle, 'PickleBuffer'), reason='pickle protocol 5 is needed')
+def test_out_of_band():
+    pre = umbral.PRE()
+    points = ec.PointArray(pre.ecgroup, [pre.priv2pub(pre.gen_priv()) for _ in range(10)])
+    buffers = []
+    data = pickle.dumps(points, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1 and len(data) < 200
+    assert pickle.loads(data, buffers=buffers).tolist() == points.tolist()
+
+
+def test_pre():
+    g = ec.random(groups.group(curves.secp256k1), ec.G)
+    for pre in (umbral.PRE(), bbs98.PRE(curve=curves.secp384r1), bbs98.PRE(g=g)):
+        copied = pickle.loads(pickle.dumps(pre))
+        assert type(copied) is type(pre)
+        assert copied.ecgroup is pre.ecgroup and copied.g == pre.g
+        priv = pre.gen_priv()
+        assert copied.priv2pub(priv) == pre.priv2pub(priv)
+
+
+def test_process_pool():
+    pre = umbral.PRE()
+    priv_a = pre.gen_priv()
+    priv_b = pre.gen_priv()
+    kfrags, _ = pre.split_rekey(priv_a, priv_b, 1, 1)
+    capsules = [pre.encapsulate(pre.priv2pub(priv_a)) for _ in range(5)]
+    ekeys = [ekey for _, ekey in capsules]
+
+    with ProcessPool(pre, max_workers=2, chunk_size=2) as pool:
+        ekeys_b = pool.reencrypt_many(kfrags[0], ekeys)
+        assert ekeys_b == pre.reencrypt_many(kfrags[0], ekeys)
+        keys = pool.decapsulate_many(priv_b, ekeys_b)
+        assert keys == b''.join(key for key, _ in capsules)
+
+        points = ec.PointArray(pre.ecgroup, [ekey.ekey for ekey in ekeys])
+        assert pool.reencrypt_many(kfrags[0], points).tolist() == [e.ekey for e in ekeys_b]
+        assert pool.submit('decapsulate', priv_b, ekeys_b[0]).result() == capsules[0][0]
+        assert list(pool.map('priv2pub', [priv_a, priv_b])) == [pre.priv2pub(priv_a), pre.priv2pub(priv_b)]
@@ -0,0 +1,82 @@
+import io
+import mmap
+import os
+import pytest
+from cryptography.exceptions import InvalidTag
+from npre import umbral, stream
+
+data = os.urandom(10000)
+
+
+@pytest.mark.parametrize("size", [0, 1, 999, 1000, 1001, 10000])
+@pytest.mark.parametrize("chunk_size", [1000, 4096])
+def test_roundtrip(size, chunk_size):
+    key = os.urandom(32)
+    plaintext = data[:size]
+
+    chunks = list(stream.encrypt_chunks(key, plaintext, chunk_size))
+    assert len(chunks) == 1 + max(1, -(-size // chunk_size))
+    ciphertext = b''.join(chunks)
+
+    # Whatever form the ciphertext comes in
+    sources = [
+        ciphertext,
+        memoryview(ciphertext),
+        io.BytesIO(ciphertext),
+        chunks,
+        (ciphertext[i:i + 7] for i in range(0, len(ciphertext), 7)),
+    ]
+    for source in sources:
+        assert b''.join(stream.decrypt_chunks(key, source)) == plaintext
+
+    # Empty pieces in the middle of an iterable
+    pieces = [b'']
+    for i in range(0, len(ciphertext), 500):
+        pieces += [ciphertext[i:i + 500], b'']
+    assert b''.join(stream.decrypt_chunks(key, pieces)) == plaintext
+    parts = [plaintext[:size // 2], b'', b'', plaintext[size // 2:], b'']
+    ciphertext3 = b''.join(stream.encrypt_chunks(key, parts, chunk_size))
+    assert b''.join(stream.decrypt_chunks(key, ciphertext3)) == plaintext
+
+    # Plaintext can be given as a stream too
+    ciphertext2 = b''.join(stream.encrypt_chunks(key, io.BytesIO(plaintext), chunk_size))
+    assert b''.join(stream.decrypt_chunks(key, ciphertext2)) == plaintext
+
+
+def test_tampering():
+    key = os.urandom(32)
+    chunks = list(stream.encrypt_chunks(key, data, 1000))
+    ciphertext = b''.join(chunks)
+
+    with pytest.raises(InvalidTag):
+        # Truncated at a chunk boundary
+        list(stream.decrypt_chunks(key, b''.join(chunks[:-1])))
+    with pytest.raises(InvalidTag):
+        # Reordered chunks
+        list(stream.decrypt_chunks(key, b''.join(chunks[:1] + chunks[2:3] + chunks[1:2] + chunks[3:])))
+    with pytest.raises(InvalidTag):
+        flipped = bytearray(ciphertext)
+        flipped[100] ^= 1
+        list(stream.decrypt_chunks(key, flipped))
+    with pytest.raises(InvalidTag):
+        list(stream.decrypt_chunks(os.urandom(32), ciphertext))
+    with pytest.raises(ValueError):
+        list(stream.decrypt_chunks(key, ciphertext[:5]))
+
+
+def test_reencrypt_stream(tmpdir):
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+
+    ekey, chunks = stream.encrypt(pre, pre.priv2pub(priv_alice), io.BytesIO(data), 1024)
+    path = str(tmpdir.join('encrypted'))
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+    # Only the capsule is reencrypted, the file is decrypted from a memory map
+    kfrags, _ = pre.split_rekey(priv_alice, priv_bob, 2, 3)
+    ekey_bob = pre.combine([pre.reencrypt(rk, ekey) for rk in kfrags[:2]])
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert b''.join(stream.decrypt(pre, priv_bob, ekey_bob, m)) == data
@@ -1,3 +1,4 @@
+import gc
 import pytest
 import random
 from npre import umbral
@@ -94,3 +95,175 @@ def test_alice_sends_fake_kFrag_to_Ursula(N, threshold):
     # Alice tries to frame the first Ursula by sending her a random kFrag
     fake_kfrag = kfrags[0]._replace(key=ec.random(pre.ecgroup, ec.ZR))
     assert not pre.check_kFrag_consistency(fake_kfrag, vkeys)
+
+
+@pytest.mark.parametrize("N,threshold", [
+    (10, 8),
+    (5, 4),
+    (100, 99),
+    (1, 1),
+    (3, 1)
+    ])
+def test_check_kFrags_consistency(N, threshold):
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+
+    kfrags, vkeys = pre.split_rekey(priv_alice, priv_bob, threshold, N)
+    assert pre.check_kFrags_consistency(kfrags, vkeys) == [True] * N
+    assert pre.check_kFrags_consistency([], vkeys) == []
+
+    # Alice sends fake kFrags to some of the Ursulas
+    fake = {0, N // 2, N - 1}
+    kfrags = [
+            k._replace(key=ec.random(pre.ecgroup, ec.ZR)) if i in fake else k
+            for i, k in enumerate(kfrags)]
+    result = pre.check_kFrags_consistency(kfrags, vkeys)
+    assert result == [pre.check_kFrag_consistency(k, vkeys) for k in kfrags]
+    assert {i for i, ok in enumerate(result) if not ok} == fake
+
+    with pytest.raises(ValueError):
+        pre.check_kFrags_consistency(kfrags, [])
+
+
+def test_reencrypt_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+    rk = pre.rekey(priv_alice, priv_bob)
+    capsules = [pre.encapsulate(pre.priv2pub(priv_alice)) for _ in range(20)]
+
+    with ThreadPoolExecutor(4) as pool:
+        ekeys = list(pool.map(lambda c: pre.reencrypt(rk, c[1]), capsules * 4))
+
+    for (sym_key, _), ekey in zip(capsules * 4, ekeys):
+        assert pre.decapsulate(priv_bob, ekey) == sym_key
+
+
+def test_reencrypt_many():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+    kfrags, _ = pre.split_rekey(priv_alice, priv_bob, 2, 3)
+    capsules = [pre.encapsulate(pre.priv2pub(priv_alice)) for _ in range(10)]
+    ekeys = [ekey for _, ekey in capsules]
+    expected = [[pre.reencrypt(rk, ekey) for ekey in ekeys] for rk in kfrags]
+
+    assert pre.reencrypt_many(kfrags[0], ekeys) == expected[0]
+    assert pre.reencrypt_many(kfrags[0], []) == []
+    with ThreadPoolExecutor(2) as pool:
+        assert pre.reencrypt_many(kfrags[1], ekeys, executor=pool) == expected[1]
+
+        buf = b''.join(pre.save_key(x.ekey) for x in ekeys)
+        reencrypted = pre.reencrypt_many(kfrags[2], buf, executor=pool)
+        assert reencrypted == b''.join(pre.save_key(x.ekey) for x in expected[2])
+
+        array = ec.PointArray(pre.ecgroup, [x.ekey for x in ekeys])
+        reencrypted = pre.reencrypt_many(kfrags[2], array, executor=pool)
+        assert reencrypted.tolist() == [x.ekey for x in expected[2]]
+
+    for i, (sym_key, _) in enumerate(capsules):
+        ekey_bob = pre.combine([expected[0][i], expected[2][i]])
+        assert pre.decapsulate(priv_bob, ekey_bob) == sym_key
+
+
+@pytest.mark.parametrize("t", [1, 2, 3, 10])
+def test_lambda_coeffs(t):
+    pre = umbral.PRE()
+    ids = [ec.random(pre.ecgroup, ec.ZR) for _ in range(t)]
+
+    coeffs = umbral.lambda_coeffs(ids)
+    if t > 1:
+        assert coeffs == [umbral.lambda_coeff(id_i, ids) for id_i in ids]
+    # Interpolating the constant polynomial 1 at 0
+    assert sum(coeffs[1:], coeffs[0]) == 1
+
+    # Cached coefficients follow the order of ids
+    assert pre.lambda_coeffs(ids) == coeffs
+    assert pre.lambda_coeffs(ids[::-1]) == coeffs[::-1]
+
+    # Wiping the returned coefficients leaves the cache intact
+    for coeff in pre.lambda_coeffs(ids):
+        coeff.zeroize()
+    assert pre.lambda_coeffs(ids) == coeffs
+
+
+def test_split_rekey_stream():
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    pub_alice = pre.priv2pub(priv_alice)
+    priv_bob = pre.gen_priv()
+    sym_key, ekey = pre.encapsulate(pub_alice)
+
+    vkeys, kfrags = pre.split_rekey_stream(priv_alice, priv_bob, 3, 10, batch_size=4)
+    assert len(vkeys) == 3
+    first = next(kfrags)
+    assert pre.check_kFrag_consistency(first, vkeys)
+    kfrags = [first] + list(kfrags)
+    assert len(kfrags) == 10
+    assert len({pre.save_key(k.id) for k in kfrags}) == 10
+    assert pre.check_kFrags_consistency(kfrags, vkeys) == [True] * 10
+
+    ekeys = [pre.reencrypt(k, ekey) for k in kfrags[4:7]]
+    assert pre.decapsulate(priv_bob, pre.combine(ekeys)) == sym_key
+
+    # Wiping the polynomial on close leaves the kFrags handed out intact
+    vkeys, kfrags = pre.split_rekey_stream(priv_alice, priv_bob, 2, 10)
+    first = next(kfrags)
+    kfrags.close()
+    assert pre.check_kFrag_consistency(first, vkeys)
+    with pytest.raises(StopIteration):
+        next(kfrags)
+
+
+def test_split_rekey_stream_wipe():
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+    vkeys, kfrags = pre.split_rekey_stream(priv_alice, priv_bob, 3, 5)
+    coeffs = kfrags._finalizer.peek()[2][0]
+    assert not any(coeff == 0 for coeff in coeffs)
+
+    # Wiped even though the stream was never iterated
+    del kfrags
+    gc.collect()
+    assert all(coeff == 0 for coeff in coeffs)
+
+    _, kfrags = pre.split_rekey_stream(priv_alice, priv_bob, 3, 5)
+    coeffs = kfrags._finalizer.peek()[2][0]
+    assert len(list(kfrags)) == 5
+    assert all(coeff == 0 for coeff in coeffs)
+
+
+@pytest.mark.parametrize('key_length', [16, 32, 64, 100])
+def test_hkdf_many(key_length):
+    pre = umbral.PRE()
+    points = [pre.priv2pub(pre.gen_priv()) for _ in range(5)]
+    data = b''.join(ec.serialize(p) for p in points)
+    width = len(data) // len(points)
+    expected = b''.join(pre.kdf(p, key_length) for p in points)
+    assert umbral.hkdf_many(data, width, key_length, skip=1) == expected
+
+
+@pytest.mark.parametrize('key_length', [16, 32, 64, 100])
+def test_decapsulate_many(key_length):
+    from concurrent.futures import ThreadPoolExecutor
+    pre = umbral.PRE()
+    priv = pre.gen_priv()
+    pub = pre.priv2pub(priv)
+    ekeys = [pre.encapsulate(pub, key_length)[1] for _ in range(20)]
+    expected = b''.join(pre.decapsulate(priv, e, key_length) for e in ekeys)
+
+    assert pre.decapsulate_many(priv, ekeys, key_length) == expected
+    points = ec.PointArray(pre.ecgroup, [e.ekey for e in ekeys])
+    assert pre.decapsulate_many(priv, points, key_length) == expected
+    assert pre.decapsulate_many(priv, points.serialize(True), key_length) == expected
+    with ThreadPoolExecutor(2) as executor:
+        assert pre.decapsulate_many(priv, ekeys, key_length, executor) == expected
+    assert pre.decapsulate_many(priv, [], key_length) == b''
+    # The capsules are left as they were
+    assert points[0] == ekeys[0].ekey
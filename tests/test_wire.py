@@ -0,0 +1,103 @@
+import pytest
+import npre.elliptic_curve as ec
+from npre import bbs98, umbral, wire, curves
+
+
+def test_capsule_kfrag():
+    pre = umbral.PRE()
+    priv_alice = pre.gen_priv()
+    priv_bob = pre.gen_priv()
+    sym_key, ekey = pre.encapsulate(pre.priv2pub(priv_alice))
+    kfrags, _ = pre.split_rekey(priv_alice, priv_bob, 1, 2)
+    point_size, scalar_size = wire.sizes(pre.ecgroup)
+
+    data = pre.save_ekey(ekey)
+    assert len(data) == wire.HEADER.size + point_size + 1 + scalar_size
+    assert pre.load_ekey(data) == ekey
+    assert pre.load_ekey(memoryview(bytearray(data))) == ekey
+
+    rk = pre.load_kfrag(pre.save_kfrag(kfrags[0]))
+    assert rk == kfrags[0]
+    assert pre.load_kfrag(pre.save_kfrag(pre.rekey(priv_alice, priv_bob))).id is None
+
+    ekey_bob = pre.load_ekey(pre.save_ekey(pre.reencrypt(rk, ekey)))
+    assert ekey_bob.re_id == rk.id
+    assert pre.decapsulate(priv_bob, ekey_bob) == sym_key
+
+
+def test_invalid():
+    pre = umbral.PRE()
+    data = pre.save_ekey(pre.encapsulate(pre.priv2pub(pre.gen_priv()))[1])
+
+    with pytest.raises(ValueError):
+        pre.load_ekey(data[:-1])
+    with pytest.raises(ValueError):
+        pre.load_kfrag(data)
+    with pytest.raises(ValueError):
+        umbral.PRE(curve=curves.secp384r1).load_ekey(data)
+    with pytest.raises(ValueError):
+        # Point not on the curve
+        pre.load_ekey(data[:wire.HEADER.size] + b'\x02' + b'\xff' * 32 + data[-33:])
+
+
+def test_scalar_range():
+    pre = umbral.PRE()
+    kfrags, _ = pre.split_rekey(pre.gen_priv(), pre.gen_priv(), 1, 1)
+    data = pre.save_kfrag(kfrags[0])
+    scalar_size = wire.sizes(pre.ecgroup)[1]
+    order = int(ec.order(pre.ecgroup))
+
+    # key + order would be a second encoding of the same kFrag
+    key = int.from_bytes(data[-scalar_size:], 'big')
+    for bad in (order, key + order, 2 ** (8 * scalar_size) - 1):
+        if bad < 2 ** (8 * scalar_size):
+            with pytest.raises(ValueError):
+                pre.load_kfrag(data[:-scalar_size] + bad.to_bytes(scalar_size, 'big'))
+    with pytest.raises(ValueError):
+        # id out of range
+        pre.load_kfrag(data[:wire.HEADER.size + 1] + order.to_bytes(scalar_size, 'big') +
+                       data[-scalar_size:])
+    last = (order - 1).to_bytes(scalar_size, 'big')
+    assert int(pre.load_kfrag(data[:-scalar_size] + last).key) == order - 1
+
+
+def test_bbs98():
+    pre = bbs98.PRE()
+    alice_priv = pre.gen_priv()
+    alice_pub = pre.priv2pub(alice_priv)
+    bob_priv = pre.gen_priv()
+    rk = pre.rekey(alice_priv, bob_priv)
+    msg = b'Hello world' * 100
+
+    emsg = pre.encrypt(alice_pub, msg, wire_format=True)
+    c1, c2 = wire.parse_bbs98(pre.ecgroup, emsg)
+    assert len(c2) == wire.sizes(pre.ecgroup)[0] * -(-len(msg) // pre.bitsize)
+    assert pre.decrypt(alice_priv, emsg) == msg
+
+    emsg2 = pre.reencrypt(rk, emsg)
+    assert emsg2[wire.HEADER.size + len(c1):] == bytes(c2)
+    assert pre.decrypt(bob_priv, emsg2) == msg
+
+    # Writable buffers are reencrypted in place
+    buf = bytearray(emsg)
+    assert pre.reencrypt(rk, buf) is buf
+    assert buf == emsg2
+
+    emsgs = pre.reencrypt_many(rk, [emsg, pre.encrypt(alice_pub, msg)])
+    assert emsgs[0] == emsg2
+    assert [pre.decrypt(bob_priv, e) for e in emsgs] == [msg, msg]
+
+
+def test_points():
+    pre = umbral.PRE()
+    points = [pre.priv2pub(pre.gen_priv()) for _ in range(5)]
+    data = wire.dump_points(pre.ecgroup, points)
+    assert len(data) == 5 * wire.sizes(pre.ecgroup)[0]
+    assert wire.load_points(pre.ecgroup, data) == points
+
+    bad = bytearray(data)
+    bad[wire.sizes(pre.ecgroup)[0] * 3] = 7
+    with pytest.raises(ValueError):
+        wire.load_points(pre.ecgroup, bytes(bad))
+    with pytest.raises(ValueError):
+        wire.load_points(pre.ecgroup, data[:-1])